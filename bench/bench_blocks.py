@@ -0,0 +1,77 @@
+# Compares block classification through the first-character registry
+# against the original if-chain, on list-heavy and heading-heavy documents,
+# and times rendering them whole.
+#
+#   python bench/bench_blocks.py [--blocks 5000] [--repeat 5] [--seed 0]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from corpus import default_mix, heading_block, list_block, page_markdown
+from markdown_blocks import (
+    lines_to_block_type,
+    lines_to_block_type_chained,
+    markdown_to_blocks,
+    markdown_to_html_node,
+)
+
+
+def documents(blocks, seed):
+    rng = random.Random(seed)
+    return {
+        "list-heavy": "\n\n".join(list_block(rng) for _ in range(blocks)),
+        "heading-heavy": "\n\n".join(
+            heading_block(rng) if i % 4 else list_block(rng) for i in range(blocks)
+        ),
+        "mixed": page_markdown(rng, default_mix, blocks),
+    }
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def classify_all(classify, block_lines):
+    for lines in block_lines:
+        classify(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Block classifier benchmark")
+    parser.add_argument("--blocks", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'document':<14} {'blocks':>7} {'if-chain':>10} {'registry':>10} "
+        f"{'speedup':>8} {'render':>10}"
+    )
+    for name, markdown in documents(args.blocks, args.seed).items():
+        block_lines = [block.split("\n") for block in markdown_to_blocks(markdown)]
+        for lines in block_lines:
+            if lines_to_block_type(lines) != lines_to_block_type_chained(lines):
+                raise ValueError(f"Classifiers disagree on a block of {name}: {lines[0]}")
+        chained = best_time(lambda: classify_all(lines_to_block_type_chained, block_lines), args.repeat)
+        registry = best_time(lambda: classify_all(lines_to_block_type, block_lines), args.repeat)
+        render = best_time(lambda: markdown_to_html_node(markdown).to_html(), args.repeat)
+        print(
+            f"{name:<14} {len(block_lines):>7} {chained * 1000:>8.1f}ms {registry * 1000:>8.1f}ms "
+            f"{chained / registry:>7.1f}x {render * 1000:>8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Compares the single-pass inline scanner against the original chained
+# split_nodes_* passes on large synthetic paragraphs, then times the
+# scanner alone on brackets that never form a link or image, which the
+# chained passes take quadratic time or worse on.
+#
+#   python bench/bench_inline.py [--sizes 1000 10000 50000] [--repeat 3]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from inline_markdown import text_to_textnodes, text_to_textnodes_chained
+
+
+fragments = [
+    "plain words in a sentence ",
+    "**bold text** ",
+    "*italic text* ",
+    "`some_code()` ",
+    "[a link](https://example.com/page) ",
+    "![an image](/images/rivendell.png) ",
+]
+
+
+def synthetic_paragraph(n_fragments, seed=0):
+    rng = random.Random(seed)
+    return "".join(rng.choice(fragments) for _ in range(n_fragments))
+
+
+# Brackets with no "](" after them, and with a "](" but no ")"
+unmatched_fragments = ["[x] ", "![x] ", "[a](", "![a]("]
+
+
+def best_time(func, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inline tokenizer benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'fragments':>10} {'chars':>10} {'chained':>12} {'single-pass':>12} {'speedup':>8}")
+    for size in args.sizes:
+        text = synthetic_paragraph(size)
+        if text_to_textnodes(text) != text_to_textnodes_chained(text):
+            raise ValueError(f"Implementations disagree on a paragraph of {size} fragments")
+        chained = best_time(text_to_textnodes_chained, text, args.repeat)
+        single = best_time(text_to_textnodes, text, args.repeat)
+        print(
+            f"{size:>10} {len(text):>10} {chained * 1000:>10.1f}ms "
+            f"{single * 1000:>10.1f}ms {chained / single:>7.1f}x"
+        )
+
+    print()
+    print(f"{'unmatched':>10} {'repeats':>10} {'single-pass':>12}")
+    for fragment in unmatched_fragments:
+        for size in args.sizes:
+            single = best_time(text_to_textnodes, fragment * size, args.repeat)
+            print(f"{fragment!r:>10} {size:>10} {single * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
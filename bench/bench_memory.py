@@ -0,0 +1,84 @@
+# Reports bytes per node for the slotted node classes against the original
+# dict-based classes.
+#
+#   python bench/bench_memory.py [--nodes 200000]
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from htmlnode import LeafNode, ParentNode
+from textnode import TextNode, text_type_bold
+
+
+class DictHTMLNode:
+    # Same layout as the original HTMLNode, before __slots__
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        self.tag = tag
+        self.value = value
+        self.children = children if children is not None else []
+        self.props = props if props is not None else {}
+
+
+class DictLeafNode(DictHTMLNode):
+    def __init__(self, tag, value, props=None):
+        super().__init__(tag=tag, value=value, children=None, props=props)
+        self.children = None
+
+
+class DictParentNode(DictHTMLNode):
+    def __init__(self, tag, children, props=None):
+        super().__init__(tag=tag, value=None, children=children, props=props)
+
+
+class DictTextNode:
+    def __init__(self, text, text_type, url=None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+
+def bytes_per_node(factory, count):
+    # The node texts are shared, so only the node objects themselves are counted
+    tracemalloc.start()
+    nodes = [factory(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Subtract the list holding the nodes
+    size -= sys.getsizeof(nodes)
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Node memory benchmark")
+    parser.add_argument("--nodes", type=int, default=200000)
+    args = parser.parse_args()
+
+    text = "shared text"
+    children = [LeafNode(None, text)]
+    dict_children = [DictLeafNode(None, text)]
+    cases = [
+        ("LeafNode", lambda i: DictLeafNode("b", text), lambda i: LeafNode("b", text)),
+        (
+            "ParentNode",
+            lambda i: DictParentNode("p", dict_children),
+            lambda i: ParentNode("p", children),
+        ),
+        (
+            "TextNode",
+            lambda i: DictTextNode(text, text_type_bold),
+            lambda i: TextNode(text, text_type_bold),
+        ),
+    ]
+
+    print(f"{'class':>16} {'before':>10} {'after':>10} {'saved':>8}")
+    for name, before_factory, after_factory in cases:
+        before = bytes_per_node(before_factory, args.nodes)
+        after = bytes_per_node(after_factory, args.nodes)
+        print(f"{name:>16} {before:>9.0f}B {after:>9.0f}B {1 - after / before:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
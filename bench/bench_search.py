@@ -0,0 +1,72 @@
+# Builds the search index of a synthetic corpus and times queries against it:
+# loading index.bin, single-term lookups and multi-term AND queries.
+#
+#   python bench/bench_search.py [--pages 2000] [--queries 200] [--seed 0]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from corpus import default_mix, page_markdown, words
+from markdown_blocks import block_to_block_type, markdown_to_blocks
+from search import SearchIndex, SearchReader, collect_sections
+
+
+def build_index(pages, seed):
+    rng = random.Random(seed)
+    index = SearchIndex()
+    for i in range(pages):
+        markdown = page_markdown(rng, default_mix, rng.randint(10, 40))
+        blocks = [(block, block_to_block_type(block)) for block in markdown_to_blocks(markdown)]
+        sections = []
+        for _ in collect_sections(blocks, sections, f"Page {i}"):
+            pass
+        index.set_page(f"page{i}/index.md", f"/page{i}/", sections)
+    return index
+
+
+def per_query(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search index benchmark")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_index(args.pages, args.seed)
+    collect_time = time.perf_counter() - start
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        docs, terms, size = index.write(tmp)
+        write_time = time.perf_counter() - start
+        start = time.perf_counter()
+        reader = SearchReader(os.path.join(tmp, "search"))
+        load_time = time.perf_counter() - start
+
+    print(f"{args.pages} pages, {docs} sections, {terms} terms, index.bin {size} bytes")
+    print(f"{'collect sections':<24} {collect_time * 1000:>10.1f}ms")
+    print(f"{'write index':<24} {write_time * 1000:>10.1f}ms")
+    print(f"{'load index':<24} {load_time * 1000:>10.1f}ms")
+    for n_terms in (1, 2, 3):
+        queries = [
+            " ".join(rng.choice(words) for _ in range(n_terms)) for _ in range(args.queries)
+        ]
+        elapsed = per_query(reader.search, queries)
+        print(f"{f'{n_terms}-term query':<24} {elapsed * 1000:>10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
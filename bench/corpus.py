@@ -0,0 +1,158 @@
+# Deterministic generator for synthetic content/ trees. The same arguments
+# always produce byte-identical files, so benchmark results are comparable
+# between runs and machines.
+#
+#   python bench/corpus.py OUT_DIR [--pages 1000] [--depth 3] [--seed 0]
+#       [--mix headings=2,emphasis=3,links=3,code=1,lists=2]
+import argparse
+import os
+import random
+
+words = (
+    "the quick brown fox jumps over lazy dog middle earth ring fellowship "
+    "shire river mountain elven king wizard journey shadow light tower gate"
+).split()
+
+default_mix = {"headings": 2, "emphasis": 3, "links": 3, "code": 1, "lists": 2}
+# The only image in the repo's static/
+image_urls = ["/images/rivendell.png"]
+
+
+def sentence(rng, length):
+    return " ".join(rng.choice(words) for _ in range(length))
+
+
+def heading_block(rng):
+    return "#" * rng.randint(2, 6) + " " + sentence(rng, rng.randint(2, 6)).title()
+
+
+def emphasis_block(rng):
+    parts = []
+    for _ in range(rng.randint(5, 15)):
+        choice = rng.random()
+        if choice < 0.25:
+            parts.append(f"**{sentence(rng, 2)}**")
+        elif choice < 0.5:
+            parts.append(f"*{sentence(rng, 2)}*")
+        elif choice < 0.6:
+            # Emphasis markers nested inside bold are kept as literal text
+            parts.append(f"**{sentence(rng, 1)} *{sentence(rng, 1)}* {sentence(rng, 1)}**")
+        elif choice < 0.75:
+            parts.append(f"`{rng.choice(words)}()`")
+        else:
+            parts.append(sentence(rng, rng.randint(3, 10)))
+    return " ".join(parts)
+
+
+def links_block(rng, urls=None):
+    # Links go to pages of the corpus (urls, from page_urls) and images to
+    # the repo's static/, so a build of the corpus has no broken links
+    urls = urls or default_urls
+    parts = []
+    for _ in range(rng.randint(20, 60)):
+        if rng.random() < 0.15:
+            parts.append(f"![{sentence(rng, 2)}]({rng.choice(image_urls)})")
+        else:
+            parts.append(f"[{sentence(rng, 2)}]({rng.choice(urls)})")
+        parts.append(sentence(rng, rng.randint(1, 5)))
+    return " ".join(parts)
+
+
+def code_block(rng):
+    # No inline delimiters: code blocks still go through inline parsing
+    lines = [
+        f"{rng.choice(words)}_{i} = {rng.choice(words)}({rng.randint(0, 999)})"
+        for i in range(rng.randint(20, 200))
+    ]
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+def list_block(rng):
+    count = rng.randint(10, 80)
+    if rng.random() < 0.5:
+        return "\n".join(f"{i}. {sentence(rng, rng.randint(2, 8))}" for i in range(1, count + 1))
+    marker = rng.choice("*-")
+    return "\n".join(f"{marker} {sentence(rng, rng.randint(2, 8))}" for _ in range(count))
+
+
+block_generators = {
+    "headings": heading_block,
+    "emphasis": emphasis_block,
+    "links": links_block,
+    "code": code_block,
+    "lists": list_block,
+}
+
+
+def page_markdown(rng, mix, blocks, urls=None):
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    parts = ["# " + sentence(rng, rng.randint(2, 5)).title()]
+    for kind in rng.choices(kinds, weights, k=blocks):
+        if kind == "links":
+            parts.append(links_block(rng, urls))
+        else:
+            parts.append(block_generators[kind](rng))
+    return "\n\n".join(parts) + "\n"
+
+
+def page_paths(pages, depth, fanout=8):
+    # Spreads pages over a tree of at most `depth` directory levels
+    paths = []
+    for i in range(pages):
+        parts = []
+        n = i
+        for _ in range(depth):
+            parts.append(f"section{n % fanout}")
+            n //= fanout
+        parts = parts[: i % (depth + 1)]
+        paths.append(os.path.join(*parts, f"page{i}", "index.md"))
+    return paths
+
+
+def page_urls(paths):
+    # "section0/page1/index.md" -> "/section0/page1/"
+    return ["/" + os.path.dirname(path).replace(os.sep, "/") + "/" for path in paths]
+
+
+# Link targets for blocks generated outside a corpus
+default_urls = page_urls(page_paths(1000, 3))
+
+
+def generate_corpus(dest_dir_path, pages=1000, depth=3, seed=0, mix=None, blocks=20):
+    mix = mix or default_mix
+    rng = random.Random(seed)
+    paths = page_paths(pages, depth)
+    urls = page_urls(paths)
+    for rel_path in paths:
+        path = os.path.join(dest_dir_path, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(page_markdown(rng, mix, rng.randint(blocks // 2, blocks * 2), urls))
+
+
+def parse_mix(value):
+    # "headings=2,links=5" -> {"headings": 2, "links": 5}
+    mix = {}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        if kind not in block_generators:
+            raise ValueError(f"Unknown block kind: {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic content generator")
+    parser.add_argument("dest")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--blocks", type=int, default=20, help="Average blocks per page")
+    parser.add_argument("--mix", type=parse_mix, default=None)
+    args = parser.parse_args()
+    generate_corpus(args.dest, args.pages, args.depth, args.seed, args.mix, args.blocks)
+
+
+if __name__ == "__main__":
+    main()
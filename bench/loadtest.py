@@ -0,0 +1,126 @@
+# Load-tests the production handler in server.py against the original
+# single-threaded SimpleHTTPRequestHandler and reports requests per second
+# and latency percentiles.
+#
+#   python bench/loadtest.py --dir public [--clients 16] [--seconds 5] [--path /index.html]
+#
+# --slow-clients opens connections that send half a request and then stall,
+# which is what blocks everyone on the single-threaded server.
+import argparse
+import http.client
+import os
+import socket
+import sys
+import threading
+import time
+from functools import partial
+from http.server import HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from server import ProductionHandler
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(server_class, handler_class, directory):
+    httpd = server_class(("127.0.0.1", 0), partial(handler_class, directory=directory))
+    httpd.daemon_threads = True
+    # Clients hang up mid-response when the run ends; that's not an error here
+    httpd.handle_error = lambda request, client_address: None
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def client(port, paths, deadline, latencies, errors):
+    connection = None
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.will_close:
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            if connection is not None:
+                connection.close()
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - start)
+    if connection is not None:
+        connection.close()
+
+
+def slow_client(port, deadline):
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        sock.sendall(b"GET / HTTP/1.1\r\n")
+        time.sleep(max(0, deadline - time.perf_counter()))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def load_test(name, server_class, handler_class, args):
+    httpd = start_server(server_class, handler_class, args.dir)
+    port = httpd.server_address[1]
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=slow_client, args=(port, deadline))
+        for _ in range(args.slow_clients)
+    ]
+    threads += [
+        threading.Thread(target=client, args=(port, args.path, deadline, latencies, errors))
+        for _ in range(args.clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    httpd.shutdown()
+    httpd.server_close()
+
+    latencies.sort()
+    print(
+        f"{name:>12} {len(latencies) / elapsed:>10.0f} "
+        f"{percentile(latencies, 0.5) * 1000:>8.2f}ms "
+        f"{percentile(latencies, 0.99) * 1000:>8.2f}ms {len(errors):>7}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="server.py load test")
+    parser.add_argument("--dir", default="public")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--slow-clients", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--path", action="append", help="Request path, repeatable")
+    args = parser.parse_args()
+    if not args.path:
+        args.path = ["/index.html", "/index.css"]
+
+    print(f"{'handler':>12} {'req/s':>10} {'p50':>10} {'p99':>10} {'errors':>7}")
+    load_test("old", HTTPServer, QuietHandler, args)
+    load_test("production", ThreadingHTTPServer, ProductionHandler, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Benchmark harness with a regression gate.
+#
+#   python bench/run.py run [--out results.json] [--pages 300] [--jobs 1] [--repeat 5] [--quick]
+#   python bench/run.py compare baseline.json results.json [--threshold 0.10]
+#
+# "run" times micro-benchmarks of the markdown pipeline and an end-to-end
+# build of a synthetic corpus, and writes the results as JSON. "compare"
+# exits with status 1 when any benchmark got slower than the threshold.
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from copystatic import sync_files
+from corpus import generate_corpus, heading_block, links_block, list_block, page_markdown, default_mix
+from gencontent import generate_pages_recursive
+from inline_markdown import text_to_textnodes
+from markdown_blocks import markdown_to_html_node
+
+repo_root = os.path.join(os.path.dirname(__file__), "..")
+quick_pages = 50
+quick_repeat = 2
+
+
+def measure(func, repeat, number=1):
+    # Seconds per call: the best and the median of `repeat` rounds
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {"best": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def micro_benchmarks(repeat):
+    rng = random.Random(0)
+    paragraph = " ".join(links_block(rng) for _ in range(20))
+    page = page_markdown(rng, default_mix, 200)
+    list_page = "\n\n".join(list_block(rng) for _ in range(50))
+    heading_page = "\n\n".join(heading_block(rng) for _ in range(500))
+    tree = markdown_to_html_node(page)
+    return {
+        "text_to_textnodes/link_paragraph": measure(lambda: text_to_textnodes(paragraph), repeat, 5),
+        "markdown_to_html_node/mixed_page": measure(lambda: markdown_to_html_node(page), repeat),
+        "markdown_to_html_node/list_page": measure(lambda: markdown_to_html_node(list_page), repeat),
+        "markdown_to_html_node/heading_page": measure(
+            lambda: markdown_to_html_node(heading_page), repeat
+        ),
+        "to_html/mixed_page": measure(tree.to_html, repeat),
+    }
+
+
+def build_benchmark(pages, jobs, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        content = os.path.join(tmp, "content")
+        generate_corpus(content, pages=pages, depth=3, seed=0)
+        template = os.path.join(repo_root, "template.html")
+        static = os.path.join(repo_root, "static")
+        public = os.path.join(tmp, "public")
+
+        def build():
+            if os.path.exists(public):
+                shutil.rmtree(public)
+            sync_files(static, public, {})
+            generate_pages_recursive(content, template, public, jobs)
+
+        return measure(build, repeat)
+
+
+def run(args):
+    if args.quick:
+        # A smoke run: the build benchmark gets its own name from the page
+        # count, so it is never compared against a full run's
+        args.pages = min(args.pages, quick_pages)
+        args.repeat = min(args.repeat, quick_repeat)
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": micro_benchmarks(args.repeat),
+    }
+    results["benchmarks"][f"build/{args.pages}_pages_jobs{args.jobs}"] = build_benchmark(
+        args.pages, args.jobs, max(1, args.repeat // 2)
+    )
+    for name, result in sorted(results["benchmarks"].items()):
+        print(f"{name:<45} {result['best'] * 1000:>10.2f}ms (median {result['median'] * 1000:.2f}ms)")
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+    print(f"Wrote {args.out}")
+
+
+def compare_results(baseline, current, threshold):
+    # Returns (name, baseline seconds, current seconds, change) for every
+    # benchmark present in both, plus the names that regressed.
+    rows = []
+    regressions = []
+    for name in sorted(baseline["benchmarks"]):
+        if name not in current["benchmarks"]:
+            continue
+        before = baseline["benchmarks"][name]["best"]
+        after = current["benchmarks"][name]["best"]
+        change = after / before - 1 if before else 0.0
+        rows.append((name, before, after, change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows, regressions = compare_results(baseline, current, args.threshold)
+    for name, before, after, change in rows:
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<45} {before * 1000:>9.2f}ms -> {after * 1000:>9.2f}ms {change:>+7.1%}{flag}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Static site generator benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks and write JSON results")
+    run_parser.add_argument("--out", default="bench-results.json")
+    run_parser.add_argument("--pages", type=int, default=300)
+    run_parser.add_argument("--jobs", type=int, default=1)
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument(
+        "--quick",
+        action="store_true",
+        help=f"Smaller corpus ({quick_pages} pages) and {quick_repeat} repeats",
+    )
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="Flag regressions between two results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.10, help="Allowed slowdown, 0.10 = 10%%"
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,22 @@
 import os
+import io
+import sys
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import hashlib
+import logging
+import threading
+import traceback
+import email.utils
+from collections import OrderedDict
+from functools import partial
+from http import HTTPStatus
+from http.server import HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+livereload_path = "/__livereload"
+livereload_script = (
+    "<script>new EventSource('" + livereload_path + "')"
+    ".onmessage = function () { location.reload(); };</script>"
+).encode()
 
 
 def run(
@@ -17,13 +33,367 @@ def run(
     httpd.serve_forever()
 
 
+class ReloadNotifier:
+    # Lets every open /__livereload stream block until the next rebuild
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.generation = 0
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+    # Serves the site like SimpleHTTPRequestHandler, plus a server-sent events
+    # endpoint that fires after each rebuild. HTML pages get a small script
+    # injected that reloads the page when that happens.
+
+    notifier = None
+
+    def do_GET(self):
+        if self.path == livereload_path:
+            self.stream_reloads()
+            return
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if not path.endswith(".html") or not os.path.isfile(path):
+            super().do_GET()
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        index = body.rfind(b"</body>")
+        if index == -1:
+            index = len(body)
+        body = body[:index] + livereload_script + body[index:]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        generation = self.notifier.generation
+        try:
+            while True:
+                new_generation = self.notifier.wait(generation, timeout=15)
+                if new_generation == generation:
+                    # Keep-alive comment so proxies don't drop the stream
+                    self.wfile.write(b": ping\n\n")
+                else:
+                    generation = new_generation
+                    self.wfile.write(b"data: reload\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+default_cache_control = {
+    ".html": "no-cache",
+    ".css": "public, max-age=3600",
+    ".js": "public, max-age=3600",
+    ".png": "public, max-age=86400",
+    ".jpg": "public, max-age=86400",
+    ".jpeg": "public, max-age=86400",
+    ".gif": "public, max-age=86400",
+    ".svg": "public, max-age=86400",
+    ".webp": "public, max-age=86400",
+}
+
+
+# Precompressed siblings written by the build's --compress stage, best first
+precompressed_variants = [("br", ".br"), ("gzip", ".gz")]
+
+
+def accepted_encodings(accept_encoding):
+    # "gzip, br;q=0.5, deflate;q=0" -> {"gzip", "br", "deflate"} minus q=0 entries
+    encodings = set()
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name)
+    return encodings
+
+
+class FileCache:
+    # Thread-safe LRU of file ETags and (for small files) bodies. Entries are
+    # keyed by path and checked against the file's mtime and size, so an
+    # entry is dropped as soon as the file is rebuilt. Every entry counts
+    # entry_bytes towards max_bytes on top of its body, so ETag-only entries
+    # of large files are evicted too.
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_file_bytes=1024 * 1024, entry_bytes=256):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.entry_bytes = entry_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, stat):
+        # Returns (etag, body or None); body is None for files too big to cache
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(path)
+                return entry[1], entry[2]
+
+        digest = hashlib.sha1()
+        body = None
+        with open(path, "rb") as f:
+            if stat.st_size <= self.max_file_bytes:
+                body = f.read()
+                digest.update(body)
+            else:
+                for chunk in iter(lambda: f.read(65536), b""):
+                    digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:20]}"'
+
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old is not None:
+                self.size -= self.entry_size(old[2])
+            self.entries[path] = (version, etag, body)
+            self.size += self.entry_size(body)
+            while self.size > self.max_bytes and self.entries:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.size -= self.entry_size(evicted)
+        return etag, body
+
+    def entry_size(self, body):
+        if body is None:
+            return self.entry_bytes
+        return self.entry_bytes + len(body)
+
+
+class ProductionHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 with keep-alive, strong ETags, Last-Modified and 304 responses,
+    # per-extension Cache-Control, precompressed .br/.gz variants and an
+    # in-memory LRU of hot file bodies.
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY a
+    # keep-alive client waits on delayed ACKs for every response.
+    disable_nagle_algorithm = True
+    file_cache = FileCache()
+    cache_control = default_cache_control
+
+    def log_message(self, format, *args):
+        # Access logging on every request costs more than serving a cached file
+        pass
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split("?", 1)[0].endswith("/"):
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                self.send_header("Location", self.path.split("?", 1)[0] + "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return None
+            path = os.path.join(path, "index.html")
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        if not os.path.isfile(path) or path.endswith("/"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        encoding, served_path, served_stat, has_variants = self.negotiate_encoding(path, stat)
+        etag, body = self.file_cache.get(served_path, served_stat)
+        last_modified = self.date_time_string(stat.st_mtime)
+        if self.not_modified(etag, stat):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_cache_headers(path, etag, last_modified, has_variants)
+            self.end_headers()
+            return None
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(served_stat.st_size))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_cache_headers(path, etag, last_modified, has_variants)
+        self.end_headers()
+        if body is not None:
+            return io.BytesIO(body)
+        return open(served_path, "rb")
+
+    def negotiate_encoding(self, path, stat):
+        # Picks a precompressed sibling the client accepts. A variant whose
+        # mtime differs from the source's is stale (e.g. the page was rebuilt
+        # without --compress) and is never served. Nothing is compressed on
+        # the fly.
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        has_variants = False
+        for encoding, suffix in precompressed_variants:
+            try:
+                variant_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            if variant_stat.st_mtime_ns != stat.st_mtime_ns:
+                continue
+            has_variants = True
+            if encoding in accepted:
+                return encoding, path + suffix, variant_stat, True
+        return None, path, stat, has_variants
+
+    def send_cache_headers(self, path, etag, last_modified, has_variants=False):
+        if has_variants:
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        cache_control = self.cache_control.get(os.path.splitext(path)[1].lower())
+        if cache_control:
+            self.send_header("Cache-Control", cache_control)
+
+    def not_modified(self, etag, stat):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        return int(stat.st_mtime) <= since.timestamp()
+
+
+def run_production(port=8888, directory=".", cache_control=None, cache_bytes=None):
+    handler_class = ProductionHandler
+    if cache_control:
+        handler_class.cache_control = {**default_cache_control, **cache_control}
+    if cache_bytes is not None:
+        handler_class.file_cache = FileCache(max_bytes=cache_bytes)
+    httpd = ThreadingHTTPServer(("", port), partial(handler_class, directory=directory))
+    httpd.daemon_threads = True
+    print(f"Serving HTTP/1.1 on http://localhost:{port} from directory '{directory}'...")
+    httpd.serve_forever()
+
+
+def parse_cache_control(values):
+    # [".css=public, max-age=31536000"] -> {".css": "public, max-age=31536000"}
+    cache_control = {}
+    for value in values:
+        extension, _, header = value.partition("=")
+        if not extension.startswith(".") or not header:
+            raise ValueError(f"Invalid --cache-control value: {value}")
+        cache_control[extension.lower()] = header
+    return cache_control
+
+
+def watch_and_rebuild(notifier, jobs=1):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+    from block_cache import block_cache
+    from main import dir_path_cache, rebuild_changed, start_watch, watched_paths
+    from watch import create_watcher
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Saving a long page usually changes a block or two; the rest come
+    # from the block cache
+    block_cache.open(dir_path_cache)
+    print("Building site...")
+    start_watch(jobs)
+    watcher = create_watcher(watched_paths())
+
+    def loop():
+        while True:
+            changed = watcher.wait()
+            if not changed:
+                continue
+            try:
+                rebuild_changed(changed, jobs)
+            except Exception:
+                # Keep watching; the next save will probably fix it
+                traceback.print_exc()
+                continue
+            notifier.notify()
+
+    threading.Thread(target=loop, daemon=True).start()
+
+
+def run_watch(port=8888, directory="public", jobs=1):
+    # Rebuilds on every change under content/, static/ and template.html and
+    # tells open browsers to reload. Must run from the project root.
+    notifier = ReloadNotifier()
+    watch_and_rebuild(notifier, jobs)
+    LiveReloadHandler.notifier = notifier
+    httpd = ThreadingHTTPServer(("", port), partial(LiveReloadHandler, directory=directory))
+    httpd.daemon_threads = True
+    print(f"Serving HTTP on http://localhost:{port} from directory '{directory}' with live reload...")
+    httpd.serve_forever()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="HTTP Server")
     parser.add_argument(
-        "--dir", type=str, help="Directory to serve files from", default="."
+        "--dir",
+        type=str,
+        help="Directory to serve files from (default: public with --watch, else .)",
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Rebuild on changes to content/, static/ and template.html and live-reload browsers",
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="Worker processes used for full rebuilds", default=1
+    )
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        help="Threaded HTTP/1.1 server with keep-alive, ETags and an in-memory file cache",
+    )
+    parser.add_argument(
+        "--cache-control",
+        action="append",
+        default=[],
+        metavar="EXT=VALUE",
+        help='Cache-Control header per extension, e.g. ".css=public, max-age=31536000"',
+    )
+    parser.add_argument(
+        "--cache-mb", type=int, help="Size cap of the in-memory file cache", default=64
+    )
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
-
+    if args.watch:
+        run_watch(port=args.port, directory=args.dir or "public", jobs=args.jobs)
+    elif args.production:
+        run_production(
+            port=args.port,
+            directory=args.dir or ".",
+            cache_control=parse_cache_control(args.cache_control),
+            cache_bytes=args.cache_mb * 1024 * 1024,
+        )
+    else:
+        run(port=args.port, directory=args.dir or ".")
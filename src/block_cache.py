@@ -0,0 +1,120 @@
+import hashlib
+import os
+
+# Modules whose code decides how a block renders. Their source is part of
+# every cache key, so editing the renderer never serves stale HTML.
+renderer_modules = ("markdown_blocks.py", "inline_markdown.py", "textnode.py", "htmlnode.py")
+
+
+def renderer_version(extra_paths=()):
+    digest = hashlib.sha256()
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(src_dir, filename) for filename in renderer_modules]
+    for path in paths + list(extra_paths):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class BlockCache:
+    # On-disk cache from a raw markdown block to its rendered HTML, shared by
+    # every build and every worker process. Entries are files named after
+    # the hash of the renderer version and the block; a hit refreshes the
+    # file's mtime, and evict() drops the least recently used files once
+    # the directory grows past max_bytes. Blocks shorter than min_length
+    # render faster than a file can be opened and are never cached.
+
+    def __init__(self, dir_path=None, max_bytes=64 * 1024 * 1024, min_length=512):
+        self.dir_path = None
+        self.max_bytes = max_bytes
+        self.min_length = min_length
+        self.version = None
+        self.renderer_sources = []
+        self.hits = 0
+        self.misses = 0
+        if dir_path is not None:
+            self.open(dir_path)
+
+    @property
+    def enabled(self):
+        return self.dir_path is not None
+
+    def open(self, dir_path):
+        self.dir_path = dir_path
+        if self.version is None:
+            self.version = renderer_version(self.renderer_sources)
+
+    def add_renderer_source(self, path):
+        # Another file whose code decides how some blocks render, such as a
+        # module registering its own block type
+        if path in self.renderer_sources:
+            return
+        self.renderer_sources.append(path)
+        if self.version is not None:
+            self.version = renderer_version(self.renderer_sources)
+
+    def close(self):
+        self.dir_path = None
+
+    def entry_path(self, block):
+        key = hashlib.sha256(f"{self.version}\0{block}".encode()).hexdigest()
+        return os.path.join(self.dir_path, key[:2], key[2:])
+
+    def get(self, block):
+        if self.dir_path is None or len(block) < self.min_length:
+            return None
+        path = self.entry_path(block)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return html
+
+    def put(self, block, html):
+        if self.dir_path is None or len(block) < self.min_length:
+            return
+        path = self.entry_path(block)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Workers may store the same block at once; each writes its own
+        # temporary file and the rename makes the entry appear whole
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        # Removes least recently used entries until the cache fits in
+        # max_bytes. Returns the number of bytes freed.
+        if self.dir_path is None or not os.path.exists(self.dir_path):
+            return 0
+        entries = []
+        total = 0
+        for subdir in os.scandir(self.dir_path):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        freed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+        return freed
+
+    def __repr__(self):
+        return f"BlockCache({self.dir_path!r}, hits={self.hits}, misses={self.misses})"
+
+
+# Disabled until the build opens it
+block_cache = BlockCache()
@@ -0,0 +1,97 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+compressible_extensions = {".html", ".css", ".js", ".svg"}
+compressed_suffixes = {".gz": "gzip", ".br": "br"}
+
+
+def compress_tree(dir_path, workers=None, min_size=1024):
+    # Writes .gz (and .br when brotli is installed) siblings for every
+    # compressible file of at least min_size bytes, on `workers` threads
+    # (default: one per CPU). Each variant gets its source's mtime, so
+    # unchanged files are skipped on the next build and the server can tell
+    # a stale variant from a fresh one. Returns the total (original,
+    # compressed) bytes of the variants written.
+    sources = []
+    for root, _, filenames in os.walk(dir_path):
+        names = set(filenames)
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            base, suffix = os.path.splitext(filename)
+            if suffix in compressed_suffixes and os.path.splitext(base)[1] in compressible_extensions:
+                if base not in names:
+                    # The source was removed, drop its stale variant
+                    os.remove(path)
+                continue
+            elif suffix in compressible_extensions:
+                sources.append(path)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # zlib and brotli release the GIL while compressing
+        results = list(executor.map(lambda path: compress_file(path, min_size), sources))
+    original_bytes = sum(result[0] for result in results)
+    compressed_bytes = sum(result[1] for result in results)
+    return original_bytes, compressed_bytes
+
+
+def remove_variants(dir_path):
+    # Deletes the .gz and .br siblings compress_tree wrote, for builds that
+    # no longer compress: left in place they would go stale as pages are
+    # rewritten. Returns the number of files removed.
+    removed = 0
+    for root, _, filenames in os.walk(dir_path):
+        for filename in filenames:
+            base, suffix = os.path.splitext(filename)
+            if suffix in compressed_suffixes and os.path.splitext(base)[1] in compressible_extensions:
+                os.remove(os.path.join(root, filename))
+                removed += 1
+    return removed
+
+
+def compress_file(path, min_size=1024):
+    stat = os.stat(path)
+    variants = [(path + ".gz", gzip_bytes)]
+    if brotli is not None:
+        variants.append((path + ".br", brotli.compress))
+    if stat.st_size < min_size:
+        for variant_path, _ in variants:
+            if os.path.exists(variant_path):
+                os.remove(variant_path)
+        return 0, 0
+
+    data = None
+    original_bytes = 0
+    compressed_bytes = 0
+    for variant_path, compress in variants:
+        if is_fresh(variant_path, stat):
+            continue
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        compressed = compress(data)
+        with open(variant_path, "wb") as f:
+            f.write(compressed)
+        os.utime(variant_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        original_bytes += len(data)
+        compressed_bytes += len(compressed)
+    return original_bytes, compressed_bytes
+
+
+def gzip_bytes(data):
+    # mtime=0 keeps the output byte-identical across builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def is_fresh(variant_path, source_stat):
+    try:
+        return os.stat(variant_path).st_mtime_ns == source_stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
@@ -1,16 +1,145 @@
+import logging
 import os
+import posixpath
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; reflinks fall back to copies there
+    fcntl = None
 
-def copy_files_recursive(source_dir_path, dest_dir_path):
-    if not os.path.exists(dest_dir_path):
-        os.mkdir(dest_dir_path)
+from discovery import stat_tree
+from manifest import hash_file
 
-    for filename in os.listdir(source_dir_path):
-        from_path = os.path.join(source_dir_path, filename)
-        dest_path = os.path.join(dest_dir_path, filename)
-        print(f" * {from_path} -> {dest_path}")
-        if os.path.isfile(from_path):
-            shutil.copy(from_path, dest_path)
+# ioctl(2) request for a copy-on-write clone on Btrfs, XFS and friends
+FICLONE = 0x40049409
+link_modes = ("copy", "reflink", "hardlink")
+
+logger = logging.getLogger(__name__)
+
+
+def sync_files(
+    source_dir_path,
+    dest_dir_path,
+    old_entries,
+    checksum=False,
+    link_mode="copy",
+    jobs=8,
+    new_entries=None,
+    transforms=None,
+):
+    # Brings dest_dir_path up to date with source_dir_path without touching
+    # files that are already current:
+    #  - a file is current when size and mtime match (mtimes are preserved
+    #    on copy); with checksum=True a content match also counts, and only
+    #    the mtime is fixed up
+    #  - copies run on a thread pool, since they are I/O bound
+    #  - files listed in old_entries that are gone from the source are deleted
+    #  - files whose extension has a function in transforms ({".css": f})
+    #    are written as f(text) instead, and are current when the mtime
+    #    matches
+    # Returns the new entries ({rel_path: [size, mtime_ns]}) for the manifest.
+    # Pass new_entries from stat_tree when the source was already scanned.
+    if new_entries is None:
+        new_entries, _ = stat_tree(source_dir_path)
+
+    def sync(rel_path):
+        from_path = os.path.join(source_dir_path, rel_path)
+        dest_path = os.path.join(dest_dir_path, rel_path)
+        size, mtime_ns = new_entries[rel_path]
+        transform = None
+        if transforms:
+            transform = transforms.get(posixpath.splitext(rel_path)[1].lower())
+        try:
+            dest_stat = os.stat(dest_path)
+        except FileNotFoundError:
+            dest_stat = None
+        if dest_stat is not None:
+            if dest_stat.st_mtime_ns == mtime_ns and (
+                transform is not None or dest_stat.st_size == size
+            ):
+                return
+            if (
+                checksum
+                and transform is None
+                and dest_stat.st_size == size
+                and hash_file(from_path) == hash_file(dest_path)
+            ):
+                os.utime(dest_path, ns=(dest_stat.st_atime_ns, mtime_ns))
+                return
+        logger.debug(" * %s -> %s", from_path, dest_path)
+        if transform is not None:
+            transform_file(from_path, dest_path, transform)
         else:
-            copy_files_recursive(from_path, dest_path)
\ No newline at end of file
+            sync_file(from_path, dest_path, link_mode)
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        list(executor.map(sync, new_entries))
+
+    for rel_path in sorted(old_entries):
+        if rel_path in new_entries:
+            continue
+        dest_path = os.path.join(dest_dir_path, rel_path)
+        if os.path.exists(dest_path):
+            logger.debug(" * removing %s", dest_path)
+            os.remove(dest_path)
+
+    return new_entries
+
+
+def sync_file(from_path, dest_path, link_mode="copy"):
+    # Replaces dest_path with from_path, preserving the source's mtime.
+    # "reflink" and "hardlink" fall back to a plain copy when the filesystem
+    # (or a cross-device dest) doesn't support them.
+    if link_mode not in link_modes:
+        raise ValueError(f"Invalid link mode: {link_mode}")
+    dest_dir_path = os.path.dirname(dest_path)
+    if dest_dir_path != "":
+        os.makedirs(dest_dir_path, exist_ok=True)
+    # Write next to the destination and rename, so a hardlinked dest never
+    # gets its source overwritten in place
+    tmp_path = dest_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    if link_mode == "hardlink":
+        try:
+            os.link(from_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+            return
+        except OSError:
+            pass
+    if link_mode == "reflink":
+        try:
+            reflink(from_path, tmp_path)
+            shutil.copystat(from_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+            return
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    shutil.copy2(from_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+
+
+def transform_file(from_path, dest_path, transform):
+    # Writes transform(text of from_path) to dest_path with from_path's
+    # mtime, replacing dest_path rather than writing into it
+    with open(from_path, "r") as f:
+        text = transform(f.read())
+    dest_dir_path = os.path.dirname(dest_path)
+    if dest_dir_path != "":
+        os.makedirs(dest_dir_path, exist_ok=True)
+    tmp_path = dest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    shutil.copystat(from_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+
+
+def reflink(from_path, dest_path):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(from_path, "rb") as from_file, open(dest_path, "wb") as dest_file:
+        fcntl.ioctl(dest_file.fileno(), FICLONE, from_file.fileno())
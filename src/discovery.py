@@ -0,0 +1,92 @@
+import os
+import time
+
+# A directory modified this recently might change again within the same
+# mtime tick, so its listing is not trusted by the next scan
+racy_window_ns = 2 * 10**9
+
+
+def scan_tree(root, snapshot=None):
+    # Returns every file under root as a sorted list of "/"-separated paths
+    # relative to root, and a new snapshot for the next scan
+    files = []
+    new_snapshot = {}
+    for rel_path, _ in walk_tree(root, snapshot, new_snapshot, False):
+        files.append(rel_path)
+    files.sort()
+    return files, new_snapshot
+
+
+def stat_tree(root, snapshot=None):
+    # Like scan_tree, but returns {rel_path: [size, mtime_ns]} in sorted
+    # order, as stored in the manifest
+    found = []
+    new_snapshot = {}
+    for rel_path, stat in walk_tree(root, snapshot, new_snapshot, True):
+        found.append((rel_path, [stat.st_size, stat.st_mtime_ns]))
+    found.sort()
+    return dict(found), new_snapshot
+
+
+def walk_tree(root, snapshot, new_snapshot, with_stat):
+    # Yields (rel_path, stat or None) for every file under root, iteratively
+    # and with one os.scandir per directory. The snapshot maps each
+    # directory to [mtime_ns, filenames, dirnames]: a directory's mtime only
+    # changes when entries are added, removed or renamed in it, so when it
+    # matches, the listing is reused without reading the directory again.
+    # Subdirectories are still visited, since their own changes don't touch
+    # the parent's mtime, and files are still stat'ed when asked for.
+    snapshot = snapshot or {}
+    try:
+        root_mtime_ns = os.stat(root).st_mtime_ns
+    except FileNotFoundError:
+        return
+    racy_after_ns = time.time_ns() - racy_window_ns
+    stack = [("", root_mtime_ns)]
+    while stack:
+        rel_dir, mtime_ns = stack.pop()
+        dir_path = os.path.join(root, rel_dir) if rel_dir else root
+        cached = snapshot.get(rel_dir)
+        file_stats = {}
+        subdirs = []
+        if cached is not None and cached[0] == mtime_ns:
+            filenames, dirnames = cached[1], cached[2]
+            for name in dirnames:
+                try:
+                    subdirs.append((name, os.stat(os.path.join(dir_path, name)).st_mtime_ns))
+                except FileNotFoundError:
+                    continue
+        else:
+            filenames = []
+            dirnames = []
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        # is_dir() and is_file() come from the directory
+                        # listing itself; only stat() costs a syscall
+                        if entry.is_dir():
+                            dirnames.append(entry.name)
+                            subdirs.append((entry.name, entry.stat().st_mtime_ns))
+                        elif entry.is_file():
+                            filenames.append(entry.name)
+                            if with_stat:
+                                file_stats[entry.name] = entry.stat()
+            except FileNotFoundError:
+                continue
+            filenames.sort()
+            dirnames.sort()
+        new_snapshot[rel_dir] = [mtime_ns if mtime_ns < racy_after_ns else -1, filenames, dirnames]
+
+        for name in filenames:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            stat = None
+            if with_stat:
+                stat = file_stats.get(name)
+                if stat is None:
+                    try:
+                        stat = os.stat(os.path.join(dir_path, name))
+                    except FileNotFoundError:
+                        continue
+            yield rel_path, stat
+        for name, subdir_mtime_ns in reversed(subdirs):
+            stack.append((f"{rel_dir}/{name}" if rel_dir else name, subdir_mtime_ns))
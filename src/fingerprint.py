@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+from copystatic import sync_file
+from inline_markdown import extract_markdown_references
+from linkgraph import absolute_target, site_target, template_reference_pattern
+from manifest import hash_file
+from minify import minifier, minify_css
+from template import Template, load_template
+
+# Files that pages and stylesheets refer to and that nothing needs to find
+# under a fixed name; robots.txt, favicon.ico and the like keep theirs
+fingerprint_extensions = {
+    ".css",
+    ".js",
+    ".mjs",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".avif",
+    ".svg",
+    ".woff",
+    ".woff2",
+    ".ttf",
+    ".otf",
+    ".mp4",
+    ".webm",
+}
+fingerprint_length = 8
+asset_manifest_filename = "asset-manifest.json"
+css_url_pattern = re.compile(r"""url\(\s*(['"]?)([^'")]*)\1\s*\)""")
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprinted_name(rel_path, digest):
+    # "images/a.png" -> "images/a.1f2e3d4c.png"
+    root, extension = posixpath.splitext(rel_path)
+    return f"{root}.{digest[:fingerprint_length]}{extension}"
+
+
+class AssetFingerprints:
+    # Publishes static assets under names that include a hash of their
+    # content, so they can be served with immutable cache headers, and
+    # rewrites references to them: href/src attributes of the template,
+    # links and images in pages, and url() in stylesheets.
+    #  - digests: {rel_path: [size, mtime_ns, sha256]} of the source files,
+    #    kept in .cache/fingerprints.json, so only new and changed files are
+    #    hashed again; an unchanged file keeps its name across builds
+    #  - assets: {rel_path: fingerprinted rel_path} for this build, also
+    #    written to public/asset-manifest.json
+    # Stylesheets are named by the hash of their rewritten text, so a CSS
+    # file changes name whenever an image it uses does.
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.digests = {}
+        self.assets = {}
+        self.css_text = {}
+        # The URL of the page being rendered, for relative URLs
+        self.page_url = "/"
+        self.templates = {}
+
+    def open(self, path):
+        self.path = path
+        self.enabled = True
+        try:
+            with open(path, "r") as f:
+                self.digests = json.load(f)
+        except (OSError, ValueError):
+            # A missing or corrupt cache just means every asset is hashed
+            self.digests = {}
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.digests, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, dir_path, static_entries):
+        # Works out the fingerprinted name of every asset in static_entries
+        # ({rel_path: [size, mtime_ns]}, as from stat_tree). Returns the
+        # number of files hashed; stylesheets are small and are read again
+        # every time, since their text depends on the other assets.
+        digests = {}
+        hashed = 0
+        assets = {}
+        stylesheets = []
+        for rel_path, stat in static_entries.items():
+            extension = posixpath.splitext(rel_path)[1].lower()
+            if extension not in fingerprint_extensions:
+                continue
+            if extension == ".css":
+                stylesheets.append(rel_path)
+                continue
+            entry = self.digests.get(rel_path)
+            if entry is None or entry[0] != stat[0] or entry[1] != stat[1]:
+                entry = [stat[0], stat[1], hash_file(os.path.join(dir_path, rel_path))]
+                hashed += 1
+            digests[rel_path] = entry
+            assets[rel_path] = fingerprinted_name(rel_path, entry[2])
+        self.digests = digests
+        self.assets = assets
+        self.css_text = {}
+        # Stylesheets can refer to each other, so each one is named after
+        # the ones it uses; a cycle leaves the back reference unrewritten
+        pending = set(stylesheets)
+        for rel_path in stylesheets:
+            self.fingerprint_css(dir_path, rel_path, pending)
+        self.templates = {}
+        return hashed
+
+    def fingerprint_css(self, dir_path, rel_path, pending):
+        if rel_path not in pending:
+            return
+        pending.discard(rel_path)
+        with open(os.path.join(dir_path, rel_path), "r") as f:
+            text = f.read()
+        css_url = "/" + rel_path
+        for match in css_url_pattern.finditer(text):
+            target = site_target(match.group(2), css_url)
+            if target in pending:
+                self.fingerprint_css(dir_path, target, pending)
+
+        def rewrite_url(match):
+            quote = match.group(1)
+            return f"url({quote}{self.rewrite(match.group(2), css_url)}{quote})"
+
+        text = css_url_pattern.sub(rewrite_url, text)
+        if minifier.enabled:
+            text = minify_css(text)
+        self.css_text[rel_path] = text
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.assets[rel_path] = fingerprinted_name(rel_path, digest)
+
+    def rewrite(self, url, page_url=None):
+        # url with the file name of a fingerprinted asset swapped for its
+        # fingerprinted one. Only the last path segment changes, so
+        # relative URLs stay relative.
+        if not self.assets:
+            return url
+        target = site_target(url, self.page_url if page_url is None else page_url)
+        name = self.assets.get(target)
+        if name is None:
+            return url
+        parts = urlsplit(url.strip())
+        path = posixpath.join(posixpath.dirname(parts.path), posixpath.basename(name))
+        return urlunsplit(parts._replace(path=path))
+
+    def affects(self, text):
+        # Whether rewriting could change how markdown text renders: it refers
+        # to an asset, or has relative URLs, which resolve differently from
+        # page to page. Caches keyed on the text alone must skip it.
+        if "](" not in text:
+            return False
+        for _, _, url in extract_markdown_references(text):
+            url = url.strip()
+            if url.startswith("/"):
+                if absolute_target(url) in self.assets:
+                    return True
+            elif not url.startswith("#") and not urlsplit(url).scheme:
+                return True
+        return False
+
+    def references_key(self, targets):
+        # Changes whenever the fingerprint of one of targets does
+        names = "\n".join(self.assets.get(target, target) for target in sorted(targets))
+        return hashlib.sha256(names.encode("utf-8")).hexdigest()[:16]
+
+    def load_template(self, template_path):
+        # The template with its href and src attributes rewritten, compiled
+        # once per build
+        template = load_template(template_path)
+        rewritten = self.templates.get(template_path)
+        if rewritten is None or rewritten[0] is not template:
+            with open(template_path, "r") as f:
+                source = f.read()
+            source = template_reference_pattern.sub(
+                lambda match: match.group(0).replace(
+                    match.group(1), self.rewrite(match.group(1), "/")
+                ),
+                source,
+            )
+            rewritten = (template, Template(source))
+            self.templates[template_path] = rewritten
+        return rewritten[1]
+
+    def publish(self, source_dir_path, dest_dir_path, old_assets, link_mode="copy"):
+        # Places every asset at its fingerprinted path in dest_dir_path,
+        # skipping those already there (the name changes with the content),
+        # writes the asset manifest and removes fingerprinted files of
+        # earlier builds. Stylesheets are written fresh rather than linked,
+        # since their text is rewritten. Returns the number of files written.
+        written = 0
+        for rel_path, name in sorted(self.assets.items()):
+            dest_path = os.path.join(dest_dir_path, name)
+            if os.path.exists(dest_path):
+                continue
+            logger.debug(" * %s -> %s", rel_path, dest_path)
+            if rel_path in self.css_text:
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                tmp_path = dest_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    f.write(self.css_text[rel_path])
+                os.replace(tmp_path, dest_path)
+            else:
+                sync_file(os.path.join(source_dir_path, rel_path), dest_path, link_mode)
+            written += 1
+        remove_assets(old_assets, self.assets, dest_dir_path)
+        tmp_path = os.path.join(dest_dir_path, asset_manifest_filename + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.assets, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, os.path.join(dest_dir_path, asset_manifest_filename))
+        return written
+
+    def __repr__(self):
+        return f"AssetFingerprints(enabled={self.enabled}, assets={len(self.assets)})"
+
+
+def remove_assets(old_assets, assets, dest_dir_path):
+    # Removes the fingerprinted files of old_assets that assets doesn't have
+    current = set(assets.values())
+    for name in sorted(set(old_assets.values()) - current):
+        dest_path = os.path.join(dest_dir_path, name)
+        if os.path.exists(dest_path):
+            logger.debug(" * removing %s", dest_path)
+            os.remove(dest_path)
+
+
+def load_page_template(template_path):
+    # The template pages and listings are rendered with
+    if asset_fingerprints.enabled:
+        return asset_fingerprints.load_template(template_path)
+    return load_template(template_path)
+
+
+asset_fingerprints = AssetFingerprints()
@@ -1,46 +1,497 @@
+import asyncio
+import html
+import logging
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from markdown_blocks import markdown_to_html_node
 
+import profiling
+from block_cache import block_cache
+from discovery import scan_tree
+from fingerprint import asset_fingerprints, load_page_template
+from imagesize import image_sizes
+from inline_cache import inline_cache
+from linkgraph import LinkGraph, scan_references, template_references
+from markdown_blocks import MarkdownBlockReader, markdown_blocks_to_html
+from manifest import diff_hashes, hash_file, hash_tree
+from metadata import heading_title, metadata_index
+from minify import HtmlMinifier, minifier
+from pipeline import io_executor, pipeline_config, run_pipeline
+from search import collect_sections, search_index
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
-    for filename in os.listdir(dir_path_content):
-        from_path = os.path.join(dir_path_content, filename)
-        dest_path = os.path.join(dest_dir_path, filename)
-        if os.path.isfile(from_path):
-            dest_path = Path(dest_path).with_suffix(".html")
-            generate_page(from_path, template_path, dest_path)
+logger = logging.getLogger(__name__)
+
+
+def generate_pages_recursive(
+    dir_path_content, template_path, dest_dir_path, jobs=1, rel_paths=None
+):
+    # Returns the LinkGraph of the generated pages. The metadata and search
+    # indexes start over with just these pages.
+    if rel_paths is None:
+        rel_paths, _ = scan_tree(dir_path_content)
+    pages = list_pages(dir_path_content, dest_dir_path, rel_paths)
+    graph = LinkGraph()
+    metadata_index.load({})
+    refresh_metadata(dir_path_content, dest_dir_path, rel_paths)
+    search_index.clear()
+    for (from_path, dest_path), result in zip(
+        pages, generate_pages(pages, template_path, jobs, dest_dir_path)
+    ):
+        rel_path = os.path.relpath(from_path, dir_path_content).replace(os.sep, "/")
+        record_page(graph, rel_path, page_url(dest_path, dest_dir_path), result)
+    return graph
+
+
+def refresh_metadata(dir_path_content, dest_dir_path, rel_paths):
+    # Brings the metadata index up to date by reading the headers of new
+    # and changed pages only
+    with profiling.stage("metadata"):
+        read = metadata_index.refresh(
+            dir_path_content,
+            {
+                rel_path: page_url(page_dest_path(rel_path, dest_dir_path), dest_dir_path)
+                for rel_path in rel_paths
+            },
+        )
+    logger.debug(" * read %d page header(s)", read)
+
+
+def record_page(graph, rel_path, url, result):
+    # Files what generate_page returned: links and images in the graph, and
+    # sections in the search index when it is on
+    sections = result.pop("sections", None)
+    if sections is not None:
+        search_index.set_page(rel_path, url, sections)
+    graph.set_page(rel_path, result)
+
+
+def list_pages(dir_path_content, dest_dir_path, rel_paths=None):
+    # Returns every (from_path, dest_path) pair under dir_path_content, in
+    # sorted order. rel_paths, from an earlier scan_tree, saves listing it
+    # again.
+    if rel_paths is None:
+        rel_paths, _ = scan_tree(dir_path_content)
+    return [
+        (os.path.join(dir_path_content, rel_path), page_dest_path(rel_path, dest_dir_path))
+        for rel_path in rel_paths
+    ]
+
+
+def generate_pages(pages, template_path, jobs=1, dest_dir_root=None):
+    # Returns the references of every page, in the order of pages
+    if pipeline_config.enabled and len(pages) > 1:
+        return generate_pages_pipelined(pages, template_path, jobs, dest_dir_root)
+    if jobs <= 1 or len(pages) <= 1:
+        return [
+            generate_page_checked(from_path, template_path, dest_path, dest_dir_root)
+            for from_path, dest_path in pages
+        ]
+
+    # Small chunks keep every worker busy until the end even when page
+    # sizes vary a lot, while still amortizing the pickling overhead.
+    chunksize = max(1, len(pages) // (jobs * 8))
+    profiler = profiling.active
+    page_references = []
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=worker_init,
+        initargs=worker_settings(),
+    ) as executor:
+        results = executor.map(
+            generate_page_worker,
+            [from_path for from_path, _ in pages],
+            repeat(template_path),
+            [dest_path for _, dest_path in pages],
+            repeat(dest_dir_root),
+            chunksize=chunksize,
+        )
+        for references, profile, counts in results:
+            page_references.append(references)
+            if profiler is not None:
+                profiler.add_page(*profile)
+            add_cache_counts(counts)
+    return page_references
+
+
+def worker_settings():
+    # The settings of this process that pool workers need, for worker_init
+    return (
+        logging.getLogger().level,
+        profiling.active is not None,
+        inline_cache.enabled,
+        block_cache.dir_path,
+        search_index.enabled,
+        image_sizes.entries if image_sizes.enabled else None,
+        asset_fingerprints.assets if asset_fingerprints.enabled else None,
+        minifier.enabled,
+    )
+
+
+def worker_init(
+    log_level,
+    profile,
+    use_inline_cache,
+    block_cache_dir,
+    index_search,
+    image_entries,
+    assets,
+    minify,
+):
+    logging.basicConfig(level=log_level, format="%(message)s")
+    if profile:
+        profiling.start()
+    # Every worker keeps its own inline cache for the whole build
+    inline_cache.clear()
+    inline_cache.enabled = use_inline_cache
+    if block_cache_dir is not None:
+        block_cache.open(block_cache_dir)
+    # Workers only collect each page's sections; the parent owns the index
+    search_index.enabled = index_search
+    # The parent has already read every image's size
+    if image_entries is not None:
+        image_sizes.enabled = True
+        image_sizes.entries = image_entries
+    if assets is not None:
+        asset_fingerprints.enabled = True
+        asset_fingerprints.assets = assets
+    minifier.enabled = minify
+
+
+def cache_counts():
+    return (
+        inline_cache.hits,
+        inline_cache.misses,
+        block_cache.hits,
+        block_cache.misses,
+        minifier.html_saved,
+    )
+
+
+def add_cache_counts(counts):
+    # Adds the counts a worker reported to this process's caches (and the
+    # bytes its minifier saved)
+    inline_cache.hits += counts[0]
+    inline_cache.misses += counts[1]
+    block_cache.hits += counts[2]
+    block_cache.misses += counts[3]
+    minifier.html_saved += counts[4]
+
+
+def generate_page_worker(from_path, template_path, dest_path, dest_dir_root=None):
+    # Runs in a pool process. The page's references, profile and cache
+    # hit/miss counts go back to the parent.
+    before = cache_counts()
+    references = generate_page_checked(from_path, template_path, dest_path, dest_dir_root)
+    profile = None
+    if profiling.active is not None:
+        profile = profiling.active.pop_page()
+    counts = tuple(after - start for after, start in zip(cache_counts(), before))
+    return references, profile, counts
+
+
+def generate_page_checked(from_path, template_path, dest_path, dest_dir_root=None):
+    try:
+        return generate_page(from_path, template_path, dest_path, dest_dir_root)
+    except Exception as e:
+        raise RuntimeError(f"Failed to generate {from_path}: {e}") from e
+
+
+def generate_pages_incremental(
+    dir_path_content, template_path, dest_dir_path, old_manifest, jobs=1, forced=()
+):
+    # Regenerates only pages whose markdown changed since the last build,
+    # plus the pages in forced (e.g. those showing a changed image). A
+    # changed template, or turning the search index (which adds heading
+    # ids) or minification on or off, invalidates every page.
+    template_hash = template_version(template_path)
+    rel_paths, content_tree = scan_tree(dir_path_content, old_manifest.get("content_tree"))
+    new_hashes = hash_tree(dir_path_content, rel_paths)
+    old_hashes = old_manifest.get("pages", {})
+    if (
+        old_manifest.get("template") != template_hash
+        or old_manifest.get("search", False) != search_index.enabled
+        or old_manifest.get("minify", False) != minifier.enabled
+    ):
+        old_hashes = {}
+    changed, removed = diff_hashes(old_hashes, new_hashes)
+    graph = LinkGraph.from_dict(old_manifest.get("links", {}))
+    metadata_index.load(old_manifest.get("meta", {}))
+    refresh_metadata(dir_path_content, dest_dir_path, rel_paths)
+    # Pages without an entry in the link graph or the search index (e.g.
+    # from a manifest that predates them) are regenerated too, so they are
+    # always complete
+    missing = [
+        rel_path
+        for rel_path in new_hashes
+        if rel_path not in changed
+        and (
+            rel_path in forced
+            or rel_path not in graph.pages
+            or (search_index.enabled and rel_path not in search_index.pages)
+            or not os.path.exists(page_dest_path(rel_path, dest_dir_path))
+        )
+    ]
+
+    rel_paths = sorted(changed + missing)
+    pages = [
+        (os.path.join(dir_path_content, rel_path), page_dest_path(rel_path, dest_dir_path))
+        for rel_path in rel_paths
+    ]
+    for (rel_path, (from_path, dest_path)), result in zip(
+        zip(rel_paths, pages), generate_pages(pages, template_path, jobs, dest_dir_path)
+    ):
+        record_page(graph, rel_path, page_url(dest_path, dest_dir_path), result)
+
+    for rel_path in removed:
+        graph.remove_page(rel_path)
+        search_index.remove_page(rel_path)
+        dest_path = page_dest_path(rel_path, dest_dir_path)
+        if os.path.exists(dest_path):
+            logger.debug(" * removing %s", dest_path)
+            os.remove(dest_path)
+
+    return {
+        "template": template_hash,
+        "pages": new_hashes,
+        "links": graph.to_dict(),
+        "meta": metadata_index.to_dict(),
+        "content_tree": content_tree,
+        "search": search_index.enabled,
+        "minify": minifier.enabled,
+    }
+
+
+def template_version(template_path):
+    # The template's hash and, with fingerprinting on, the names of the
+    # assets it refers to, since every page shows those too
+    version = hash_file(template_path)
+    if asset_fingerprints.enabled:
+        version += ":" + asset_fingerprints.references_key(template_references(template_path))
+    return version
+
+
+def page_dest_path(rel_path, dest_dir_path):
+    return Path(dest_dir_path, rel_path).with_suffix(".html")
+
+
+def page_url(dest_path, dest_dir_root):
+    # "public/majesty/index.html" -> "/majesty/"
+    if dest_dir_root is None:
+        return ""
+    url = "/" + os.path.relpath(dest_path, dest_dir_root).replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        url = url[: -len("index.html")]
+    return url
+
+
+def generate_page(from_path, template_path, dest_path, dest_dir_root=None):
+    # Streams the markdown block by block into the output file, so memory
+    # stays proportional to the largest block, not the whole page. Returns
+    # what render_page returns.
+    logger.debug(" * %s %s -> %s", from_path, template_path, dest_path)
+    with profiling.page(str(from_path)):
+        with open(from_path, "r") as from_file:
+            lines = from_file
+            if profiling.active is not None:
+                lines = profiling.active.iter_stage("read", from_file)
+            reader = MarkdownBlockReader(lines)
+            header = read_page_header(reader)
+
+            dest_dir_path = os.path.dirname(dest_path)
+            if dest_dir_path != "":
+                os.makedirs(dest_dir_path, exist_ok=True)
+            with open(dest_path, "w") as to_file:
+                write = to_file.write
+                writer = None
+                if profiling.active is not None:
+                    write = writer = profiling.active.write_stage("write", write)
+                references = render_page(
+                    reader, header, template_path, write, page_url(dest_path, dest_dir_root)
+                )
+                if writer is not None:
+                    writer.flush()
+    return references
+
+
+def read_page_header(reader):
+    # The front matter of the page, with the title taken from its first
+    # "# " heading when the front matter has none
+    with profiling.stage("markdown_to_blocks"):
+        header = reader.read_front_matter()
+        if "title" in header:
+            header["title"] = str(header["title"])
         else:
-            generate_pages_recursive(from_path, template_path, dest_path)
+            header["title"] = reader.read_title()
+    return header
+
+
+def render_page(reader, header, template_path, write, url):
+    # Fills the template with the blocks of reader, whose header has already
+    # been read, minifying the output on the way when that is on. Returns
+    # the page's links and images for the LinkGraph and, with the search
+    # index on, its sections.
+    title = header["title"]
+    html_minifier = None
+    if minifier.enabled:
+        html_minifier = HtmlMinifier(write)
+        write = html_minifier.write
+    template = load_page_template(template_path)
+    image_sizes.page_url = asset_fingerprints.page_url = url or "/"
+    links = set()
+    images = set()
+    blocks = scan_references(reader, links, images, url)
+    sections = None
+    if search_index.enabled:
+        sections = []
+        blocks = collect_sections(blocks, sections, title)
+    with profiling.stage("template"):
+        template.render_to(
+            write,
+            {
+                "Title": title,
+                "Content": lambda write: markdown_blocks_to_html(
+                    blocks, write, heading_ids=sections is not None
+                ),
+                "Description": html.escape(str(header.get("description", ""))),
+                "Path": url,
+            },
+        )
+    if html_minifier is not None:
+        html_minifier.close()
+    result = {"links": sorted(links), "images": sorted(images)}
+    if sections is not None:
+        result["sections"] = sections
+    return result
+
+
+def render_page_text(from_path, text, template_path, dest_path, dest_dir_root=None):
+    # The render stage of the pipeline: markdown text in, HTML text and
+    # references out, without touching the filesystem
+    with profiling.page(str(from_path)):
+        reader = MarkdownBlockReader(text.splitlines(keepends=True))
+        header = read_page_header(reader)
+        chunks = []
+        references = render_page(
+            reader, header, template_path, chunks.append, page_url(dest_path, dest_dir_root)
+        )
+        return "".join(chunks), references
+
+
+def render_page_worker(from_path, text, template_path, dest_path, dest_dir_root=None):
+    # render_page_text in a pool process; like generate_page_worker, the
+    # profile and cache counts go back along with the result
+    before = cache_counts()
+    html, references = render_page_text(from_path, text, template_path, dest_path, dest_dir_root)
+    profile = None
+    if profiling.active is not None:
+        profile = profiling.active.pop_page()
+    counts = tuple(after - start for after, start in zip(cache_counts(), before))
+    return html, references, profile, counts
+
+
+def generate_pages_pipelined(pages, template_path, jobs=1, dest_dir_root=None):
+    # Generates pages in four stages connected by bounded queues: the page
+    # list is fed in, sources are read concurrently, rendered on a pool of
+    # `jobs` processes (one thread when jobs is 1) and written concurrently.
+    # On filesystems with high latency per operation, reads and writes of
+    # many pages overlap instead of adding up. Returns the references of
+    # every page, in the order of pages.
+    config = pipeline_config
+    profiler = profiling.active
+    references = [None] * len(pages)
+    if jobs > 1:
+        render_executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=worker_init,
+            initargs=worker_settings(),
+        )
+    else:
+        render_executor = ThreadPoolExecutor(max_workers=1)
+
+    with io_executor(config) as io_pool, render_executor:
+
+        async def read(item):
+            index, from_path, dest_path = item
+            loop = asyncio.get_running_loop()
+            try:
+                text = await loop.run_in_executor(io_pool, read_text, from_path)
+            except Exception as e:
+                raise RuntimeError(f"Failed to generate {from_path}: {e}") from e
+            return index, from_path, dest_path, text
+
+        async def render(item):
+            index, from_path, dest_path, text = item
+            loop = asyncio.get_running_loop()
+            logger.debug(" * %s %s -> %s", from_path, template_path, dest_path)
+            try:
+                if jobs > 1:
+                    html, references[index], profile, counts = await loop.run_in_executor(
+                        render_executor,
+                        render_page_worker,
+                        from_path,
+                        text,
+                        template_path,
+                        dest_path,
+                        dest_dir_root,
+                    )
+                    if profiler is not None:
+                        profiler.add_page(*profile)
+                    add_cache_counts(counts)
+                else:
+                    html, references[index] = await loop.run_in_executor(
+                        render_executor,
+                        render_page_text,
+                        from_path,
+                        text,
+                        template_path,
+                        dest_path,
+                        dest_dir_root,
+                    )
+            except Exception as e:
+                raise RuntimeError(f"Failed to generate {from_path}: {e}") from e
+            return from_path, dest_path, html
 
+        async def write(item):
+            from_path, dest_path, html = item
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(io_pool, write_text, dest_path, html)
+            except Exception as e:
+                raise RuntimeError(f"Failed to generate {from_path}: {e}") from e
 
-def generate_page(from_path, template_path, dest_path):
-    print(f" * {from_path} {template_path} -> {dest_path}")
-    from_file = open(from_path, "r")
-    markdown_content = from_file.read()
-    from_file.close()
+        run_pipeline(
+            (
+                (index, from_path, dest_path)
+                for index, (from_path, dest_path) in enumerate(pages)
+            ),
+            [
+                (read, config.read_concurrency),
+                (render, max(1, jobs)),
+                (write, config.write_concurrency),
+            ],
+            config.queue_size,
+        )
+    return references
 
-    template_file = open(template_path, "r")
-    template = template_file.read()
-    template_file.close()
 
-    node = markdown_to_html_node(markdown_content)
-    html = node.to_html()
+def read_text(path):
+    with open(path, "r") as f:
+        return f.read()
 
-    title = extract_title(markdown_content)
-    template = template.replace("{{ Title }}", title)
-    template = template.replace("{{ Content }}", html)
 
-    dest_dir_path = os.path.dirname(dest_path)
-    if dest_dir_path != "":
-        os.makedirs(dest_dir_path, exist_ok=True)
-    to_file = open(dest_path, "w")
-    to_file.write(template)
+def write_text(path, text):
+    dir_path = os.path.dirname(path)
+    if dir_path != "":
+        os.makedirs(dir_path, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
 
 
 def extract_title(md):
     lines = md.split("\n")
     for line in lines:
-        if line.startswith("# "):
-            return line[2:]
+        title = heading_title(line)
+        if title is not None:
+            return title
     raise ValueError("No title found")
\ No newline at end of file
@@ -1,28 +1,44 @@
+from types import MappingProxyType
+
+# Shared by every node created without props, instead of one empty dict each
+empty_props = MappingProxyType({})
+
+
 class HTMLNode:
+    # No per-instance __dict__: millions of nodes are created on large pages
+    __slots__ = ("tag", "value", "children", "props")
 
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
-        self.children = children = children if children is not None else []
-        self.props = props = props if props is not None else {}
+        self.children = children if children is not None else []
+        self.props = props if props is not None else empty_props
 
     def to_html(self):
         raise NotImplementedError("Child classes will override this method to render themselves as HTML")
 
+    def render_to(self, write):
+        # Streams the HTML to write() in chunks instead of building one string
+        write(self.to_html())
+
     def props_to_html(self):
         return ''.join(f' {key}="{value}"' for key, value in self.props.items())
 
     def __repr__(self) -> str:
         return (f"HTMLNode(tag={self.tag}, value={self.value}, "
-            f"children={self.children}, props={self.props})")
+            f"children={self.children}, props={dict(self.props)})")
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         if value is None:
             raise ValueError("LeafNode requires a value")
 
-        super().__init__(tag=tag, value=value, children=None, props=props)
+        self.tag = tag
+        self.value = value
         self.children = None
+        self.props = props if props is not None else empty_props
 
     def to_html(self):
         # This Exception is handled on __init__ method, but I added to cover all possibilities.
@@ -35,23 +51,38 @@ class LeafNode(HTMLNode):
         return f'<{self.tag}{attributes}>{self.value}</{self.tag}>'
 
     def __repr__(self):
-        return f"LeafNode({self.tag}, {self.value}, {self.props})"
+        return f"LeafNode({self.tag}, {self.value}, {dict(self.props)})"
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag=tag, value=None, children=children, props=props)
 
     def to_html(self):
-        if not self.tag:
-            raise ValueError("ParentNode requires a tag")
-        if not self.children or not isinstance(self.children, list):
-            raise ValueError("ParentNode requires a list of children")
-
-        attributes = self.props_to_html()
-        children_html = ''.join(child.to_html() for child in self.children)
+        chunks = []
+        self.render_to(chunks.append)
+        return ''.join(chunks)
 
-        return f'<{self.tag}{attributes}>{children_html}</{self.tag}>'
+    def render_to(self, write):
+        # Walks the tree with an explicit stack, so deeply nested trees don't
+        # hit the recursion limit and no subtree is ever joined into a string.
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                write(node)
+            elif isinstance(node, ParentNode):
+                if not node.tag:
+                    raise ValueError("ParentNode requires a tag")
+                if not node.children or not isinstance(node.children, list):
+                    raise ValueError("ParentNode requires a list of children")
+                write(f'<{node.tag}{node.props_to_html()}>')
+                stack.append(f'</{node.tag}>')
+                stack.extend(reversed(node.children))
+            else:
+                node.render_to(write)
 
     def __repr__(self) -> str:
-        return f"tag={self.tag}, children={self.children}, props={self.props}"
+        return f"tag={self.tag}, children={self.children}, props={dict(self.props)}"
         
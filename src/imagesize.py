@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import re
+import struct
+
+from linkgraph import site_target
+
+image_extensions = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg"}
+# SVG dimensions are on the root element, normally within the first few
+# hundred bytes; comments and doctypes can push it further
+svg_header_bytes = 4096
+svg_tag_pattern = re.compile(rb"<svg\b[^>]*>", re.IGNORECASE)
+svg_attribute_pattern = re.compile(rb'\b(width|height|viewBox)\s*=\s*["\']([^"\']*)["\']')
+svg_length_pattern = re.compile(rb"^\s*([0-9.]+)\s*(px)?\s*$")
+# JPEG start-of-frame markers carry the dimensions; C4, C8 and CC are other
+# segments in the same range
+jpeg_sof_markers = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+logger = logging.getLogger(__name__)
+
+
+def read_image_size(path):
+    # Returns (width, height) from the header of a PNG, JPEG, GIF, WebP or
+    # SVG file without decoding any pixels, or None when the format is not
+    # recognized or the file is corrupt
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"\xff\xd8"):
+            return jpeg_size(f)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return webp_size(head)
+        f.seek(0)
+        return svg_size(f.read(svg_header_bytes))
+
+
+def jpeg_size(f):
+    # Walks the segments after the SOI marker, seeking over their payloads,
+    # until a start-of-frame segment
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        # Fill bytes and standalone markers have no length
+        if code == 0xFF:
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        (length,) = struct.unpack(">H", length_bytes)
+        if code in jpeg_sof_markers:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def svg_size(head):
+    # width and height in px (or unitless) on the root element, else the
+    # viewBox size
+    tag = svg_tag_pattern.search(head)
+    if tag is None:
+        return None
+    attributes = dict(svg_attribute_pattern.findall(tag.group(0)))
+    lengths = [svg_length_pattern.match(attributes.get(name, b"")) for name in (b"width", b"height")]
+    if all(lengths):
+        return tuple(round(float(match.group(1))) for match in lengths)
+    view_box = attributes.get(b"viewBox", b"").replace(b",", b" ").split()
+    if len(view_box) == 4:
+        try:
+            return round(float(view_box[2])), round(float(view_box[3]))
+        except ValueError:
+            return None
+    return None
+
+
+class ImageSizes:
+    # Intrinsic sizes of the images in static/, by path relative to it,
+    # which is also their path in the built site. Entries are
+    # [size, mtime_ns, width, height] and come from the static file scan
+    # every build does anyway, so an unchanged image costs a dict lookup;
+    # only new and changed images have their header read. Width and height
+    # are 0 for files whose size couldn't be read. Kept in
+    # .cache/images.json, which survives full builds.
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.entries = {}
+        # The URL of the page being rendered, for relative image URLs
+        self.page_url = "/"
+
+    def open(self, path):
+        self.path = path
+        self.enabled = True
+        try:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            # A missing or corrupt cache just means every header is read
+            self.entries = {}
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, dir_path, static_entries):
+        # Brings the sizes up to date with static_entries ({rel_path:
+        # [size, mtime_ns]}, as from stat_tree). Returns the number of
+        # headers read.
+        entries = {}
+        read = 0
+        for rel_path, stat in static_entries.items():
+            entry = self.entries.get(rel_path)
+            if entry is not None and entry[0] == stat[0] and entry[1] == stat[1]:
+                entries[rel_path] = entry
+                continue
+            if os.path.splitext(rel_path)[1].lower() not in image_extensions:
+                continue
+            try:
+                size = read_image_size(os.path.join(dir_path, rel_path))
+            except (OSError, struct.error, IndexError):
+                size = None
+            if size is None:
+                logger.warning("Could not read the size of %s", rel_path)
+                size = (0, 0)
+            entry = [stat[0], stat[1], size[0], size[1]]
+            read += 1
+            entries[rel_path] = entry
+        self.entries = entries
+        return read
+
+    def lookup(self, url):
+        # (width, height) of the image at url as written on the current
+        # page, or None for external or unknown images
+        target = site_target(url, self.page_url)
+        entry = self.entries.get(target)
+        if entry is None or not entry[2]:
+            return None
+        return entry[2], entry[3]
+
+    def __repr__(self):
+        return f"ImageSizes(enabled={self.enabled}, images={len(self.entries)})"
+
+
+image_sizes = ImageSizes()
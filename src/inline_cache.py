@@ -0,0 +1,47 @@
+from collections import OrderedDict
+
+
+class InlineCache:
+    # Bounded LRU from inline markdown source to its rendered HTML. Nav
+    # lists, TOC bullets and footers repeat across pages, so in a build most
+    # of them only go through text_to_textnodes once. Each process has its
+    # own cache; pool workers report their hit and miss counts back.
+
+    def __init__(self, max_entries=8192, max_text_length=2048):
+        self.max_entries = max_entries
+        # Long paragraphs are practically never repeated and would only
+        # push out the fragments that are
+        self.max_text_length = max_text_length
+        self.entries = OrderedDict()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text):
+        if not self.enabled or len(text) > self.max_text_length:
+            return None
+        html = self.entries.get(text)
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(text)
+        return html
+
+    def put(self, text, html):
+        if not self.enabled or len(text) > self.max_text_length:
+            return
+        self.entries[text] = html
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"InlineCache(entries={len(self.entries)}, hits={self.hits}, misses={self.misses})"
+
+
+inline_cache = InlineCache()
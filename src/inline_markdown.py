@@ -10,7 +10,119 @@ from textnode import (
     text_type_image,
 )
 
+inline_token_pattern = re.compile(r"\*\*|\*|`|!\[|\[")
+reference_pattern = re.compile(r"(!?)\[(.*?)\]\((.*?)\)")
+delimiter_types = {
+    "**": text_type_bold,
+    "*": text_type_italic,
+    "`": text_type_code,
+}
+
+
 def text_to_textnodes(text):
+    # Single left-to-right scan. Each token is matched once and the scan never
+    # goes back. Code spans are taken literally, so "`a*b`" is code rather
+    # than an unclosed italic. An image or link runs from its bracket to the
+    # first ")" after the first "](" that follows, all on one line. The
+    # positions of the next "](", ")", newline, "*", "`" and "![" only move
+    # forward, so brackets that start nothing ("[x] [y] ..." or
+    # "[a]([a](...") don't each rescan the rest of the text.
+    nodes = []
+    text_start = 0
+    position = 0
+    length = len(text)
+    target_start = -1
+    target_end = -1
+    line_end = -1
+    next_star = -1
+    next_code = -1
+    next_image = -1
+    checked_image = -1
+    checked_image_matches = False
+    while True:
+        token = inline_token_pattern.search(text, position)
+        if token is None:
+            break
+        start = token.start()
+        delimiter = token.group()
+
+        if delimiter in delimiter_types:
+            end = text.find(delimiter, token.end())
+            if end == -1:
+                raise ValueError("Invalid markdown, formatted section not closed")
+            if start > text_start:
+                nodes.append(TextNode(text[text_start:start], text_type_text))
+            if end > token.end():
+                nodes.append(TextNode(text[token.end() : end], delimiter_types[delimiter]))
+            position = text_start = end + len(delimiter)
+            continue
+
+        if target_start < token.end():
+            target_start = find_or_end(text, "](", token.end())
+        if target_end < target_start + 2:
+            target_end = find_or_end(text, ")", target_start + 2)
+        if line_end < start:
+            line_end = find_or_end(text, "\n", start)
+        if target_end >= line_end:
+            # Not an image or link, keep it as plain text
+            position = token.end()
+            continue
+        end = target_end + 1
+
+        # Delimiters bind tighter than images and links, and images bind
+        # tighter than links, so a match that would swallow one of those is
+        # rejected
+        if next_star < start:
+            next_star = find_or_end(text, "*", start)
+        if next_code < start:
+            next_code = find_or_end(text, "`", start)
+        overlaps = next_star < end or next_code < end
+        if not overlaps and delimiter == "[":
+            if next_image < start:
+                next_image = find_or_end(text, "![", start)
+            if next_image < target_start:
+                # It shares this link's "](" and ")"
+                overlaps = True
+            elif next_image < end:
+                # Later "![" before the link's end share this one's "](" and
+                # ")", so only the first needs checking
+                if checked_image != next_image:
+                    checked_image = next_image
+                    image_target = find_or_end(text, "](", next_image + 2)
+                    checked_image_matches = find_or_end(text, ")", image_target + 2) < line_end
+                overlaps = checked_image_matches
+        if overlaps:
+            position = token.end()
+            continue
+
+        if start > text_start:
+            nodes.append(TextNode(text[text_start:start], text_type_text))
+        if delimiter == "![":
+            text_type = text_type_image
+        else:
+            text_type = text_type_link
+        nodes.append(
+            TextNode(text[token.end() : target_start], text_type, text[target_start + 2 : target_end])
+        )
+        position = text_start = end
+
+    if text_start < len(text):
+        nodes.append(TextNode(text[text_start:], text_type_text))
+    return nodes
+
+
+def find_or_end(text, sub, start):
+    # str.find, but with len(text) rather than -1 when sub isn't there, so
+    # "not found" compares after every position
+    index = text.find(sub, start)
+    if index == -1:
+        return len(text)
+    return index
+
+
+def text_to_textnodes_chained(text):
+    # The original multi-pass implementation, kept as a reference for tests
+    # and benchmarks.
     nodes = [TextNode(text, text_type_text)]
     nodes = split_nodes_delimiter(nodes, "**", text_type_bold)
     nodes = split_nodes_delimiter(nodes, "*", text_type_italic)
@@ -99,4 +211,9 @@ def extract_markdown_images(text):
 def extract_markdown_links(text):
     regex_pattern = r"\[(.*?)\]\((.*?)\)"
     matches = re.findall(regex_pattern, text)
-    return matches
\ No newline at end of file
+    return matches
+
+def extract_markdown_references(text):
+    # Links and images in one scan: ("!", alt, url) for images and
+    # ("", text, url) for links
+    return reference_pattern.findall(text)
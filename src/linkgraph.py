@@ -0,0 +1,127 @@
+import posixpath
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from inline_markdown import extract_markdown_references
+
+template_reference_pattern = re.compile(r'(?:href|src)="([^"]*)"')
+
+
+def site_target(url, page_url="/"):
+    # Resolves a link as written on the page at page_url to a path in the
+    # built site: "/majesty" -> "majesty", "../images/a.png" from
+    # "/blog/post/" -> "blog/images/a.png", "/" -> "index.html". External
+    # links and bare fragments give None.
+    url = url.strip()
+    if not url.startswith("/"):
+        parts = urlsplit(url)
+        if parts.scheme or parts.path == "":
+            return None
+        base = page_url or "/"
+        if not base.endswith("/"):
+            base = posixpath.dirname(base).rstrip("/") + "/"
+        url = base + url
+    return absolute_target(url)
+
+
+@lru_cache(maxsize=8192)
+def absolute_target(url):
+    # Pages link to the same few hundred URLs over and over, so the
+    # resolved absolute URLs are memoized
+    parts = urlsplit(url)
+    if parts.netloc:
+        return None
+    path = posixpath.normpath(parts.path)
+    if parts.path.endswith("/"):
+        path = posixpath.join(path, "index.html")
+    return path.lstrip("/")
+
+
+def scan_references(blocks, links, images, page_url):
+    # Passes (block, block_type) pairs through unchanged while adding the
+    # site targets of their links and images to the given sets
+    for block in blocks:
+        if "](" in block[0]:
+            for bang, _, url in extract_markdown_references(block[0]):
+                target = site_target(url, page_url)
+                if target is not None:
+                    (images if bang else links).add(target)
+        yield block
+
+
+def template_references(template_path):
+    with open(template_path, "r") as f:
+        html = f.read()
+    targets = set()
+    for url in template_reference_pattern.findall(html):
+        target = site_target(url)
+        if target is not None:
+            targets.add(target)
+    return targets
+
+
+class LinkGraph:
+    # Site-wide index of what every page links to and which images it
+    # shows, keyed by the page's markdown path relative to content/, plus
+    # the reverse edges. Targets are paths in the built site ("majesty",
+    # "images/a.png"), so both pages and static files can be looked up.
+    # Stored in the build manifest under "links".
+
+    def __init__(self):
+        self.pages = {}
+        self.referrers = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        graph = cls()
+        for rel_path, references in data.items():
+            graph.set_page(rel_path, references)
+        return graph
+
+    def to_dict(self):
+        return self.pages
+
+    def set_page(self, rel_path, references):
+        # references: {"links": [...], "images": [...]}
+        self.remove_page(rel_path)
+        self.pages[rel_path] = references
+        for target in references["links"] + references["images"]:
+            self.referrers.setdefault(target, set()).add(rel_path)
+
+    def remove_page(self, rel_path):
+        references = self.pages.pop(rel_path, None)
+        if references is None:
+            return
+        for target in references["links"] + references["images"]:
+            referrers = self.referrers.get(target)
+            if referrers is not None:
+                referrers.discard(rel_path)
+                if not referrers:
+                    del self.referrers[target]
+
+    def pages_referencing(self, targets):
+        pages = set()
+        for target in targets:
+            pages |= self.referrers.get(target, set())
+        return pages
+
+    def broken_links(self, site_paths):
+        # Returns sorted (page, target) pairs whose target is neither in
+        # site_paths nor a directory with an index.html there
+        broken = []
+        for target, referrers in self.referrers.items():
+            if target in site_paths or posixpath.join(target, "index.html") in site_paths:
+                continue
+            for rel_path in referrers:
+                broken.append((rel_path, target))
+        return sorted(broken)
+
+    def unused_files(self, static_paths, extra_references=()):
+        # Static files that no page (and nothing in extra_references, e.g.
+        # the template's stylesheet) refers to
+        return sorted(
+            path
+            for path in static_paths
+            if path not in self.referrers and path not in extra_references
+        )
@@ -0,0 +1,144 @@
+import hashlib
+import html
+import logging
+import os
+import posixpath
+
+from fingerprint import load_page_template
+from markdown_blocks import heading_anchor
+from minify import minifier, minify_html
+
+tags_dir_name = "tags"
+
+logger = logging.getLogger(__name__)
+
+
+def listing_groups(pages):
+    # Groups the metadata index ({rel_path: meta}) for listing pages: sorts
+    # it once, newest date first and pages without a date last, then files
+    # every page under its directory and each of its tags in a single pass.
+    # "blog/post.md" and "blog/post/index.md" both belong to "blog"; the
+    # home page belongs to no directory. Returns ({dir: [meta]}, {tag: [meta]}).
+    ordered = sorted(pages.items(), key=lambda item: item[1]["url"])
+    ordered.sort(key=lambda item: item[1].get("date", ""), reverse=True)
+    directories = {}
+    tags = {}
+    for rel_path, meta in ordered:
+        parent = posixpath.dirname(rel_path)
+        if posixpath.basename(rel_path) == "index.md":
+            if parent == "":
+                parent = None
+            else:
+                parent = posixpath.dirname(parent)
+        if parent is not None:
+            directories.setdefault(parent, []).append(meta)
+        for tag in meta.get("tags", ()):
+            tags.setdefault(tag, []).append(meta)
+    return directories, tags
+
+
+def render_listings(pages, template_path):
+    # Returns {output path relative to public/: html} for a listing of every
+    # content directory without its own index.md, a page per tag under
+    # tags/, and tags/index.html listing the tags. Only the metadata index
+    # is used; no markdown is read.
+    template = load_page_template(template_path)
+    directories, tags = listing_groups(pages)
+    listings = {}
+    for directory, entries in directories.items():
+        index_path = posixpath.join(directory, "index.md") if directory else "index.md"
+        if index_path in pages:
+            continue
+        dest = posixpath.join(directory, "index.html") if directory else "index.html"
+        url = f"/{directory}/" if directory else "/"
+        title = posixpath.basename(directory) or "Pages"
+        listings[dest] = render_listing(template, title, url, page_items(entries))
+    if tags:
+        used_anchors = set()
+        tag_items = []
+        for tag in sorted(tags):
+            url = f"/{tags_dir_name}/{heading_anchor(tag, used_anchors)}/"
+            entries = tags[tag]
+            listings[url[1:] + "index.html"] = render_listing(
+                template, f"Tagged {tag}", url, page_items(entries)
+            )
+            tag_items.append(
+                f'<li><a href="{html.escape(url)}">{html.escape(tag)}</a> ({len(entries)})</li>'
+            )
+        url = f"/{tags_dir_name}/"
+        listings[url[1:] + "index.html"] = render_listing(template, "Tags", url, tag_items)
+    return listings
+
+
+def page_items(entries):
+    items = []
+    for meta in entries:
+        item = f'<li><a href="{html.escape(meta["url"])}">{html.escape(meta["title"])}</a>'
+        date = meta.get("date")
+        if date:
+            item += f' <time datetime="{date}">{date[:10]}</time>'
+        items.append(item + "</li>")
+    return items
+
+
+def render_listing(template, title, url, items):
+    title = html.escape(title)
+    text = template.render(
+        {
+            "Title": title,
+            "Content": f"<div><h1>{title}</h1><ul>{''.join(items)}</ul></div>",
+            "Description": "",
+            "Path": url,
+        }
+    )
+    if minifier.enabled:
+        text = minify_html(text)
+    return text
+
+
+def write_listings(pages, template_path, dest_dir_path, old_listings):
+    # Writes the listings whose HTML changed since the last build (as
+    # recorded in old_listings, {path: sha256}) and removes those no longer
+    # needed. Returns the new record and the number of files written.
+    listings = {}
+    written = 0
+    for rel_path, text in sorted(render_listings(pages, template_path).items()):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        listings[rel_path] = digest
+        dest_path = os.path.join(dest_dir_path, rel_path)
+        if old_listings.get(rel_path) == digest and os.path.exists(dest_path):
+            continue
+        logger.debug(" * listing %s", dest_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        with open(dest_path, "w") as f:
+            f.write(text)
+        written += 1
+    remove_listings(old_listings, listings, pages, dest_dir_path)
+    return listings, written
+
+
+def remove_listings(old_listings, listings, pages, dest_dir_path):
+    # Removes listings that are in old_listings but not listings, unless a
+    # page has taken over their path since
+    page_outputs = {posixpath.splitext(rel_path)[0] + ".html" for rel_path in pages}
+    for rel_path in old_listings:
+        if rel_path in listings or rel_path in page_outputs:
+            continue
+        dest_path = os.path.join(dest_dir_path, rel_path)
+        if os.path.exists(dest_path):
+            logger.debug(" * removing %s", dest_path)
+            os.remove(dest_path)
+            remove_empty_dirs(os.path.dirname(dest_path), dest_dir_path)
+
+
+def remove_empty_dirs(dir_path, stop_dir_path):
+    # Removes dir_path and its parents while they are empty, up to (but
+    # not including) stop_dir_path
+    stop_dir_path = os.path.abspath(stop_dir_path)
+    dir_path = os.path.abspath(dir_path)
+    while dir_path != stop_dir_path and dir_path.startswith(stop_dir_path + os.sep):
+        try:
+            os.rmdir(dir_path)
+        except OSError:
+            return
+        dir_path = os.path.dirname(dir_path)
@@ -1,26 +1,634 @@
+import argparse
+import logging
 import os
 import shutil
 
-from copystatic import copy_files_recursive
-from gencontent import generate_pages_recursive
+import profiling
+from block_cache import block_cache
+from compress import compress_tree, remove_variants
+from copystatic import link_modes, sync_file, sync_files
+from discovery import scan_tree, stat_tree
+from fingerprint import asset_fingerprints, asset_manifest_filename, remove_assets
+from gencontent import (
+    generate_page,
+    generate_pages_incremental,
+    generate_pages_recursive,
+    page_dest_path,
+    page_url,
+    record_page,
+    refresh_metadata,
+    template_version,
+)
+from imagesize import image_sizes
+from inline_cache import inline_cache
+from linkgraph import LinkGraph, template_references
+from listings import remove_listings, write_listings
+from manifest import (
+    diff_hashes,
+    hash_file,
+    hash_tree,
+    load_manifest,
+    manifest_filename,
+    save_manifest,
+)
+from metadata import metadata_index
+from minify import minifier, minify_css
+from pipeline import pipeline_config, positive_int
+from search import search_dir_name, search_index
+from sitemap import feed_filename, remove_sitemap_files, write_feed, write_sitemap
 
 
 dir_path_static = "./static"
 dir_path_public = "./public"
 dir_path_content = "./content"
 template_path = "./template.html"
+dir_path_cache = "./.cache/blocks"
+image_cache_path = "./.cache/images.json"
+fingerprint_cache_path = "./.cache/fingerprints.json"
+manifest_path = os.path.join(dir_path_public, manifest_filename)
+search_pages_path = os.path.join(dir_path_public, ".search.json")
+max_reported_links = 20
+# The options server.py --watch rebuilds with, set by start_watch
+watch_options = {}
+
+logger = logging.getLogger(__name__)
 
 
 def main():
-    print("Deleting public directory...")
+    parser = argparse.ArgumentParser(description="Static Site Generator")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only rebuild outputs whose sources changed since the last build",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to generate pages",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="Compare static files by content when size or mtime differ",
+    )
+    parser.add_argument(
+        "--link-mode",
+        choices=link_modes,
+        default="copy",
+        help="How static files are placed in public/ (falls back to copy when unsupported)",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="Publish CSS, JS, images and fonts under content-hashed names and rewrite references to them",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Minify HTML as pages are written, and CSS from static/",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write precompressed .gz (and .br with brotli installed) siblings of HTML, CSS, JS and SVG files",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Read, render and write pages concurrently (for filesystems with high latency)",
+    )
+    parser.add_argument(
+        "--read-concurrency",
+        type=positive_int,
+        default=pipeline_config.read_concurrency,
+        metavar="N",
+        help="With --pipeline, number of source files read at once",
+    )
+    parser.add_argument(
+        "--write-concurrency",
+        type=positive_int,
+        default=pipeline_config.write_concurrency,
+        metavar="N",
+        help="With --pipeline, number of pages written at once",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=positive_int,
+        default=pipeline_config.queue_size,
+        metavar="N",
+        help="With --pipeline, pages buffered between stages",
+    )
+    parser.add_argument(
+        "--site-url",
+        metavar="URL",
+        help="Write sitemap.xml and an Atom feed.xml with absolute URLs under URL",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Write a client-side search index to public/search/ and give headings ids",
+    )
+    parser.add_argument(
+        "--listings",
+        action="store_true",
+        help="Write listing pages for directories without an index.md, and pages per front matter tag",
+    )
+    parser.add_argument(
+        "--no-image-sizes",
+        action="store_true",
+        help="Don't read image files to give <img> tags their width and height",
+    )
+    parser.add_argument(
+        "--no-inline-cache",
+        action="store_true",
+        help="Parse every inline fragment instead of reusing rendered repeats (for debugging)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Render every block instead of reusing rendered blocks from {dir_path_cache}",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=64,
+        metavar="MB",
+        help="Evict least recently used blocks once the block cache exceeds this size",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Log every file that is generated, copied or removed",
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only log warnings and errors")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="build-profile.json",
+        metavar="PATH",
+        help="Record per-stage wall and CPU time and write a JSON report (default: build-profile.json)",
+    )
+    parser.add_argument(
+        "--trace", metavar="PATH", help="With --profile, also write a Chrome trace-event file"
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Number of slowest pages listed by --profile"
+    )
+    args = parser.parse_args()
+
+    log_level = logging.INFO
+    if args.verbose:
+        log_level = logging.DEBUG
+    elif args.quiet:
+        log_level = logging.WARNING
+    logging.basicConfig(level=log_level, format="%(message)s")
+
+    if args.profile:
+        profiling.start()
+    inline_cache.enabled = not args.no_inline_cache
+    pipeline_config.enabled = args.pipeline
+    search_index.enabled = args.search
+    minifier.enabled = args.minify
+    pipeline_config.read_concurrency = args.read_concurrency
+    pipeline_config.write_concurrency = args.write_concurrency
+    pipeline_config.queue_size = args.queue_size
+    if args.fingerprint:
+        asset_fingerprints.open(fingerprint_cache_path)
+    if not args.no_image_sizes:
+        image_sizes.open(image_cache_path)
+    if not args.no_cache:
+        block_cache.max_bytes = args.cache_size * 1024 * 1024
+        block_cache.open(dir_path_cache)
+
+    if args.incremental:
+        manifest, graph = build_incremental(
+            args.jobs, args.checksum, args.link_mode, args.listings, args.site_url, args.compress
+        )
+    else:
+        manifest, graph = build(
+            args.jobs, args.link_mode, args.listings, args.site_url, args.compress
+        )
+    with profiling.stage("check_links"):
+        check_links(manifest, graph)
+    if search_index.enabled:
+        with profiling.stage("search_index"):
+            write_search_index()
+    if inline_cache.enabled:
+        logger.info(
+            "Inline cache: %d hits, %d misses", inline_cache.hits, inline_cache.misses
+        )
+    if minifier.enabled:
+        logger.info(
+            "Minified: %d bytes of HTML and %d bytes of CSS saved",
+            minifier.html_saved,
+            minifier.css_saved,
+        )
+    if block_cache.enabled:
+        logger.info("Block cache: %d hits, %d misses", block_cache.hits, block_cache.misses)
+        freed = block_cache.evict()
+        if freed:
+            logger.info(" * evicted %d bytes from the block cache", freed)
+
+    if args.compress:
+        with profiling.stage("compress"):
+            compress_public()
+
+    if args.profile:
+        profiler = profiling.stop()
+        report = profiler.write_report(args.profile)
+        print(profiling.format_report(report, args.top))
+        logger.info("Wrote profile to %s", args.profile)
+        if args.trace:
+            profiler.write_trace(args.trace)
+            logger.info("Wrote trace to %s", args.trace)
+
+
+def build(jobs=1, link_mode="copy", listings=False, site_url=None, compress=False):
+    logger.info("Deleting public directory...")
     if os.path.exists(dir_path_public):
         shutil.rmtree(dir_path_public)
 
-    print("Copying static files to public directory...")
-    copy_files_recursive(dir_path_static, dir_path_public)
+    logger.info("Copying static files to public directory...")
+    with profiling.stage("static_copy"):
+        static_entries, static_tree = stat_tree(dir_path_static)
+        refresh_fingerprints(static_entries)
+        sync_files(
+            dir_path_static,
+            dir_path_public,
+            {},
+            link_mode=link_mode,
+            new_entries=unfingerprinted(static_entries, asset_fingerprints.assets),
+            transforms=static_transforms(),
+        )
+        publish_assets({}, link_mode)
+    refresh_image_sizes(static_entries)
+
+    logger.info("Generating content...")
+    with profiling.stage("content"):
+        rel_paths, content_tree = scan_tree(dir_path_content)
+        graph = generate_pages_recursive(
+            dir_path_content, template_path, dir_path_public, jobs, rel_paths
+        )
+    listing_hashes = {}
+    if listings:
+        listing_hashes = write_listing_pages({})
+    sitemap_files = write_sitemap_and_feed(site_url) if site_url else []
+
+    # Record what was built so the next --incremental build can skip it.
+    # The directory snapshots let it reuse the listings of unchanged
+    # directories.
+    manifest = {
+        "static": static_entries,
+        "static_tree": static_tree,
+        "template": template_version(template_path),
+        "pages": hash_tree(dir_path_content, rel_paths),
+        "content_tree": content_tree,
+        "links": graph.to_dict(),
+        "meta": metadata_index.to_dict(),
+        "listings": listing_hashes,
+        "site_url": site_url,
+        "sitemap": sitemap_files,
+        "assets": asset_fingerprints.assets,
+        "search": search_index.enabled,
+        "minify": minifier.enabled,
+        "compress": compress,
+        "options": build_options(link_mode, listings),
+    }
+    save_manifest(manifest_path, manifest)
+    return manifest, graph
+
+
+def build_incremental(
+    jobs=1, checksum=False, link_mode="copy", listings=False, site_url=None, compress=False
+):
+    manifest = load_manifest(manifest_path)
+    # Without --compress, variants of a compressed build would go stale as
+    # pages are rewritten. A manifest without the key may predate it.
+    if manifest.get("compress", True) and not compress and os.path.exists(dir_path_public):
+        removed = remove_variants(dir_path_public)
+        if removed:
+            logger.info("Removed %d precompressed file(s)", removed)
+    if search_index.enabled:
+        search_index.load(search_pages_path)
+    elif manifest.get("search"):
+        logger.info("Removing search index...")
+        shutil.rmtree(os.path.join(dir_path_public, search_dir_name), ignore_errors=True)
+        if os.path.exists(search_pages_path):
+            os.remove(search_pages_path)
+
+    logger.info("Syncing static files to public directory...")
+    # Assets fingerprinted by the last build or this one are published by
+    # publish_assets, so sync_files leaves them out on either side
+    old_assets = manifest.get("assets", {})
+    with profiling.stage("static_copy"):
+        static_entries, static_tree = stat_tree(dir_path_static, manifest.get("static_tree"))
+        refresh_fingerprints(static_entries)
+        if manifest.get("minify", False) != minifier.enabled:
+            # Stylesheets synced with the other setting have the source's
+            # mtime, so they would look current
+            remove_transformed(unfingerprinted(manifest.get("static", {}), old_assets))
+        sync_files(
+            dir_path_static,
+            dir_path_public,
+            unfingerprinted(manifest.get("static", {}), old_assets),
+            checksum=checksum,
+            link_mode=link_mode,
+            new_entries=unfingerprinted(static_entries, asset_fingerprints.assets),
+            transforms=static_transforms(),
+        )
+        publish_assets(old_assets, link_mode)
+
+    # Pages that show or link to a changed or deleted static file are
+    # regenerated along with the changed pages
+    refresh_image_sizes(static_entries)
+    changed, removed = diff_hashes(manifest.get("static", {}), static_entries)
+    graph = LinkGraph.from_dict(manifest.get("links", {}))
+    forced = graph.pages_referencing(changed + removed)
+
+    logger.info("Generating changed content...")
+    with profiling.stage("content"):
+        content_manifest = generate_pages_incremental(
+            dir_path_content, template_path, dir_path_public, manifest, jobs, forced
+        )
+
+    # Listings come from the metadata index alone; only those whose HTML
+    # changed are written
+    old_listings = manifest.get("listings", {})
+    listing_hashes = {}
+    if listings:
+        listing_hashes = write_listing_pages(old_listings)
+    elif old_listings:
+        remove_listings(old_listings, {}, metadata_index.pages, dir_path_public)
+    # Without --site-url, or with fewer shards, files of the last build go
+    sitemap_files = write_sitemap_and_feed(site_url) if site_url else []
+    remove_sitemap_files(manifest.get("sitemap", []), sitemap_files, dir_path_public)
+
+    manifest = {
+        "static": static_entries,
+        "static_tree": static_tree,
+        **content_manifest,
+        "listings": listing_hashes,
+        "site_url": site_url,
+        "sitemap": sitemap_files,
+        "assets": asset_fingerprints.assets,
+        "compress": compress,
+        "options": build_options(link_mode, listings),
+    }
+    save_manifest(manifest_path, manifest)
+    return manifest, LinkGraph.from_dict(manifest["links"])
+
+
+def build_options(link_mode, listings):
+    # The settings of a build the rest of the manifest doesn't record, for
+    # server.py --watch to repeat
+    return {
+        "link_mode": link_mode,
+        "listings": listings,
+        "fingerprint": asset_fingerprints.enabled,
+        "image_sizes": image_sizes.enabled,
+    }
+
+
+def refresh_fingerprints(static_entries):
+    if not asset_fingerprints.enabled:
+        return
+    hashed = asset_fingerprints.refresh(dir_path_static, static_entries)
+    if hashed:
+        asset_fingerprints.save()
+
+
+def unfingerprinted(entries, assets):
+    return {rel_path: entry for rel_path, entry in entries.items() if rel_path not in assets}
+
+
+def static_transforms():
+    # What static files go through instead of being copied
+    if minifier.enabled:
+        return {".css": minify_css}
+    return None
+
+
+def remove_transformed(entries):
+    for rel_path in entries:
+        if rel_path.endswith(".css"):
+            dest_path = os.path.join(dir_path_public, rel_path)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+
+
+def publish_assets(old_assets, link_mode="copy"):
+    # Writes new fingerprinted assets and removes those of earlier builds,
+    # including all of them when fingerprinting was turned off
+    if asset_fingerprints.enabled:
+        written = asset_fingerprints.publish(
+            dir_path_static, dir_path_public, old_assets, link_mode
+        )
+        logger.info(
+            "Fingerprinted %d asset(s), %d written", len(asset_fingerprints.assets), written
+        )
+    elif old_assets:
+        remove_assets(old_assets, {}, dir_path_public)
+        asset_manifest_path = os.path.join(dir_path_public, asset_manifest_filename)
+        if os.path.exists(asset_manifest_path):
+            os.remove(asset_manifest_path)
+
+
+def refresh_image_sizes(static_entries=None):
+    # Reads the sizes of new and changed images before any page shows them
+    if not image_sizes.enabled:
+        return
+    if static_entries is None:
+        static_entries, _ = stat_tree(dir_path_static)
+    with profiling.stage("image_sizes"):
+        read = image_sizes.refresh(dir_path_static, static_entries)
+    if read:
+        logger.info("Read the size of %d image(s)", read)
+        image_sizes.save()
+
+
+def write_listing_pages(old_listings):
+    with profiling.stage("listings"):
+        listing_hashes, written = write_listings(
+            metadata_index.pages, template_path, dir_path_public, old_listings
+        )
+    logger.info("Listings: %d pages, %d written", len(listing_hashes), written)
+    return listing_hashes
+
+
+def write_sitemap_and_feed(site_url):
+    # Both come from the metadata index alone, so unchanged pages are not
+    # read again. Returns the names of the files written.
+    with profiling.stage("sitemap"):
+        pages = list(metadata_index.pages.values())
+        files = write_sitemap(pages, site_url, dir_path_public)
+        home = metadata_index.pages.get("index.md")
+        write_feed(pages, site_url, dir_path_public, home["title"] if home else site_url)
+    logger.info("Sitemap: %d URLs in %d file(s), feed written", len(pages), len(files))
+    return files + [feed_filename]
+
+
+def write_search_index():
+    docs, terms, size = search_index.write(dir_path_public)
+    search_index.save(search_pages_path)
+    logger.info("Search index: %d sections, %d terms, %d bytes", docs, terms, size)
+
+
+def check_links(manifest, graph):
+    # Warns about internal links to pages or files that don't exist and
+    # lists static files nothing refers to, without re-reading any markdown
+    static_paths = set(manifest.get("static", {}))
+    site_paths = static_paths | set(manifest.get("listings", {})) | {
+        page_dest_path(rel_path, "").as_posix() for rel_path in manifest.get("pages", {})
+    }
+    broken = graph.broken_links(site_paths)
+    for i, (rel_path, target) in enumerate(broken):
+        if i == max_reported_links:
+            logger.warning("... and %d more broken links", len(broken) - i)
+            break
+        logger.warning("Broken link in %s: /%s", rel_path, target)
+    unused = graph.unused_files(static_paths, template_references(template_path))
+    for path in unused:
+        logger.debug(" * unused static file %s", path)
+    if unused:
+        logger.info("%d static file(s) are not referenced by any page", len(unused))
+
+
+def compress_public():
+    logger.info("Compressing public directory...")
+    original_bytes, compressed_bytes = compress_tree(dir_path_public)
+    if original_bytes:
+        logger.info(" * compressed %d bytes into %d bytes", original_bytes, compressed_bytes)
+
+
+def start_watch(jobs=1):
+    # The first build of server.py --watch. It takes its options from the
+    # manifest of the build in public/, so watching a site built with e.g.
+    # --listings, --site-url or --search keeps what those wrote up to date
+    # instead of removing it.
+    manifest = load_manifest(manifest_path)
+    options = manifest.get("options", {})
+    search_index.enabled = manifest.get("search", False)
+    minifier.enabled = manifest.get("minify", False)
+    if options.get("fingerprint"):
+        asset_fingerprints.open(fingerprint_cache_path)
+    if options.get("image_sizes", True):
+        image_sizes.open(image_cache_path)
+    watch_options.clear()
+    watch_options.update(
+        link_mode=options.get("link_mode", "copy"),
+        listings=options.get("listings", False),
+        site_url=manifest.get("site_url"),
+        compress=manifest.get("compress", False),
+    )
+    rebuild_all(jobs)
+
+
+def rebuild_all(jobs=1):
+    # build_incremental with the watched build's options, plus the search
+    # index and compression main() adds after it
+    build_incremental(jobs, **watch_options)
+    finish_rebuild()
+
+
+def finish_rebuild():
+    if search_index.enabled:
+        write_search_index()
+    if watch_options.get("compress"):
+        compress_public()
+
+
+def rebuild_changed(changed_paths, jobs=1):
+    # Rebuilds just the outputs affected by the given source paths, as
+    # reported by the watcher, and brings the manifest's hashes, link graph
+    # and metadata up to date with them. Anything involving a directory
+    # falls back to a full incremental build.
+    manifest = load_manifest(manifest_path)
+    page_hashes = manifest.setdefault("pages", {})
+    static_entries = manifest.setdefault("static", {})
+    graph = LinkGraph.from_dict(manifest.get("links", {}))
+    metadata_index.load(manifest.get("meta", {}))
+    regenerate = set()
+    template_changed = False
+    for path in sorted(changed_paths):
+        path = os.path.abspath(path)
+        if path == os.path.abspath(template_path):
+            template_changed = True
+            continue
+        for source_dir, dest_is_page in (
+            (os.path.abspath(dir_path_content), True),
+            (os.path.abspath(dir_path_static), False),
+        ):
+            if not path.startswith(source_dir + os.sep):
+                continue
+            rel_path = os.path.relpath(path, source_dir)
+            if dest_is_page:
+                dest_path = page_dest_path(rel_path, dir_path_public)
+            else:
+                dest_path = os.path.join(dir_path_public, rel_path)
+            if os.path.isdir(path) or os.path.isdir(os.path.join(dir_path_public, rel_path)):
+                rebuild_all(jobs)
+                return
+            if not dest_is_page and asset_fingerprints.enabled:
+                # A changed asset renames itself and everything showing it
+                rebuild_all(jobs)
+                return
+            target = rel_path.replace(os.sep, "/")
+            if not os.path.exists(path):
+                if os.path.exists(dest_path):
+                    logger.info(" * removing %s", dest_path)
+                    os.remove(dest_path)
+                if dest_is_page:
+                    page_hashes.pop(target, None)
+                    graph.remove_page(target)
+                    search_index.remove_page(target)
+                    regenerate.discard(target)
+                else:
+                    static_entries.pop(target, None)
+            elif dest_is_page:
+                page_hashes[target] = hash_file(path)
+                regenerate.add(target)
+            else:
+                logger.info(" * %s -> %s", path, dest_path)
+                sync_file(path, dest_path)
+                stat = os.stat(path)
+                static_entries[target] = [stat.st_size, stat.st_mtime_ns]
+            if not dest_is_page:
+                # Pages showing the file may depend on it (e.g. image sizes)
+                refresh_image_sizes()
+                regenerate.update(graph.pages_referencing([target]))
+
+    if template_changed:
+        logger.info("Template changed, regenerating every page...")
+        graph = generate_pages_recursive(dir_path_content, template_path, dir_path_public, jobs)
+        manifest["template"] = template_version(template_path)
+    else:
+        # Only the headers of new and edited pages are read again
+        refresh_metadata(dir_path_content, dir_path_public, sorted(page_hashes))
+        for rel_path in sorted(regenerate):
+            dest_path = page_dest_path(rel_path, dir_path_public)
+            result = generate_page(
+                os.path.join(dir_path_content, rel_path), template_path, dest_path, dir_path_public
+            )
+            record_page(graph, rel_path, page_url(dest_path, dir_path_public), result)
+
+    manifest["links"] = graph.to_dict()
+    manifest["meta"] = metadata_index.to_dict()
+    if watch_options.get("listings"):
+        manifest["listings"] = write_listing_pages(manifest.get("listings", {}))
+    site_url = watch_options.get("site_url")
+    if site_url:
+        sitemap_files = write_sitemap_and_feed(site_url)
+        remove_sitemap_files(manifest.get("sitemap", []), sitemap_files, dir_path_public)
+        manifest["sitemap"] = sitemap_files
+    save_manifest(manifest_path, manifest)
+    finish_rebuild()
+
 
-    print("Generating content...")
-    generate_pages_recursive(dir_path_content, template_path, dir_path_public)
+def watched_paths():
+    return [dir_path_content, dir_path_static, template_path]
 
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+
+from discovery import scan_tree
+
+manifest_filename = ".manifest.json"
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_tree(dir_path, rel_paths=None):
+    # Maps every file under dir_path (relative, "/"-separated) to its content
+    # hash. rel_paths, from an earlier scan_tree, saves listing it again.
+    if rel_paths is None:
+        rel_paths, _ = scan_tree(dir_path)
+    return {rel_path: hash_file(os.path.join(dir_path, rel_path)) for rel_path in rel_paths}
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        # A corrupt manifest just means everything gets rebuilt
+        return {}
+    if not isinstance(manifest, dict):
+        return {}
+    return manifest
+
+
+def save_manifest(path, manifest):
+    dir_path = os.path.dirname(path)
+    if dir_path != "":
+        os.makedirs(dir_path, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        # Compact output goes through the C encoder; with the link graph in
+        # it the manifest of a large site runs to megabytes
+        json.dump(manifest, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def diff_hashes(old_hashes, new_hashes):
+    changed = [key for key, value in new_hashes.items() if old_hashes.get(key) != value]
+    removed = [key for key in old_hashes if key not in new_hashes]
+    return sorted(changed), sorted(removed)
@@ -1,6 +1,19 @@
-from htmlnode import ParentNode
-from inline_markdown import text_to_textnodes
-from textnode import text_node_to_html_node
+import inspect
+import itertools
+import os
+import re
+from collections import deque
+from urllib.parse import urlsplit
+
+import profiling
+from block_cache import block_cache, renderer_modules
+from fingerprint import asset_fingerprints
+from htmlnode import LeafNode, ParentNode
+from imagesize import image_sizes
+from inline_cache import inline_cache
+from inline_markdown import extract_markdown_references, text_to_textnodes
+from metadata import heading_title, read_front_matter
+from textnode import text_node_to_html_node, text_type_image, text_type_link
 
 block_type_paragraph = "paragraph"
 block_type_heading = "heading"
@@ -8,6 +21,67 @@ block_type_code = "code"
 block_type_quote = "quote"
 block_type_olist = "ordered_list"
 block_type_ulist = "unordered_list"
+block_type_table = "table"
+block_type_rule = "horizontal_rule"
+
+anchor_word_pattern = re.compile(r"\w+")
+# "---", "***", "_ _ _": three or more of the same marker, nothing else
+rule_pattern = re.compile(r"([-*_])(?:[ \t]*\1){2,}[ \t]*$")
+# "| --- | :--: | --: |"; the outer pipes are optional
+table_delimiter_pattern = re.compile(r"\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?$")
+table_cell_pattern = re.compile(r"(?<!\\)\|")
+ordered_markers = []
+
+
+class BlockRegistry:
+    # The block types markdown is split into. Each one has a function
+    # rendering a block to an HTML node and, except for paragraphs, which
+    # are what every other block falls back to, a function telling whether
+    # a block's lines are of that type. Classifiers are looked up by the
+    # block's first character, so a block is only checked against the
+    # types that can start with it, in the order they were registered.
+    # Types registered without first characters (tables, which can start
+    # with anything) are tried after those.
+
+    def __init__(self):
+        self.classifiers = {}
+        self.fallbacks = []
+        self.renderers = {}
+
+    def register(self, block_type, to_html_node, matches=None, first_chars=None):
+        # matches(lines) -> bool; first_chars: the characters blocks of this
+        # type can start with, or None for any
+        self.renderers[block_type] = to_html_node
+        if matches is not None:
+            if first_chars is None:
+                self.fallbacks.append((block_type, matches))
+            for char in first_chars or ():
+                self.classifiers.setdefault(char, []).append((block_type, matches))
+        # Blocks rendered by code outside the renderer modules are cached
+        # under its source too. Builtins and functools.partial objects have
+        # no source file and are skipped.
+        for func in (to_html_node, matches):
+            try:
+                source = inspect.getsourcefile(func) if func is not None else None
+            except TypeError:
+                source = None
+            if source is not None and os.path.basename(source) not in renderer_modules:
+                block_cache.add_renderer_source(source)
+
+    def classify(self, lines):
+        for block_type, matches in self.classifiers.get(lines[0][:1], ()):
+            if matches(lines):
+                return block_type
+        for block_type, matches in self.fallbacks:
+            if matches(lines):
+                return block_type
+        return block_type_paragraph
+
+    def to_html_node(self, block, block_type):
+        to_html_node = self.renderers.get(block_type)
+        if to_html_node is None:
+            raise ValueError("Invalid block type")
+        return to_html_node(block)
 
 
 def markdown_to_blocks(markdown):
@@ -28,52 +102,46 @@ def markdown_to_html_node(markdown):
         children.append(html_node)
     return ParentNode("div", children, None)
 
-def block_to_html_node(block):
-    block_type = block_to_block_type(block)
-    if block_type == block_type_paragraph:
-        return paragraph_to_html_node(block)
-    if block_type == block_type_heading:
-        return heading_to_html_node(block)
-    if block_type == block_type_code:
-        return code_to_html_node(block)
-    if block_type == block_type_olist:
-        return olist_to_html_node(block)
-    if block_type == block_type_ulist:
-        return ulist_to_html_node(block)
-    if block_type == block_type_quote:
-        return quote_to_html_node(block)
-    raise ValueError("Invalid block type")
+def block_to_html_node(block, block_type=None):
+    if block_type is None:
+        block_type = block_to_block_type(block)
+    return block_registry.to_html_node(block, block_type)
 
 def block_to_block_type(block):
-    lines = block.split("\n")
+    return lines_to_block_type(block.split("\n"))
+
+def lines_to_block_type(lines):
+    return block_registry.classify(lines)
+
+
+def lines_to_block_type_chained(lines):
+    # The original if-chain over the first line, kept as a reference for
+    # tests and benchmarks. Knows only the six original block types.
+    first = lines[0]
 
     if (
-        block.startswith("# ")
-        or block.startswith("## ")
-        or block.startswith("### ")
-        or block.startswith("#### ")
-        or block.startswith("##### ")
-        or block.startswith("###### ")
+        first.startswith("# ")
+        or first.startswith("## ")
+        or first.startswith("### ")
+        or first.startswith("#### ")
+        or first.startswith("##### ")
+        or first.startswith("###### ")
     ):
         return block_type_heading
-    if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
+    if len(lines) > 1 and first.startswith("```") and lines[-1].startswith("```"):
         return block_type_code
-    if block.startswith(">"):
+    if first.startswith(">"):
         for line in lines:
             if not line.startswith(">"):
                 return block_type_paragraph
         return block_type_quote
-    if block.startswith("* "):
-        for line in lines:
-            if not line.startswith("* "):
-                return block_type_paragraph
-        return block_type_ulist
-    if block.startswith("- "):
+    if first.startswith("* ") or first.startswith("- "):
+        marker = first[:2]
         for line in lines:
-            if not line.startswith("- "):
+            if not line.startswith(marker):
                 return block_type_paragraph
         return block_type_ulist
-    if block.startswith("1. "):
+    if first.startswith("1. "):
         i = 1
         for line in lines:
             if not line.startswith(f"{i}. "):
@@ -82,12 +150,218 @@ def block_to_block_type(block):
         return block_type_olist
     return block_type_paragraph
 
+
+def is_heading(lines):
+    # "# " to "###### "
+    first = lines[0]
+    level = len(first) - len(first.lstrip("#"))
+    return level <= 6 and first[level : level + 1] == " "
+
+
+def code_fence(line):
+    # The fence a code block opens with ("```", "~~~~"), or None
+    char = line[:1]
+    if char not in ("`", "~"):
+        return None
+    fence = line[: len(line) - len(line.lstrip(char))]
+    if len(fence) < 3 or (char == "`" and "`" in line[len(fence) :]):
+        return None
+    return fence
+
+
+def is_code(lines):
+    fence = code_fence(lines[0])
+    return fence is not None and len(lines) > 1 and lines[-1].startswith(fence)
+
+
+def is_quote(lines):
+    return all(map(str.startswith, lines, itertools.repeat(">")))
+
+
+def is_ulist(lines):
+    marker = lines[0][:2]
+    return marker in ("* ", "- ") and all(map(str.startswith, lines, itertools.repeat(marker)))
+
+
+def is_olist(lines):
+    return all(map(str.startswith, lines, ordered_list_markers(len(lines))))
+
+
+def ordered_list_markers(count):
+    # ["1. ", "2. ", ...], built once and shared by every list
+    while len(ordered_markers) < count:
+        ordered_markers.append(f"{len(ordered_markers) + 1}. ")
+    return ordered_markers
+
+
+def is_rule(lines):
+    return len(lines) == 1 and rule_pattern.match(lines[0]) is not None
+
+
+def is_table(lines):
+    # A header row, then a delimiter row with as many cells. A "|" in one
+    # of them is required, so a setext underline ("Title\n---") stays a
+    # paragraph.
+    return (
+        len(lines) > 1
+        and "-" in lines[1]
+        and ("|" in lines[0] or "|" in lines[1])
+        and table_delimiter_pattern.match(lines[1].strip()) is not None
+        and len(table_cells(lines[0])) == len(table_cells(lines[1]))
+    )
+
+
+class MarkdownBlockReader:
+    # Reads markdown blocks lazily from an iterable of lines (e.g. an open
+    # file), so memory stays proportional to the largest block rather than
+    # the whole document. Iterating yields (block, block_type) pairs with the
+    # same blocks as markdown_to_blocks. The title is picked up from the
+    # first "# " line on the way, like extract_title.
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.title = None
+        self.pending = deque()
+
+    def read_block(self):
+        while True:
+            block_lines = []
+            for line in self.lines:
+                line = line.rstrip("\n")
+                if self.title is None:
+                    self.title = heading_title(line)
+                if line == "":
+                    if block_lines:
+                        break
+                    continue
+                block_lines.append(line)
+            if not block_lines:
+                return None
+            block = "\n".join(block_lines).strip()
+            # Blocks of whitespace-only lines are skipped
+            if block != "":
+                return block, lines_to_block_type(block.split("\n"))
+
+    def read_front_matter(self):
+        # Reads the front matter, if the document starts with one, and
+        # returns it as a dict. Must come before any block is read.
+        meta, body = read_front_matter(self.lines)
+        if body:
+            self.lines = itertools.chain(body, self.lines)
+        return meta
+
+    def read_title(self):
+        # Reads ahead until the title is found; the blocks read on the way
+        # are kept for iteration. Usually that is just the first block.
+        while self.title is None:
+            block = self.read_block()
+            if block is None:
+                raise ValueError("No title found")
+            self.pending.append(block)
+        return self.title
+
+    def __iter__(self):
+        while self.pending:
+            yield self.pending.popleft()
+        while True:
+            block = self.read_block()
+            if block is None:
+                return
+            yield block
+
+
+def markdown_blocks_to_html(blocks, write, heading_ids=False):
+    # Streams <div>...</div> for (block, block_type) pairs, one block at a
+    # time. With heading_ids, every heading gets a unique id to link to.
+    write("<div>")
+    if profiling.active is not None:
+        blocks = profiling.active.iter_stage("markdown_to_blocks", blocks)
+    used_anchors = set()
+    for block, block_type in blocks:
+        # Headings with ids depend on the page, and so do blocks with
+        # page-relative image or asset URLs while sizes are looked up or
+        # assets fingerprinted; none of them go through the cache
+        key = None
+        if not (heading_ids and block_type == block_type_heading):
+            key = render_key(block)
+        with profiling.stage("block_to_html"):
+            html = block_cache.get(key) if key is not None else None
+            if html is None:
+                node = block_to_html_node(block, block_type)
+                if heading_ids and block_type == block_type_heading:
+                    node.props = {"id": heading_anchor(heading_text(block), used_anchors)}
+        if html is not None:
+            write(html)
+            continue
+        with profiling.stage("to_html"):
+            if key is not None and block_cache.enabled and len(block) >= block_cache.min_length:
+                chunks = []
+                node.render_to(chunks.append)
+                html = "".join(chunks)
+                block_cache.put(key, html)
+                write(html)
+            else:
+                node.render_to(write)
+    write("</div>")
+
+def render_key(text):
+    # What the HTML of text depends on, to key caches with: the text itself,
+    # plus the size of every image and the fingerprinted name of every asset
+    # it refers to while those are looked up. None when the HTML depends on
+    # the page, because one of those URLs is relative to it.
+    sized = image_sizes.enabled and "![" in text
+    rewritten = asset_fingerprints.enabled and "](" in text
+    if not (sized or rewritten):
+        return text
+    references = extract_markdown_references(text)
+    if sized and text.count("![") != sum(1 for image, _, _ in references if image):
+        # Nested brackets the reference scan reads differently from the
+        # renderer; too rare to be worth resolving exactly
+        return None
+    resolved = []
+    for image, _, url in references:
+        if not (rewritten or image):
+            continue
+        url = url.strip()
+        if not url.startswith("/"):
+            parts = urlsplit(url)
+            if parts.scheme or parts.path == "":
+                continue
+            return None
+        if image and sized:
+            resolved.append((url, image_sizes.lookup(url)))
+        if rewritten:
+            resolved.append((url, asset_fingerprints.rewrite(url)))
+    if not resolved:
+        return text
+    return f"{text}\0{resolved!r}"
+
+
 def text_to_children(text):
-    text_nodes = text_to_textnodes(text)
-    children = []
-    for text_node in text_nodes:
-        html_node = text_node_to_html_node(text_node)
-        children.append(html_node)
+    # With the inline cache on, the children come back pre-rendered as a
+    # single raw LeafNode, cached under render_key(text). Fragments whose
+    # images or asset references are relative to the page are not cached.
+    sized = image_sizes.enabled and "![" in text
+    rewritten = asset_fingerprints.enabled and asset_fingerprints.affects(text)
+    key = render_key(text) if inline_cache.enabled else None
+    html = inline_cache.get(key) if key is not None else None
+    if html is not None:
+        return [LeafNode(None, html)]
+    with profiling.stage("inline"):
+        text_nodes = text_to_textnodes(text)
+        children = []
+        for text_node in text_nodes:
+            image_size = None
+            if sized and text_node.text_type == text_type_image:
+                image_size = image_sizes.lookup(text_node.url)
+            if rewritten and text_node.text_type in (text_type_image, text_type_link):
+                text_node.url = asset_fingerprints.rewrite(text_node.url)
+            html_node = text_node_to_html_node(text_node, image_size)
+            children.append(html_node)
+        if key is not None and children:
+            html = "".join(child.to_html() for child in children)
+            inline_cache.put(key, html)
+            children = [LeafNode(None, html)]
     return children
 
 
@@ -112,12 +386,35 @@ def heading_to_html_node(block):
     return ParentNode(f"h{level}", children)
 
 
+def heading_text(block):
+    # "## The **Art**" -> "The **Art**"
+    return block.lstrip("#")[1:]
+
+
+def heading_anchor(text, used_anchors):
+    # "The **Art** of It" -> "the-art-of-it"; repeats on the same page get
+    # "-2", "-3"... Adds the anchor to used_anchors.
+    anchor = "-".join(anchor_word_pattern.findall(text.lower())) or "section"
+    unique = anchor
+    n = 2
+    while unique in used_anchors:
+        unique = f"{anchor}-{n}"
+        n += 1
+    used_anchors.add(unique)
+    return unique
+
+
 def code_to_html_node(block):
-    if not block.startswith("```") or not block.endswith("```"):
+    # The lines between the fences, as written; a language after the
+    # opening fence ("```python") becomes a "language-python" class
+    lines = block.split("\n")
+    fence = code_fence(lines[0])
+    if fence is None or len(lines) < 2 or not lines[-1].startswith(fence):
         raise ValueError("Invalid code block")
-    text = block[4:-3]
-    children = text_to_children(text)
-    code = ParentNode("code", children)
+    text = "".join(line + "\n" for line in lines[1:-1])
+    info = lines[0][len(fence) :].split()
+    props = {"class": f"language-{info[0]}"} if info else None
+    code = LeafNode("code", text, props)
     return ParentNode("pre", [code])
 
 
@@ -150,4 +447,65 @@ def quote_to_html_node(block):
         new_lines.append(line.lstrip(">").strip())
     content = " ".join(new_lines)
     children = text_to_children(content)
-    return ParentNode("blockquote", children)
\ No newline at end of file
+    return ParentNode("blockquote", children)
+
+
+def rule_to_html_node(block):
+    return LeafNode("hr", "")
+
+
+def table_cells(line):
+    # "| a | b \\| c |" -> ["a", "b | c"]
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in table_cell_pattern.split(line)]
+
+
+def table_row_to_html_node(cells, tag, aligns):
+    # Rows are cut or padded to the header's width
+    html_cells = []
+    for i, align in enumerate(aligns):
+        text = cells[i] if i < len(cells) else ""
+        props = {"align": align} if align else None
+        children = text_to_children(text) if text else None
+        if children:
+            html_cells.append(ParentNode(tag, children, props))
+        else:
+            html_cells.append(LeafNode(tag, "", props))
+    return ParentNode("tr", html_cells)
+
+
+def table_to_html_node(block):
+    lines = block.split("\n")
+    if not is_table(lines):
+        raise ValueError("Invalid table")
+    aligns = []
+    for cell in table_cells(lines[1]):
+        if cell.startswith(":") and cell.endswith(":"):
+            aligns.append("center")
+        elif cell.endswith(":"):
+            aligns.append("right")
+        elif cell.startswith(":"):
+            aligns.append("left")
+        else:
+            aligns.append(None)
+    head = ParentNode("thead", [table_row_to_html_node(table_cells(lines[0]), "th", aligns)])
+    if len(lines) == 2:
+        return ParentNode("table", [head])
+    rows = [table_row_to_html_node(table_cells(line), "td", aligns) for line in lines[2:]]
+    return ParentNode("table", [head, ParentNode("tbody", rows)])
+
+
+block_registry = BlockRegistry()
+block_registry.register(block_type_paragraph, paragraph_to_html_node)
+block_registry.register(block_type_heading, heading_to_html_node, is_heading, "#")
+block_registry.register(block_type_code, code_to_html_node, is_code, "`~")
+block_registry.register(block_type_quote, quote_to_html_node, is_quote, ">")
+# "- - -" is a rule, not a list
+block_registry.register(block_type_rule, rule_to_html_node, is_rule, "-*_")
+block_registry.register(block_type_ulist, ulist_to_html_node, is_ulist, "*-")
+block_registry.register(block_type_olist, olist_to_html_node, is_olist, "1")
+block_registry.register(block_type_table, table_to_html_node, is_table)
@@ -0,0 +1,172 @@
+import itertools
+import os
+import time
+from datetime import datetime, timezone
+
+front_matter_delimiter = "---"
+
+
+def format_timestamp(mtime_ns):
+    # RFC 3339 in UTC, as used by sitemaps and Atom feeds
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime_ns / 10**9))
+
+
+def parse_front_matter(lines):
+    # A small YAML subset, enough for page headers:
+    #   title: A "quoted" or plain string
+    #   date: 2024-01-05
+    #   tags: [python, web]
+    #   aliases:
+    #     - /old-url/
+    # Lists are either inline in brackets or "- item" lines under an empty
+    # key. Blank lines and "#" comments are skipped.
+    meta = {}
+    list_key = None
+    for line in lines:
+        stripped = line.strip()
+        if stripped == "" or stripped.startswith("#"):
+            continue
+        if list_key is not None and stripped.startswith("- "):
+            meta[list_key].append(parse_scalar(stripped[2:]))
+            continue
+        key, separator, value = stripped.partition(":")
+        if not separator or key.strip() == "":
+            raise ValueError(f"Invalid front matter line: {stripped}")
+        key = key.strip().lower()
+        value = value.strip()
+        list_key = None
+        if value == "":
+            meta[key] = []
+            list_key = key
+        elif value.startswith("[") and value.endswith("]"):
+            meta[key] = [parse_scalar(item) for item in value[1:-1].split(",") if item.strip()]
+        else:
+            meta[key] = parse_scalar(value)
+    return meta
+
+
+def parse_scalar(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    if value in ("true", "false"):
+        return value == "true"
+    return value
+
+
+def read_front_matter(lines):
+    # Consumes the front matter from an iterator of lines, if the first line
+    # opens one that is closed again and parses. Returns (meta, the lines
+    # read ahead that belong to the body). A document that merely starts
+    # with a horizontal rule gets every line read back.
+    first = next(lines, None)
+    if first is None:
+        return {}, []
+    if first.rstrip("\n") != front_matter_delimiter:
+        return {}, [first]
+    header = []
+    for line in lines:
+        if line.rstrip("\n") == front_matter_delimiter:
+            try:
+                return parse_front_matter(header), []
+            except ValueError:
+                return {}, [first, *header, line]
+        header.append(line)
+    return {}, [first, *header]
+
+
+def heading_title(line):
+    # The title from a "# " heading line, or None for any other line
+    if not line.startswith("# "):
+        return None
+    return line[2:].strip()
+
+
+def read_header(path):
+    # Reads the front matter of a markdown file and, when it has no title,
+    # the lines up to the first "# " heading. The rest of the body is never
+    # read.
+    with open(path, "r") as f:
+        meta, body = read_front_matter(f)
+        if "title" not in meta:
+            for line in itertools.chain(body, f):
+                title = heading_title(line)
+                if title is not None:
+                    meta["title"] = title
+                    break
+    return meta
+
+
+def normalize_date(value):
+    # "2024-01-05" or any ISO 8601 date-time -> RFC 3339 in UTC
+    try:
+        date = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}") from None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class MetadataIndex:
+    # What later build stages (sitemap, feed, listings) need to know about
+    # every page, keyed by its markdown path relative to content/: "url",
+    # "title", "updated" (the source mtime) and, from front matter, "date",
+    # "tags" and "description". Only the header of each file is read, and
+    # only when its size or mtime differs from the stored "stat", so a
+    # listing never needs the pages it links to rendered. Stored in the
+    # build manifest under "meta".
+
+    def __init__(self):
+        self.pages = {}
+
+    def load(self, data):
+        self.pages = dict(data)
+
+    def to_dict(self):
+        return self.pages
+
+    def refresh(self, dir_path_content, page_urls):
+        # Brings the index up to date with page_urls ({rel_path: url}) in
+        # one pass. Returns the number of headers read.
+        pages = {}
+        read = 0
+        for rel_path, url in page_urls.items():
+            path = os.path.join(dir_path_content, rel_path)
+            stat = os.stat(path)
+            entry = self.pages.get(rel_path)
+            stat_key = [stat.st_size, stat.st_mtime_ns]
+            if entry is None or entry.get("stat") != stat_key or entry.get("url") != url:
+                try:
+                    entry = page_entry(read_header(path), url, stat_key)
+                except ValueError as e:
+                    raise ValueError(f"{path}: {e}") from e
+                read += 1
+            pages[rel_path] = entry
+        self.pages = pages
+        return read
+
+    def __repr__(self):
+        return f"MetadataIndex(pages={len(self.pages)})"
+
+
+def page_entry(header, url, stat_key):
+    entry = {
+        "url": url,
+        "title": str(header.get("title", url)),
+        "updated": format_timestamp(stat_key[1]),
+        "stat": stat_key,
+    }
+    if "date" in header:
+        entry["date"] = normalize_date(header["date"])
+    tags = header.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    if tags:
+        entry["tags"] = [str(tag) for tag in tags]
+    if "description" in header:
+        entry["description"] = str(header["description"])
+    return entry
+
+
+metadata_index = MetadataIndex()
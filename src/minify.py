@@ -0,0 +1,266 @@
+import re
+import threading
+
+# Whitespace next to these tags never renders: they start or end a block,
+# or aren't displayed at all
+block_tags = {
+    "address", "article", "aside", "base", "blockquote", "body", "br", "dd", "details",
+    "dialog", "div", "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "head", "header", "hgroup", "hr", "html", "li",
+    "link", "main", "meta", "nav", "noscript", "ol", "p", "pre", "script", "section",
+    "style", "summary", "table", "tbody", "td", "tfoot", "th", "thead", "title", "tr", "ul",
+}
+# Whitespace inside these is kept as written
+preserve_tags = {"pre", "code", "textarea"}
+# The content of these is not HTML and is copied through untouched
+raw_text_tags = {"script", "style"}
+special_tags = block_tags | preserve_tags
+# HTML's whitespace; non-breaking spaces and other Unicode spaces are text
+whitespace_pattern = re.compile(r"[ \t\n\r\f]+")
+# Text that has whitespace to collapse
+collapsible_pattern = re.compile(r"[\t\n\r\f]|  ")
+inline_tag_pattern = re.compile(r"(<[^>]*>)")
+# The start of a tag, comment or doctype, with the tag name if any
+tag_start_pattern = re.compile(r"<(?:[!?]|/?([A-Za-z][\w-]*))")
+raw_end_patterns = {name: re.compile("</" + name, re.IGNORECASE) for name in raw_text_tags}
+# Small writes are gathered up to this many characters before being scanned
+write_batch_size = 8192
+
+# One CSS token per match: comments, strings, unquoted url()s, whitespace,
+# and everything else a run at a time
+css_token_pattern = re.compile(
+    r"""(?P<comment>/\*.*?(?:\*/|$))"""
+    r"""|(?P<string>"(?:[^"\\\n]|\\.)*"?|'(?:[^'\\\n]|\\.)*'?)"""
+    r"""|(?P<url>url\(\s*[^\s'")]*\s*\))"""
+    r"""|(?P<space>\s+)"""
+    r"""|(?P<other>[^"'/\s]+|/)""",
+    re.DOTALL | re.IGNORECASE,
+)
+# Whitespace next to these can go. Not before ":" ("a :hover" is not
+# "a:hover") and not around "(" ("and (" is not the function "and(").
+css_tight_before = set("{};,)")
+css_tight_after = set("{};,:(")
+
+
+class Minifier:
+    # Whether pages and stylesheets are minified, and how many bytes that
+    # saved in this process. Pool workers report their counts back.
+
+    def __init__(self):
+        self.enabled = False
+        self.html_saved = 0
+        self.css_saved = 0
+        # Stylesheets are minified on the static sync's threads
+        self.lock = threading.Lock()
+
+    def add_css_saved(self, saved):
+        with self.lock:
+            self.css_saved += saved
+
+    def __repr__(self):
+        return (
+            f"Minifier(enabled={self.enabled}, html_saved={self.html_saved}, "
+            f"css_saved={self.css_saved})"
+        )
+
+
+minifier = Minifier()
+
+
+class HtmlMinifier:
+    # Minifies HTML as it is streamed through write(), chunk by chunk, so
+    # pages are never buffered whole:
+    #  - runs of whitespace collapse to one space, and go entirely next to
+    #    block-level tags, where they wouldn't render anyway
+    #  - comments are dropped, except conditional comments
+    #  - whitespace inside <pre>, <code> and <textarea>, and everything in
+    #    <script> and <style>, is left as is
+    # Only an unfinished tag or comment at the end of a chunk, and text
+    # waiting to see whether a block-level tag follows it, are held back.
+    # Call close() after the last chunk.
+
+    def __init__(self, write):
+        self.out = write
+        self.buffer = ""
+        self.pending = []
+        self.pending_size = 0
+        self.text = []
+        self.after_block = True
+        self.preserve = 0
+        self.raw_end = None
+        self.saved = 0
+
+    def write(self, chunk):
+        # Pages arrive a node at a time; scanning them in batches keeps the
+        # per-call overhead down
+        self.pending.append(chunk)
+        self.pending_size += len(chunk)
+        if self.pending_size >= write_batch_size:
+            self.process(False)
+
+    def close(self):
+        self.process(True)
+        self.flush_text(True)
+        if self.buffer:
+            self.out(self.buffer)
+            self.buffer = ""
+        minifier.html_saved += self.saved
+
+    def process(self, final):
+        buffer = self.buffer + "".join(self.pending)
+        self.pending = []
+        self.pending_size = 0
+        position = 0
+        length = len(buffer)
+        while position < length:
+            if self.raw_end is not None:
+                match = raw_end_patterns[self.raw_end].search(buffer, position)
+                if match is None:
+                    # The end tag may be split across chunks
+                    keep = length if final else max(position, length - len(self.raw_end) - 1)
+                    self.out(buffer[position:keep])
+                    position = keep
+                    break
+                self.out(buffer[position : match.start()])
+                position = match.start()
+                self.raw_end = None
+                continue
+            # Other tags pass through as part of the text around them;
+            # only comments, doctypes and the tags above are stopped at
+            scan = position
+            while True:
+                match = tag_start_pattern.search(buffer, scan)
+                if match is None:
+                    break
+                name = match.group(1)
+                if name is None or name.lower() in special_tags:
+                    break
+                scan = match.end()
+            if match is None:
+                # Text and inline tags up to an unfinished tag, if any
+                end = length
+                if not final:
+                    start = buffer.rfind("<", position)
+                    if start != -1 and buffer.find(">", start) == -1:
+                        end = start
+                self.add_text(buffer[position:end])
+                position = end
+                break
+            start = match.start()
+            if start > position:
+                self.add_text(buffer[position:start])
+                position = start
+            if buffer.startswith("<!--", position):
+                end = buffer.find("-->", position + 4)
+                if end == -1:
+                    break
+                comment = buffer[position : end + 3]
+                if comment.startswith("<!--[if"):
+                    self.add_tag(comment, None)
+                else:
+                    self.saved += len(comment.encode("utf-8"))
+                position = end + 3
+                continue
+            end = buffer.find(">", position)
+            if end == -1:
+                break
+            self.add_tag(buffer[position : end + 1], name.lower() if name else None)
+            position = end + 1
+        self.buffer = buffer[position:]
+
+    def add_text(self, text):
+        if not text:
+            return
+        if self.preserve:
+            self.out(text)
+        else:
+            self.text.append(text)
+
+    def flush_text(self, before_block):
+        if not self.text:
+            return
+        text = "".join(self.text)
+        self.text = []
+        collapsed = text
+        if collapsible_pattern.search(text):
+            # Inline tags are in the text; their attributes are left alone
+            parts = inline_tag_pattern.split(text)
+            for i in range(0, len(parts), 2):
+                parts[i] = whitespace_pattern.sub(" ", parts[i])
+            collapsed = "".join(parts)
+        if self.after_block:
+            collapsed = collapsed.lstrip(" ")
+        if before_block:
+            collapsed = collapsed.rstrip(" ")
+        # Only ASCII whitespace was removed, one byte per character
+        self.saved += len(text) - len(collapsed)
+        if collapsed:
+            self.out(collapsed)
+            self.after_block = False
+
+    def add_tag(self, tag, name):
+        # Tags without a name (doctype, conditional comments) count as
+        # block-level
+        block = name is None or name in block_tags
+        self.flush_text(block)
+        self.out(tag)
+        self.after_block = block
+        if name is None:
+            return
+        closing = tag.startswith("</")
+        if name in preserve_tags:
+            if closing:
+                self.preserve = max(0, self.preserve - 1)
+            elif not tag.endswith("/>"):
+                self.preserve += 1
+        elif name in raw_text_tags and not closing:
+            self.raw_end = name
+
+
+def minify_html(html):
+    chunks = []
+    html_minifier = HtmlMinifier(chunks.append)
+    html_minifier.write(html)
+    html_minifier.close()
+    return "".join(chunks)
+
+
+def minify_css(css):
+    # Drops comments (except /*! ... */ notices) and the whitespace that
+    # doesn't separate tokens, and the last ";" of every block. Strings and
+    # unquoted url()s are copied as they are.
+    out = []
+    pending_space = False
+    for match in css_token_pattern.finditer(css):
+        kind = match.lastgroup
+        token = match.group()
+        if kind == "comment":
+            if token.startswith("/*!"):
+                out.append(token)
+            else:
+                # A comment separates tokens like whitespace does
+                pending_space = True
+            continue
+        if kind == "space":
+            pending_space = True
+            continue
+        if pending_space:
+            if out and out[-1][-1] not in css_tight_after and token[0] not in css_tight_before:
+                out.append(" ")
+            pending_space = False
+        if token[0] == "}" and out and out[-1] == ";":
+            out.pop()
+        if kind == "other" and len(token) > 1:
+            # Punctuation inside a run still needs splitting so ";" and
+            # "}" can be looked at on their own
+            for piece in re.split(r"([{};,:()])", token):
+                if not piece:
+                    continue
+                if piece == "}" and out and out[-1] == ";":
+                    out.pop()
+                out.append(piece)
+            continue
+        out.append(token)
+    text = "".join(out)
+    minifier.add_css_saved(len(css.encode("utf-8")) - len(text.encode("utf-8")))
+    return text
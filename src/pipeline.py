@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PipelineConfig:
+    # Settings of the concurrent page pipeline (--pipeline). Read and write
+    # concurrency is the number of files in flight on each side; the queues
+    # between stages hold at most queue_size pages, so a slow stage holds
+    # back the ones before it instead of letting pages pile up in memory.
+
+    def __init__(self, read_concurrency=16, write_concurrency=16, queue_size=64):
+        self.enabled = False
+        self.read_concurrency = read_concurrency
+        self.write_concurrency = write_concurrency
+        self.queue_size = queue_size
+
+    def __repr__(self):
+        return (
+            f"PipelineConfig(enabled={self.enabled}, read_concurrency={self.read_concurrency}, "
+            f"write_concurrency={self.write_concurrency}, queue_size={self.queue_size})"
+        )
+
+
+pipeline_config = PipelineConfig()
+
+end_of_stage = object()
+
+
+def positive_int(value):
+    # argparse type of --read-concurrency, --write-concurrency and
+    # --queue-size, checked before the build touches public/
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    return number
+
+
+def run_pipeline(items, stages, queue_size):
+    # Runs items through stages, a list of (func, concurrency) pairs, and
+    # returns the results of the last stage in no particular order. Each
+    # stage runs `concurrency` tasks; func is a coroutine function taking
+    # the previous stage's result. The first exception cancels everything
+    # and is raised.
+    if queue_size < 1 or any(concurrency < 1 for _, concurrency in stages):
+        raise ValueError("Pipeline queue size and stage concurrency must be at least 1")
+    return asyncio.run(run_stages(items, stages, queue_size))
+
+
+async def run_stages(items, stages, queue_size):
+    queues = [asyncio.Queue(queue_size) for _ in stages]
+    results = []
+
+    async def feed():
+        for item in items:
+            await queues[0].put(item)
+        await close(queues[0], stages[0][1])
+
+    async def close(queue, consumers):
+        for _ in range(consumers):
+            await queue.put(end_of_stage)
+
+    async def work(func, queue_in, queue_out):
+        while True:
+            item = await queue_in.get()
+            if item is end_of_stage:
+                return
+            result = await func(item)
+            if queue_out is None:
+                results.append(result)
+            else:
+                await queue_out.put(result)
+
+    async def run_stage(index):
+        func, concurrency = stages[index]
+        queue_out = queues[index + 1] if index + 1 < len(stages) else None
+        await asyncio.gather(
+            *(work(func, queues[index], queue_out) for _ in range(concurrency))
+        )
+        if queue_out is not None:
+            await close(queue_out, stages[index + 1][1])
+
+    tasks = [asyncio.ensure_future(feed())]
+    tasks += [asyncio.ensure_future(run_stage(index)) for index in range(len(stages))]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return results
+
+
+def io_executor(config):
+    # Blocking reads and writes run on their own threads, so a latency-bound
+    # filesystem never stalls the event loop or the render stage
+    return ThreadPoolExecutor(max_workers=config.read_concurrency + config.write_concurrency)
@@ -0,0 +1,228 @@
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+# The profiler of the current process, or None when --profile is off. Stage
+# hooks in the pipeline check it, so profiling costs nothing when disabled.
+active = None
+
+disabled = nullcontext()
+end_of_items = object()
+
+
+def start():
+    global active
+    active = Profiler()
+    return active
+
+
+def stop():
+    global active
+    profiler = active
+    active = None
+    return profiler
+
+
+def stage(name):
+    if active is None:
+        return disabled
+    return active.stage(name)
+
+
+def page(path):
+    if active is None:
+        return disabled
+    return active.page(path)
+
+
+class Profiler:
+    # Records exclusive wall and CPU time per stage: while a nested stage
+    # runs (e.g. "inline" inside "block_to_html"), its time is not charged
+    # to the outer stage. Stages inside a page are recorded on that page;
+    # the rest are build-level stages such as "static_copy".
+
+    def __init__(self):
+        self.build_stages = {}
+        self.pages = []
+        self.current_page = None
+        self.stack = []
+        self.last_wall = time.perf_counter()
+        self.last_cpu = time.process_time()
+        self.start_wall = self.last_wall
+        self.events = []
+
+    def charge(self):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if self.stack:
+            stages = self.build_stages if self.current_page is None else self.current_page["stages"]
+            totals = stages.setdefault(self.stack[-1], [0.0, 0.0])
+            totals[0] += wall - self.last_wall
+            totals[1] += cpu - self.last_cpu
+        self.last_wall = wall
+        self.last_cpu = cpu
+        return wall
+
+    def stage(self, name):
+        return StageTimer(self, name)
+
+    @contextmanager
+    def page(self, path):
+        self.charge()
+        start_wall = self.last_wall
+        start_cpu = self.last_cpu
+        outer_stack = self.stack
+        self.stack = ["other"]
+        self.current_page = {"path": path, "wall": 0.0, "cpu": 0.0, "stages": {}}
+        try:
+            yield
+        finally:
+            self.charge()
+            record = self.current_page
+            record["wall"] = self.last_wall - start_wall
+            record["cpu"] = self.last_cpu - start_cpu
+            self.current_page = None
+            self.stack = outer_stack
+            self.pages.append(record)
+            self.add_event(path, start_wall, self.last_wall, record["stages"])
+
+    def iter_stage(self, name, iterable):
+        # Charges the time spent producing each item to the named stage
+        iterator = iter(iterable)
+        stack = self.stack
+        while True:
+            self.charge()
+            stack.append(name)
+            item = next(iterator, end_of_items)
+            self.charge()
+            stack.pop()
+            if item is end_of_items:
+                return
+            yield item
+
+    def write_stage(self, name, write):
+        return StageWriter(self, name, write)
+
+    def add_event(self, name, start_wall, end_wall, stages=None):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": start_wall * 1e6,
+            "dur": (end_wall - start_wall) * 1e6,
+            "pid": os.getpid(),
+            "tid": 0,
+        }
+        if stages:
+            event["args"] = {key: round(value[0] * 1e6) for key, value in stages.items()}
+        self.events.append(event)
+
+    def pop_page(self):
+        # Hands a worker's page record (and its trace event) to the parent
+        return self.pages.pop(), self.events.pop()
+
+    def add_page(self, record, event):
+        self.pages.append(record)
+        self.events.append(event)
+
+    def report(self):
+        # Build stages (e.g. static_copy, content) run in this process and
+        # can overlap with pages rendered by workers, so they are reported
+        # separately from the page stages summed over every page.
+        page_stages = {}
+        for record in self.pages:
+            for key, value in record["stages"].items():
+                totals = page_stages.setdefault(key, [0.0, 0.0])
+                totals[0] += value[0]
+                totals[1] += value[1]
+        return {
+            "wall": time.perf_counter() - self.start_wall,
+            "build_stages": stage_times(self.build_stages),
+            "page_stages": stage_times(page_stages),
+            "pages": [
+                {
+                    "path": record["path"],
+                    "wall": record["wall"],
+                    "cpu": record["cpu"],
+                    "stages": stage_times(record["stages"]),
+                }
+                for record in self.pages
+            ],
+        }
+
+    def write_report(self, path):
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+        return report
+
+    def write_trace(self, path):
+        # Chrome trace-event format, viewable in chrome://tracing or Perfetto
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events}, f)
+
+
+class StageTimer:
+    __slots__ = ("profiler", "name", "start_wall")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start_wall = self.profiler.charge()
+        self.profiler.stack.append(self.name)
+
+    def __exit__(self, *exc_info):
+        profiler = self.profiler
+        end_wall = profiler.charge()
+        profiler.stack.pop()
+        if not profiler.stack:
+            profiler.add_event(self.name, self.start_wall, end_wall)
+
+
+class StageWriter:
+    # Collects the many small chunks of a streamed page and writes them in
+    # large batches, so the "write" stage measures I/O rather than the cost
+    # of timing every chunk. Call flush() before closing the file.
+
+    def __init__(self, profiler, name, write, buffer_size=65536):
+        self.profiler = profiler
+        self.name = name
+        self.write = write
+        self.buffer_size = buffer_size
+        self.chunks = []
+        self.size = 0
+
+    def __call__(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        with self.profiler.stage(self.name):
+            self.write("".join(self.chunks))
+        self.chunks = []
+        self.size = 0
+
+
+def stage_times(stages):
+    return {key: {"wall": value[0], "cpu": value[1]} for key, value in stages.items()}
+
+
+def format_report(report, top=10):
+    lines = [f"Build took {report['wall']:.3f}s"]
+    for title, stages in (
+        ("build stage", report["build_stages"]),
+        ("page stage (all pages)", report["page_stages"]),
+    ):
+        lines += ["", f"{title:<24} {'wall':>10} {'cpu':>10}"]
+        for name, times in sorted(stages.items(), key=lambda item: -item[1]["wall"]):
+            lines.append(f"{name:<24} {times['wall']:>9.3f}s {times['cpu']:>9.3f}s")
+    pages = sorted(report["pages"], key=lambda record: -record["wall"])[:top]
+    if pages:
+        lines += ["", f"Slowest {len(pages)} pages:", f"{'wall':>10} {'cpu':>10}  path"]
+        for record in pages:
+            lines.append(f"{record['wall']:>9.3f}s {record['cpu']:>9.3f}s  {record['path']}")
+    return "\n".join(lines)
@@ -0,0 +1,224 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+
+from markdown_blocks import block_type_heading, heading_anchor, heading_text
+
+# Link and image URLs are not searchable text; their labels are
+url_pattern = re.compile(r"\]\([^)]*\)")
+term_pattern = re.compile(r"\w\w+")
+
+index_magic = b"SSGI\x01"
+search_dir_name = "search"
+index_filename = "index.bin"
+docs_filename = "docs.json"
+
+
+def block_terms(block, counts):
+    # Adds the lowercased words of a raw markdown block to the Counter
+    # counts. Markup characters never match \w, so only URLs need to be
+    # removed first.
+    text = block.lower()
+    if "](" in text:
+        text = url_pattern.sub(" ", text)
+    counts.update(term_pattern.findall(text))
+
+
+def collect_sections(blocks, sections, title):
+    # Passes (block, block_type) pairs through unchanged while splitting the
+    # page into sections at every heading: [anchor, heading, {term: count}].
+    # Anchors match the heading ids markdown_blocks_to_html writes with
+    # heading_ids=True. Text before the first heading goes to a section
+    # with no anchor, titled with the page title.
+    used_anchors = set()
+    counts = Counter()
+    sections.append(["", title, counts])
+    for block, block_type in blocks:
+        if block_type == block_type_heading:
+            text = heading_text(block)
+            counts = Counter()
+            sections.append([heading_anchor(text, used_anchors), text, counts])
+        block_terms(block, counts)
+        yield block, block_type
+    if not sections[0][2]:
+        del sections[0]
+
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class SearchIndex:
+    # Collects the sections of every page as pages are generated and writes
+    # the client-side index to public/search/:
+    #  - docs.json: [url, title] for every section, the url including the
+    #    heading anchor
+    #  - index.bin: the inverted index. After index_magic come the number
+    #    of documents and of terms, then for every term in sorted order:
+    #    its UTF-8 length and bytes, the number of postings, the byte length
+    #    of the postings, and the postings themselves as (document id delta,
+    #    term count) pairs. All integers are LEB128 varints, and the ids
+    #    ascend, so the deltas are small.
+    # Sections are kept per page (in public/.search.json between builds), so
+    # an incremental build only re-reads the pages it regenerates.
+
+    def __init__(self):
+        self.enabled = False
+        self.pages = {}
+
+    def set_page(self, rel_path, url, sections):
+        self.pages[rel_path] = [url, sections]
+
+    def remove_page(self, rel_path):
+        self.pages.pop(rel_path, None)
+
+    def clear(self):
+        self.pages = {}
+
+    def load(self, path):
+        try:
+            with open(path, "r") as f:
+                self.pages = json.load(f)
+        except (OSError, ValueError):
+            # A missing or corrupt file just means every page is reindexed
+            self.pages = {}
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.pages, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def build(self):
+        # Returns the document table and {term: [(doc_id, count), ...]}
+        docs = []
+        postings = {}
+        for rel_path in sorted(self.pages):
+            url, sections = self.pages[rel_path]
+            for anchor, title, counts in sections:
+                doc_id = len(docs)
+                docs.append([f"{url}#{anchor}" if anchor else url, title])
+                for term, count in counts.items():
+                    postings.setdefault(term, []).append((doc_id, count))
+        return docs, postings
+
+    def write(self, dest_dir_path):
+        docs, postings = self.build()
+        search_dir = os.path.join(dest_dir_path, search_dir_name)
+        os.makedirs(search_dir, exist_ok=True)
+        out = bytearray(index_magic)
+        encode_varint(len(docs), out)
+        encode_varint(len(postings), out)
+        for term in sorted(postings):
+            term_bytes = term.encode("utf-8")
+            encode_varint(len(term_bytes), out)
+            out += term_bytes
+            encoded = bytearray()
+            previous = 0
+            for doc_id, count in postings[term]:
+                encode_varint(doc_id - previous, encoded)
+                encode_varint(count, encoded)
+                previous = doc_id
+            encode_varint(len(postings[term]), out)
+            encode_varint(len(encoded), out)
+            out += encoded
+        with open(os.path.join(search_dir, index_filename), "wb") as f:
+            f.write(out)
+        with open(os.path.join(search_dir, docs_filename), "w") as f:
+            json.dump(docs, f, separators=(",", ":"))
+        return len(docs), len(postings), len(out)
+
+    def __repr__(self):
+        return f"SearchIndex(enabled={self.enabled}, pages={len(self.pages)})"
+
+
+search_index = SearchIndex()
+
+
+class SearchReader:
+    # Reads index.bin the way a client would: the term table is read once,
+    # and postings are only decoded for the terms of a query.
+
+    def __init__(self, search_dir):
+        with open(os.path.join(search_dir, index_filename), "rb") as f:
+            data = f.read()
+        with open(os.path.join(search_dir, docs_filename), "r") as f:
+            self.docs = json.load(f)
+        if not data.startswith(index_magic):
+            raise ValueError("Not a search index")
+        self.data = data
+        position = len(index_magic)
+        self.doc_count, position = decode_varint(data, position)
+        term_count, position = decode_varint(data, position)
+        # term -> (number of postings, start, end) within data
+        self.terms = {}
+        for _ in range(term_count):
+            length, position = decode_varint(data, position)
+            term = data[position : position + length].decode("utf-8")
+            position += length
+            count, position = decode_varint(data, position)
+            size, position = decode_varint(data, position)
+            self.terms[term] = (count, position, position + size)
+            position += size
+
+    def postings(self, term):
+        # Returns {doc_id: count} for term
+        entry = self.terms.get(term)
+        if entry is None:
+            return {}
+        _, position, end = entry
+        data = self.data
+        postings = {}
+        doc_id = 0
+        while position < end:
+            delta, position = decode_varint(data, position)
+            count, position = decode_varint(data, position)
+            doc_id += delta
+            postings[doc_id] = count
+        return postings
+
+    def search(self, query, limit=10):
+        # Sections containing every term of the query, best tf-idf first,
+        # as (url, title, score). The rarest term is decoded first, and
+        # the candidates shrink with every further term.
+        terms = sorted(
+            set(term_pattern.findall(query.lower())),
+            key=lambda term: self.terms.get(term, (0,))[0],
+        )
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            postings = self.postings(term)
+            if not postings:
+                return []
+            idf = math.log(1 + self.doc_count / len(postings))
+            if scores is None:
+                scores = {doc_id: count * idf for doc_id, count in postings.items()}
+            else:
+                scores = {
+                    doc_id: score + postings[doc_id] * idf
+                    for doc_id, score in scores.items()
+                    if doc_id in postings
+                }
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(*self.docs[doc_id], score) for doc_id, score in ranked]
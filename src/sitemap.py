@@ -0,0 +1,95 @@
+import logging
+import os
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+# Sitemaps may list at most 50,000 URLs each; above that they are split into
+# shards listed by a sitemap index
+max_sitemap_urls = 50000
+sitemap_filename = "sitemap.xml"
+feed_filename = "feed.xml"
+sitemap_namespace = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+logger = logging.getLogger(__name__)
+
+
+def absolute_url(site_url, url):
+    return escape(site_url.rstrip("/") + quote(url, safe="/#%"))
+
+
+def write_sitemap(pages, site_url, dest_dir_path, max_urls=max_sitemap_urls):
+    # Writes sitemap.xml for the given page metadata in one streaming pass,
+    # or sitemap-1.xml, sitemap-2.xml... and a sitemap index named
+    # sitemap.xml when there are more than max_urls pages. Returns the
+    # names of the files written.
+    pages = sorted(pages, key=lambda meta: meta["url"])
+    if len(pages) <= max_urls:
+        write_urlset(pages, site_url, os.path.join(dest_dir_path, sitemap_filename))
+        return [sitemap_filename]
+    shards = []
+    for start in range(0, len(pages), max_urls):
+        shard = pages[start : start + max_urls]
+        filename = f"sitemap-{len(shards) + 1}.xml"
+        write_urlset(shard, site_url, os.path.join(dest_dir_path, filename))
+        shards.append((filename, max(meta["updated"] for meta in shard)))
+    with open(os.path.join(dest_dir_path, sitemap_filename), "w") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{sitemap_namespace}">\n')
+        for filename, updated in shards:
+            f.write(
+                f"<sitemap><loc>{absolute_url(site_url, '/' + filename)}</loc>"
+                f"<lastmod>{updated}</lastmod></sitemap>\n"
+            )
+        f.write("</sitemapindex>\n")
+    return [filename for filename, _ in shards] + [sitemap_filename]
+
+
+def remove_sitemap_files(old_files, files, dest_dir_path):
+    # Removes the sitemap and feed files of an earlier build that this one
+    # didn't write, such as shards past the new page count
+    for filename in sorted(set(old_files) - set(files)):
+        path = os.path.join(dest_dir_path, filename)
+        if os.path.exists(path):
+            logger.debug(" * removing %s", path)
+            os.remove(path)
+
+
+def write_urlset(pages, site_url, path):
+    with open(path, "w") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{sitemap_namespace}">\n')
+        for meta in pages:
+            f.write(
+                f"<url><loc>{absolute_url(site_url, meta['url'])}</loc>"
+                f"<lastmod>{meta['updated']}</lastmod></url>\n"
+            )
+        f.write("</urlset>\n")
+
+
+def feed_date(meta):
+    # The front matter date when there is one, else the source mtime
+    return meta.get("date") or meta["updated"]
+
+
+def write_feed(pages, site_url, dest_dir_path, title, limit=20):
+    # Writes an Atom feed of the `limit` most recent pages
+    entries = sorted(pages, key=lambda meta: (feed_date(meta), meta["url"]), reverse=True)[:limit]
+    feed_url = absolute_url(site_url, "/" + feed_filename)
+    updated = feed_date(entries[0]) if entries else "1970-01-01T00:00:00Z"
+    with open(os.path.join(dest_dir_path, feed_filename), "w") as f:
+        f.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+            f"<title>{escape(title)}</title>\n"
+            f'<link href="{absolute_url(site_url, "/")}"/>\n'
+            f'<link rel="self" href="{feed_url}"/>\n'
+            f"<id>{absolute_url(site_url, '/')}</id>\n"
+            f"<updated>{updated}</updated>\n"
+            f"<author><name>{escape(title)}</name></author>\n"
+        )
+        for meta in entries:
+            url = absolute_url(site_url, meta["url"])
+            f.write(
+                f"<entry><title>{escape(meta['title'])}</title>"
+                f'<link href="{url}"/><id>{url}</id>'
+                f"<updated>{feed_date(meta)}</updated></entry>\n"
+            )
+        f.write("</feed>\n")
@@ -0,0 +1,58 @@
+import os
+import re
+
+slot_pattern = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class Template:
+    # A template split once into static segments and named slots, e.g.
+    # "<title>{{ Title }}</title>" -> segments ["<title>", "</title>"], slots ["Title"].
+    # Rendering is a single join, no matter how many slots there are.
+
+    def __init__(self, source):
+        self.segments = []
+        self.slots = []
+        position = 0
+        for match in slot_pattern.finditer(source):
+            self.segments.append(source[position : match.start()])
+            self.slots.append(match.group(1))
+            position = match.end()
+        self.segments.append(source[position:])
+
+    def render(self, values):
+        parts = []
+        self.render_to(parts.append, values)
+        return "".join(parts)
+
+    def render_to(self, write, values):
+        # Slot values are strings, or callables that stream their own output
+        # to write (e.g. HTMLNode.render_to). Missing slots render as "".
+        write(self.segments[0])
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(slot, "")
+            if callable(value):
+                value(write)
+            else:
+                write(value)
+            write(segment)
+
+    def __repr__(self):
+        return f"Template(slots={self.slots})"
+
+
+compiled_templates = {}
+
+
+def load_template(template_path):
+    # Compiles each template file once per process. The cache is keyed on the
+    # file's mtime and size so an edited template is picked up again.
+    path = os.path.abspath(template_path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = compiled_templates.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with open(path, "r") as f:
+        template = Template(f.read())
+    compiled_templates[path] = (version, template)
+    return template
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from block_cache import BlockCache, block_cache
+from markdown_blocks import markdown_blocks_to_html, markdown_to_blocks, block_to_block_type
+
+
+def render(markdown):
+    chunks = []
+    blocks = [(block, block_to_block_type(block)) for block in markdown_to_blocks(markdown)]
+    markdown_blocks_to_html(blocks, chunks.append)
+    return "".join(chunks)
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_round_trip(self):
+        # Test that a stored block is read back by a new cache on the same directory
+        with tempfile.TemporaryDirectory() as tmp:
+            BlockCache(tmp, min_length=0).put("**bold**", "<p><b>bold</b></p>")
+            cache = BlockCache(tmp, min_length=0)
+            self.assertEqual(cache.get("**bold**"), "<p><b>bold</b></p>")
+            self.assertIsNone(cache.get("other"))
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_renderer_version_is_part_of_key(self):
+        # Test that entries from another renderer version are not served
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = BlockCache(tmp, min_length=0)
+            cache.put("text", "<p>text</p>")
+            cache.version = "other"
+            self.assertIsNone(cache.get("text"))
+
+    def test_short_blocks_not_cached(self):
+        # Test that blocks under min_length are rendered, not cached
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = BlockCache(tmp, min_length=10)
+            cache.put("short", "<p>short</p>")
+            self.assertIsNone(cache.get("short"))
+            self.assertEqual(os.listdir(tmp), [])
+
+    def test_evict_least_recently_used(self):
+        # Test that eviction removes the oldest entries until under max_bytes
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = BlockCache(tmp, max_bytes=250, min_length=0)
+            for i, block in enumerate(("a", "b", "c")):
+                cache.put(block, "x" * 100)
+                os.utime(cache.entry_path(block), ns=(i * 10**9, i * 10**9))
+            self.assertEqual(cache.evict(), 100)
+            self.assertIsNone(cache.get("a"))
+            self.assertIsNotNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("c"))
+
+    def test_disabled(self):
+        # Test that a cache without a directory does nothing
+        cache = BlockCache()
+        cache.put("text" * 200, "html")
+        self.assertIsNone(cache.get("text" * 200))
+        self.assertEqual(cache.evict(), 0)
+
+
+class TestCachedBlocks(unittest.TestCase):
+    def tearDown(self):
+        block_cache.close()
+        block_cache.hits = block_cache.misses = 0
+
+    def test_same_html_from_cache(self):
+        # Test that a page renders identically with its blocks served from the cache
+        markdown = "# Title\n\n" + "\n".join(f"- item **{i}**" for i in range(100)) + "\n\nshort"
+        expected = render(markdown)
+        with tempfile.TemporaryDirectory() as tmp:
+            block_cache.open(tmp)
+            self.assertEqual(render(markdown), expected)
+            self.assertEqual(render(markdown), expected)
+            self.assertEqual((block_cache.hits, block_cache.misses), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
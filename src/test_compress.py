@@ -0,0 +1,60 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import brotli, compress_tree, remove_variants
+
+
+class TestCompressTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        os.makedirs(os.path.join(self.dir, "blog"))
+        self.page = os.path.join(self.dir, "blog", "index.html")
+        self.write(self.page, "<p>hello</p>" * 200)
+        self.write(os.path.join(self.dir, "small.css"), "p{}")
+        self.write(os.path.join(self.dir, "image.png"), "x" * 5000)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_writes_gzip_variants_above_threshold(self):
+        # Test that only compressible files above the size threshold get a .gz sibling
+        compress_tree(self.dir)
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 200)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "small.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "image.png.gz")))
+        self.assertEqual(os.stat(self.page + ".gz").st_mtime_ns, os.stat(self.page).st_mtime_ns)
+
+    def test_skips_unchanged_files(self):
+        # Test that a second run does not rewrite variants of unchanged files
+        compress_tree(self.dir)
+        self.assertEqual(compress_tree(self.dir), (0, 0))
+
+    def test_removes_stale_variants(self):
+        # Test that variants of deleted sources are removed and other .gz files are kept
+        compress_tree(self.dir)
+        self.write(os.path.join(self.dir, "archive.tar.gz"), "not ours")
+        os.remove(self.page)
+        compress_tree(self.dir)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "archive.tar.gz")))
+
+    def test_remove_variants(self):
+        # Test that only variants of compressible files are removed
+        compress_tree(self.dir)
+        self.write(os.path.join(self.dir, "archive.tar.gz"), "not ours")
+        self.assertEqual(remove_variants(self.dir), 1 if brotli is None else 2)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+        self.assertTrue(os.path.exists(self.page))
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "archive.tar.gz")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from copystatic import sync_file, sync_files
+
+
+class TestSyncFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.css = os.path.join(self.static, "index.css")
+        self.image = os.path.join(self.static, "images", "a.png")
+        self.write(self.css, "p {}")
+        self.write(self.image, "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_copies_and_preserves_mtime(self):
+        # Test that files are copied with their source mtime and listed in the entries
+        entries = sync_files(self.static, self.public, {})
+        dest = os.path.join(self.public, "images", "a.png")
+        self.assertEqual(self.read(dest), "png")
+        self.assertEqual(os.stat(dest).st_mtime_ns, os.stat(self.image).st_mtime_ns)
+        self.assertEqual(sorted(entries), ["images/a.png", "index.css"])
+
+    def test_skips_current_files(self):
+        # Test that unchanged files are not rewritten and changed ones are
+        entries = sync_files(self.static, self.public, {})
+        dest_image = os.path.join(self.public, "images", "a.png")
+        inode = os.stat(dest_image).st_ino
+        self.write(self.css, "body {}")
+        sync_files(self.static, self.public, entries)
+        self.assertEqual(os.stat(dest_image).st_ino, inode)
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body {}")
+
+    def test_deletes_stale_files_only(self):
+        # Test that removed static files are deleted but generated pages are kept
+        entries = sync_files(self.static, self.public, {})
+        page = os.path.join(self.public, "index.html")
+        self.write(page, "<html>")
+        os.remove(self.image)
+        sync_files(self.static, self.public, entries)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images", "a.png")))
+        self.assertTrue(os.path.exists(page))
+
+    def test_checksum_fixes_mtime_without_copying(self):
+        # Test that with checksum=True a touched but identical file only gets its mtime fixed
+        entries = sync_files(self.static, self.public, {})
+        dest_css = os.path.join(self.public, "index.css")
+        inode = os.stat(dest_css).st_ino
+        os.utime(self.css, ns=(0, 10**18))
+        sync_files(self.static, self.public, entries, checksum=True)
+        self.assertEqual(os.stat(dest_css).st_ino, inode)
+        self.assertEqual(os.stat(dest_css).st_mtime_ns, 10**18)
+
+    def test_transforms(self):
+        # Test that transformed files are written through their function and kept while current
+        entries = sync_files(self.static, self.public, {}, transforms={".css": str.upper})
+        dest_css = os.path.join(self.public, "index.css")
+        self.assertEqual(self.read(dest_css), "P {}")
+        self.assertEqual(self.read(os.path.join(self.public, "images", "a.png")), "png")
+        inode = os.stat(dest_css).st_ino
+        sync_files(self.static, self.public, entries, transforms={".css": str.upper})
+        self.assertEqual(os.stat(dest_css).st_ino, inode)
+
+    def test_hardlink_mode(self):
+        # Test that hardlink mode links the destination to the source
+        dest = os.path.join(self.public, "index.css")
+        sync_file(self.css, dest, "hardlink")
+        self.assertTrue(os.path.samefile(self.css, dest))
+
+    def test_reflink_mode_falls_back(self):
+        # Test that reflink mode produces a correct copy even where reflinks are unsupported
+        dest = os.path.join(self.public, "index.css")
+        sync_file(self.css, dest, "reflink")
+        self.assertEqual(self.read(dest), "p {}")
+        self.assertFalse(os.path.samefile(self.css, dest))
+
+    def test_invalid_link_mode(self):
+        # Test that an unknown link mode raises a ValueError
+        with self.assertRaises(ValueError):
+            sync_file(self.css, os.path.join(self.public, "x"), "symlink")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import discovery
+from discovery import scan_tree, stat_tree
+
+
+class TestScanTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        for rel_path in ("b.md", "a/z.md", "a/b/c.md", "a-b.md"):
+            self.write(rel_path, "text")
+        self.racy_window_ns = discovery.racy_window_ns
+        # Trust every listing, even ones written a moment ago
+        discovery.racy_window_ns = -(10**18)
+
+    def tearDown(self):
+        discovery.racy_window_ns = self.racy_window_ns
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_sorted_relative_paths(self):
+        # Test that every file is listed once, sorted and "/"-separated
+        files, snapshot = scan_tree(self.root)
+        self.assertEqual(files, ["a-b.md", "a/b/c.md", "a/z.md", "b.md"])
+        self.assertEqual(snapshot["a"][1:], [["z.md"], ["b"]])
+
+    def test_missing_root(self):
+        # Test that a missing directory has no files
+        self.assertEqual(scan_tree(os.path.join(self.root, "missing")), ([], {}))
+
+    def test_snapshot_reuses_unchanged_listing(self):
+        # Test that a directory whose mtime matches the snapshot is not listed again
+        _, snapshot = scan_tree(self.root)
+        snapshot["a/b"][1] = ["cached.md"]
+        files, _ = scan_tree(self.root, snapshot)
+        self.assertIn("a/b/cached.md", files)
+        self.assertNotIn("a/b/c.md", files)
+
+    def test_snapshot_sees_changes_in_nested_directory(self):
+        # Test that a file added deep in the tree is found although its parents are unchanged
+        _, snapshot = scan_tree(self.root)
+        self.write("a/b/new.md", "text")
+        os.utime(os.path.join(self.root, "a", "b"), ns=(1, 1))
+        files, _ = scan_tree(self.root, snapshot)
+        self.assertIn("a/b/new.md", files)
+
+    def test_recent_directories_are_rescanned(self):
+        # Test that listings inside the racy window are not trusted by the next scan
+        discovery.racy_window_ns = 10**18
+        _, snapshot = scan_tree(self.root)
+        self.assertEqual(snapshot["a"][0], -1)
+
+    def test_stat_tree(self):
+        # Test that file sizes and mtimes are reported, also for reused listings
+        entries, snapshot = stat_tree(self.root)
+        self.assertEqual(list(entries), ["a-b.md", "a/b/c.md", "a/z.md", "b.md"])
+        self.assertEqual(entries["b.md"][0], 4)
+        stat = os.stat(os.path.join(self.root, "a"))
+        self.write("a/z.md", "longer text")
+        os.utime(os.path.join(self.root, "a"), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        entries, _ = stat_tree(self.root, snapshot)
+        self.assertEqual(entries["a/z.md"][0], 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
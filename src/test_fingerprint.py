@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+
+from fingerprint import AssetFingerprints, asset_fingerprints, fingerprinted_name
+from markdown_blocks import markdown_to_html_node
+
+
+class TestAssetFingerprints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        os.makedirs(os.path.join(self.static, "css"))
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write("images/a.png", "png")
+        self.write("css/site.css", 'body { background: url("../images/a.png"); }')
+        self.write("robots.txt", "User-agent: *")
+        self.entries = {"css/site.css": [1, 1], "images/a.png": [3, 1], "robots.txt": [13, 1]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        asset_fingerprints.enabled = False
+        asset_fingerprints.assets = {}
+        asset_fingerprints.page_url = "/"
+
+    def write(self, rel_path, text):
+        with open(os.path.join(self.static, rel_path), "w") as f:
+            f.write(text)
+
+    def test_fingerprinted_name(self):
+        # Test that the short hash goes before the extension
+        self.assertEqual(fingerprinted_name("images/a.png", "1f2e3d4c5b"), "images/a.1f2e3d4c.png")
+
+    def test_refresh_reuses_digests(self):
+        # Test that unchanged files keep their fingerprint without being hashed again
+        fingerprints = AssetFingerprints()
+        fingerprints.refresh(self.static, self.entries)
+        assets = dict(fingerprints.assets)
+        self.assertEqual(sorted(assets), ["css/site.css", "images/a.png"])
+        self.write("images/a.png", "changed, but size and mtime say it isn't")
+        self.assertEqual(fingerprints.refresh(self.static, self.entries), 0)
+        self.assertEqual(fingerprints.assets, assets)
+
+    def test_stylesheet_follows_its_images(self):
+        # Test that CSS url()s are rewritten and the stylesheet is renamed when an image changes
+        fingerprints = AssetFingerprints()
+        fingerprints.refresh(self.static, self.entries)
+        image_name = os.path.basename(fingerprints.assets["images/a.png"])
+        self.assertEqual(
+            fingerprints.css_text["css/site.css"],
+            f'body {{ background: url("../images/{image_name}"); }}',
+        )
+        css_name = fingerprints.assets["css/site.css"]
+        self.write("images/a.png", "new")
+        fingerprints.refresh(self.static, dict(self.entries, **{"images/a.png": [3, 2]}))
+        self.assertNotEqual(fingerprints.assets["css/site.css"], css_name)
+
+    def test_rewrite(self):
+        # Test that relative URLs, queries and fragments survive rewriting
+        fingerprints = AssetFingerprints()
+        fingerprints.assets = {"images/a.png": "images/a.12345678.png"}
+        self.assertEqual(
+            fingerprints.rewrite("../images/a.png#x", "/blog/"), "../images/a.12345678.png#x"
+        )
+        self.assertEqual(
+            fingerprints.rewrite("/images/a.png?v=1", "/"), "/images/a.12345678.png?v=1"
+        )
+        self.assertEqual(fingerprints.rewrite("/images/b.png", "/"), "/images/b.png")
+
+    def test_publish(self):
+        # Test that assets are published under their new names, stale ones removed, and sources untouched
+        fingerprints = AssetFingerprints()
+        fingerprints.refresh(self.static, self.entries)
+        stale = os.path.join(self.public, "images", "a.00000000.png")
+        os.makedirs(os.path.dirname(stale))
+        open(stale, "w").close()
+        written = fingerprints.publish(
+            self.static, self.public, {"images/a.png": "images/a.00000000.png"}, "hardlink"
+        )
+        self.assertEqual(written, 2)
+        self.assertFalse(os.path.exists(stale))
+        with open(os.path.join(self.public, "asset-manifest.json")) as f:
+            self.assertEqual(json.load(f), fingerprints.assets)
+        with open(os.path.join(self.static, "css", "site.css")) as f:
+            self.assertIn('url("../images/a.png")', f.read())
+        self.assertEqual(fingerprints.publish(self.static, self.public, fingerprints.assets), 0)
+
+    def test_rendered_references(self):
+        # Test that links and images to assets are rewritten in rendered pages
+        asset_fingerprints.enabled = True
+        asset_fingerprints.assets = {"images/a.png": "images/a.12345678.png"}
+        asset_fingerprints.page_url = "/blog/"
+        html = markdown_to_html_node("[img](../images/a.png) [home](/)").to_html()
+        self.assertEqual(
+            html,
+            '<div><p><a href="../images/a.12345678.png">img</a> <a href="/">home</a></p></div>',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import os
+import tempfile
+import unittest
+
+from gencontent import (
+    extract_title,
+    generate_pages_incremental,
+    generate_pages_recursive,
+    page_url,
+)
+from pipeline import pipeline_config
+
+
+class TestExtractTitle(unittest.TestCase):
+    def test_extract_title(self):
+        # Test that the first "# " heading is used as the title
+        self.assertEqual(extract_title("intro\n# Hello\n## Sub"), "Hello")
+
+    def test_extract_title_missing(self):
+        # Test that a document without a title raises a ValueError
+        with self.assertRaises(ValueError):
+            extract_title("## Only a subheading")
+
+
+class TestPageUrl(unittest.TestCase):
+    def test_page_url(self):
+        # Test that destination paths map to site URLs with index.html stripped
+        self.assertEqual(page_url("public/index.html", "public"), "/")
+        self.assertEqual(page_url("public/majesty/index.html", "public"), "/majesty/")
+        self.assertEqual(page_url("public/about.html", "public"), "/about.html")
+
+
+class TestGeneratePagesIncremental(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def build(self, manifest):
+        return generate_pages_incremental(self.content, self.template, self.public, manifest)
+
+    def test_only_changed_pages_rebuilt(self):
+        # Test that unchanged pages are left alone and changed pages are rebuilt
+        manifest = self.build({})
+        blog_html = os.path.join(self.public, "blog", "index.html")
+        index_html = os.path.join(self.public, "index.html")
+        os.utime(blog_html, (0, 0))
+        self.write(os.path.join(self.content, "index.md"), "# New Home")
+        self.build(manifest)
+        self.assertEqual(os.stat(blog_html).st_mtime, 0)
+        with open(index_html) as f:
+            self.assertIn("New Home", f.read())
+
+    def test_template_change_rebuilds_everything(self):
+        # Test that editing the template invalidates every page
+        manifest = self.build({})
+        blog_html = os.path.join(self.public, "blog", "index.html")
+        os.utime(blog_html, (0, 0))
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.build(manifest)
+        self.assertNotEqual(os.stat(blog_html).st_mtime, 0)
+
+    def test_removed_source_deletes_output(self):
+        # Test that outputs of deleted markdown files are removed
+        manifest = self.build({})
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        manifest = self.build(manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "index.html")))
+        self.assertNotIn("blog/index.md", manifest["pages"])
+
+    def test_forced_pages_rebuilt(self):
+        # Test that unchanged pages passed in forced are regenerated
+        manifest = self.build({})
+        blog_html = os.path.join(self.public, "blog", "index.html")
+        os.utime(blog_html, (0, 0))
+        generate_pages_incremental(
+            self.content, self.template, self.public, manifest, forced={"blog/index.md"}
+        )
+        self.assertNotEqual(os.stat(blog_html).st_mtime, 0)
+
+    def test_metadata_kept_for_unchanged_pages(self):
+        # Test that an incremental build keeps the titles of pages it doesn't regenerate
+        manifest = self.build({})
+        self.write(os.path.join(self.content, "index.md"), "# New Home")
+        manifest = self.build(manifest)
+        self.assertEqual(manifest["meta"]["index.md"]["title"], "New Home")
+        self.assertEqual(manifest["meta"]["blog/index.md"]["title"], "Blog")
+        self.assertEqual(manifest["meta"]["blog/index.md"]["url"], "/blog/")
+
+    def test_front_matter(self):
+        # Test that the front matter title and description fill the template and stay out of the body
+        self.write(
+            self.template,
+            '<title>{{ Title }}</title><meta content="{{ Description }}">{{ Content }}',
+        )
+        self.write(
+            os.path.join(self.content, "blog", "index.md"),
+            '---\ntitle: Posts\ndescription: "Notes & news"\ntags: [a]\n---\nNo heading here',
+        )
+        manifest = self.build({})
+        with open(os.path.join(self.public, "blog", "index.html")) as f:
+            self.assertEqual(
+                f.read(),
+                '<title>Posts</title><meta content="Notes &amp; news"><div><p>No heading here</p></div>',
+            )
+        self.assertEqual(manifest["meta"]["blog/index.md"]["tags"], ["a"])
+
+    def test_link_graph_recorded(self):
+        # Test that the manifest records the links and images of every page
+        self.write(
+            os.path.join(self.content, "blog", "index.md"),
+            "# Blog\n\n[Home](/) ![pic](../images/a.png) [wiki](https://example.com)",
+        )
+        manifest = self.build({})
+        self.assertEqual(
+            manifest["links"]["blog/index.md"],
+            {"links": ["index.html"], "images": ["images/a.png"]},
+        )
+        self.assertEqual(manifest["links"]["index.md"], {"links": [], "images": []})
+
+
+class TestGeneratePagesParallel(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        for i in range(6):
+            page_dir = os.path.join(self.content, f"page{i}")
+            os.makedirs(page_dir)
+            with open(os.path.join(page_dir, "index.md"), "w") as f:
+                f.write(f"# Page {i}\n\nSome **bold** text in page {i}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, dir_path):
+        files = {}
+        for root, _, filenames in os.walk(dir_path):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                with open(path, "rb") as f:
+                    files[os.path.relpath(path, dir_path)] = f.read()
+        return files
+
+    def test_parallel_matches_serial(self):
+        # Test that a parallel build writes byte-identical output to a serial build
+        serial = os.path.join(self.tmp.name, "serial")
+        parallel = os.path.join(self.tmp.name, "parallel")
+        generate_pages_recursive(self.content, self.template, serial)
+        generate_pages_recursive(self.content, self.template, parallel, jobs=2)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_parallel_error_reports_source(self):
+        # Test that a failing page reports its source path from a worker process
+        broken = os.path.join(self.content, "page3", "index.md")
+        with open(broken, "w") as f:
+            f.write("no title here")
+        with self.assertRaises(RuntimeError) as cm:
+            generate_pages_recursive(
+                self.content, self.template, os.path.join(self.tmp.name, "out"), jobs=2
+            )
+        self.assertIn(broken, str(cm.exception))
+
+
+class TestGeneratePagesPipelined(TestGeneratePagesParallel):
+    # The parallel tests again, through the concurrent read/render/write pipeline
+    def setUp(self):
+        super().setUp()
+        pipeline_config.enabled = True
+
+    def tearDown(self):
+        pipeline_config.enabled = False
+        super().tearDown()
+
+    def test_pipelined_serial_matches_streamed(self):
+        # Test that the pipeline with one render thread writes the same pages
+        streamed = os.path.join(self.tmp.name, "streamed")
+        pipelined = os.path.join(self.tmp.name, "pipelined")
+        pipeline_config.enabled = False
+        expected = generate_pages_recursive(self.content, self.template, streamed)
+        pipeline_config.enabled = True
+        graph = generate_pages_recursive(self.content, self.template, pipelined)
+        self.assertEqual(self.read_tree(streamed), self.read_tree(pipelined))
+        self.assertEqual(graph.pages, expected.pages)
+
+
+if __name__ == "__main__":
+    unittest.main()
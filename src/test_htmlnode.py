@@ -35,6 +35,16 @@ class TestHTMLNode(unittest.TestCase):
                         "children=[], props={'href': 'https://www.example.com'})")
         self.assertEqual(repr(node), expected_repr)
 
+    def test_compact_representation(self):
+        # Test that nodes have no per-instance __dict__ and share the empty props mapping
+        node1 = LeafNode("p", "one")
+        node2 = ParentNode("div", [node1])
+        self.assertFalse(hasattr(node1, "__dict__"))
+        self.assertFalse(hasattr(node2, "__dict__"))
+        self.assertIs(node1.props, node2.props)
+        self.assertEqual(node1.props_to_html(), "")
+        self.assertEqual(repr(node1), "LeafNode(p, one, {})")
+
 class TestLeafNode(unittest.TestCase):
     def test_html_rendering(self):
         # Test that a LeafNode with a tag and value renders correctly as HTML
@@ -110,5 +120,29 @@ class TestParentNode(unittest.TestCase):
         expected_html = '<div><span><b>Bold text</b>Normal text</span><i>Italic text</i></div>'
         self.assertEqual(outer_parent.to_html(), expected_html)
 
+    def test_render_to_streams_chunks(self):
+        # Test that render_to writes the same HTML as to_html, in several chunks
+        parent = ParentNode("div", [ParentNode("p", [LeafNode("b", "x"), LeafNode(None, "y")])])
+        chunks = []
+        parent.render_to(chunks.append)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), parent.to_html())
+        self.assertEqual("".join(chunks), "<div><p><b>x</b>y</p></div>")
+
+    def test_deeply_nested_rendering(self):
+        # Test that rendering a tree deeper than the recursion limit works
+        node = LeafNode(None, "deep")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span><span>"))
+        self.assertEqual(html.count("</span>"), 5000)
+
+    def test_nested_error_on_render(self):
+        # Test that an invalid nested ParentNode still raises a ValueError
+        parent = ParentNode("div", [ParentNode("p", None)])
+        with self.assertRaises(ValueError):
+            parent.to_html()
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,150 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from imagesize import ImageSizes, image_sizes, read_image_size
+from inline_cache import inline_cache
+from markdown_blocks import markdown_to_html_node, render_key
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height)
+
+
+def jpeg(width, height):
+    # SOI, an APP0 segment to skip, then a baseline start-of-frame
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + bytes(9)
+    sof0 = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, height, width) + bytes(10)
+    return b"\xff\xd8" + app0 + sof0
+
+
+def webp(chunk, payload):
+    return b"RIFF" + struct.pack("<I", 30) + b"WEBP" + chunk + struct.pack("<I", 10) + payload
+
+
+class TestReadImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def size(self, data):
+        path = os.path.join(self.tmp.name, "image")
+        with open(path, "wb") as f:
+            f.write(data)
+        return read_image_size(path)
+
+    def test_raster_formats(self):
+        # Test that PNG, GIF and JPEG sizes are read from their headers
+        self.assertEqual(self.size(png(640, 480)), (640, 480))
+        self.assertEqual(self.size(b"GIF89a" + struct.pack("<HH", 32, 16) + bytes(8)), (32, 16))
+        self.assertEqual(self.size(jpeg(1024, 768)), (1024, 768))
+
+    def test_webp(self):
+        # Test that lossy, lossless and extended WebP sizes are read
+        lossy = b"\x00\x00\x00\x9d\x01\x2a" + struct.pack("<HH", 300, 200)
+        self.assertEqual(self.size(webp(b"VP8 ", lossy)), (300, 200))
+        bits = (300 - 1) | ((200 - 1) << 14)
+        lossless = b"\x2f" + bits.to_bytes(4, "little") + bytes(4)
+        self.assertEqual(self.size(webp(b"VP8L", lossless)), (300, 200))
+        extended = bytes(4) + (299).to_bytes(3, "little") + (199).to_bytes(3, "little")
+        self.assertEqual(self.size(webp(b"VP8X", extended)), (300, 200))
+
+    def test_svg(self):
+        # Test that SVG sizes come from width and height, else the viewBox
+        self.assertEqual(self.size(b'<svg width="24px" height="12" xmlns="x"/>'), (24, 12))
+        self.assertEqual(
+            self.size(b'<?xml version="1.0"?>\n<svg width="100%" viewBox="0 0 48 36.4">'), (48, 36)
+        )
+        self.assertIsNone(self.size(b"<svg></svg>"))
+
+    def test_unknown_format(self):
+        # Test that files that aren't images give None
+        self.assertIsNone(self.size(b"plain text"))
+
+
+class TestImageSizes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write("images/a.png", png(10, 20))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        image_sizes.enabled = False
+        image_sizes.entries = {}
+        image_sizes.page_url = "/"
+
+    def write(self, rel_path, data):
+        with open(os.path.join(self.static, rel_path), "wb") as f:
+            f.write(data)
+
+    def test_refresh_reads_changed_images_only(self):
+        # Test that images are only read again when their size or mtime changes
+        sizes = ImageSizes()
+        entries = {"images/a.png": [33, 1], "style.css": [5, 1]}
+        self.assertEqual(sizes.refresh(self.static, entries), 1)
+        self.assertEqual(list(sizes.entries), ["images/a.png"])
+        self.assertEqual(sizes.refresh(self.static, entries), 0)
+        self.write("images/a.png", png(30, 40))
+        self.assertEqual(sizes.refresh(self.static, {"images/a.png": [33, 2]}), 1)
+        self.assertEqual(sizes.lookup("/images/a.png"), (30, 40))
+
+    def test_cache_saved_and_opened(self):
+        # Test that sizes persist in the cache file between builds
+        path = os.path.join(self.tmp.name, "cache", "images.json")
+        sizes = ImageSizes()
+        sizes.open(path)
+        sizes.refresh(self.static, {"images/a.png": [33, 1]})
+        sizes.save()
+        reopened = ImageSizes()
+        reopened.open(path)
+        self.assertEqual(reopened.refresh(self.static, {"images/a.png": [33, 1]}), 0)
+
+    def test_rendered_img_attributes(self):
+        # Test that rendered images get their size, resolved relative to the page, and lazy loading
+        image_sizes.refresh(self.static, {"images/a.png": [33, 1]})
+        image_sizes.enabled = True
+        image_sizes.page_url = "/blog/post.html"
+        html = markdown_to_html_node("![a](../images/a.png) ![b](https://example.com/b.png)").to_html()
+        self.assertEqual(
+            html,
+            '<div><p><img src="../images/a.png" alt="a" width="10" height="20" loading="lazy" '
+            'decoding="async"></img> <img src="https://example.com/b.png" alt="b" loading="lazy" '
+            'decoding="async"></img></p></div>',
+        )
+
+    def test_render_key(self):
+        # Test that site-rooted images are cached under their size and relative ones are not
+        image_sizes.refresh(self.static, {"images/a.png": [33, 1]})
+        image_sizes.enabled = True
+        self.assertEqual(render_key("no images"), "no images")
+        self.assertIsNone(render_key("![a](images/a.png)"))
+        key = render_key("![a](/images/a.png) ![b](https://example.com/b.png)")
+        self.assertIsNotNone(key)
+        image_sizes.entries["images/a.png"] = [33, 2, 30, 40]
+        self.assertNotEqual(render_key("![a](/images/a.png) ![b](https://example.com/b.png)"), key)
+
+    def test_absolute_images_use_inline_cache(self):
+        # Test that a fragment with a site-rooted image is served from the inline cache with its size
+        image_sizes.refresh(self.static, {"images/a.png": [33, 1]})
+        image_sizes.enabled = True
+        enabled = inline_cache.enabled
+        inline_cache.enabled = True
+        inline_cache.entries.clear()
+        try:
+            first = markdown_to_html_node("![a](/images/a.png)").to_html()
+            hits = inline_cache.hits
+            self.assertEqual(markdown_to_html_node("![a](/images/a.png)").to_html(), first)
+            self.assertEqual(inline_cache.hits, hits + 1)
+            self.assertIn('width="10" height="20"', first)
+        finally:
+            inline_cache.enabled = enabled
+            inline_cache.entries.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from inline_cache import InlineCache, inline_cache
+from markdown_blocks import markdown_to_html_node
+
+
+class TestInlineCache(unittest.TestCase):
+    def test_hit_after_put(self):
+        # Test that a stored fragment is returned and counted as a hit
+        cache = InlineCache()
+        self.assertIsNone(cache.get("**bold**"))
+        cache.put("**bold**", "<b>bold</b>")
+        self.assertEqual(cache.get("**bold**"), "<b>bold</b>")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        # Test that the oldest unused fragment is dropped when the cache is full
+        cache = InlineCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")
+        cache.put("c", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+        self.assertEqual(cache.get("c"), "C")
+
+    def test_skips_long_text(self):
+        # Test that text over the length limit is never cached
+        cache = InlineCache(max_text_length=4)
+        cache.put("too long", "x")
+        self.assertIsNone(cache.get("too long"))
+        self.assertEqual(cache.misses, 0)
+
+    def test_disabled(self):
+        # Test that a disabled cache neither stores nor returns fragments
+        cache = InlineCache()
+        cache.enabled = False
+        cache.put("a", "A")
+        self.assertIsNone(cache.get("a"))
+
+
+class TestCachedRendering(unittest.TestCase):
+    def tearDown(self):
+        inline_cache.enabled = True
+        inline_cache.clear()
+
+    def test_same_html_with_and_without_cache(self):
+        # Test that repeated fragments render identically from the cache
+        md = (
+            "- [Home](/) and **bold** `code`\n- _italic_ ![img](/a.png)\n\n"
+            "- [Home](/) and **bold** `code`\n- _italic_ ![img](/a.png)\n"
+        )
+        inline_cache.enabled = False
+        expected = markdown_to_html_node(md).to_html()
+        inline_cache.enabled = True
+        inline_cache.clear()
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual(markdown_to_html_node(md).to_html(), expected)
+        self.assertEqual(inline_cache.misses, 2)
+        self.assertGreater(inline_cache.hits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
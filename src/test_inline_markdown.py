@@ -1,3 +1,4 @@
+import time
 import unittest
 import re
 
@@ -8,6 +9,7 @@ from inline_markdown import (
     split_nodes_image,
     split_nodes_link,
     text_to_textnodes,
+    text_to_textnodes_chained,
 )
 
 from textnode import (
@@ -285,5 +287,48 @@ class TestTextToTextNodes(unittest.TestCase):
         result = text_to_textnodes(text)
         self.assertEqual(result, expected)
 
+    def test_code_span_is_literal(self):
+        # Test that delimiters inside a code span are not parsed as formatting
+        text = "Use `a*b` and `**kwargs` here"
+        expected = [
+            TextNode("Use ", text_type_text),
+            TextNode("a*b", text_type_code),
+            TextNode(" and ", text_type_text),
+            TextNode("**kwargs", text_type_code),
+            TextNode(" here", text_type_text),
+        ]
+        self.assertEqual(text_to_textnodes(text), expected)
+
+    def test_unclosed_delimiter(self):
+        # Test that an unclosed delimiter still raises a ValueError
+        with self.assertRaises(ValueError):
+            text_to_textnodes("This is **not closed")
+
+    def test_brackets_without_link(self):
+        # Test that stray brackets and "!" stay plain text
+        text = "a [b] c! d ![e] (f)"
+        self.assertEqual(text_to_textnodes(text), [TextNode(text, text_type_text)])
+
+    def test_unmatched_brackets_are_linear(self):
+        # Test that many brackets without a "](" or a closing ")" don't each rescan the text
+        for fragment in ("[x] ", "![x] ", "[a](", "![a]("):
+            text = fragment * 20000
+            start = time.perf_counter()
+            nodes = text_to_textnodes(text)
+            self.assertLess(time.perf_counter() - start, 1.0)
+            self.assertEqual(nodes, [TextNode(text, text_type_text)])
+
+    def test_matches_chained_implementation(self):
+        # Test that the single-pass scanner agrees with the original multi-pass one
+        texts = [
+            "**bold** then [link](url) then ![img](src) and *it*",
+            "[a [b](c) d",
+            "[x](![i](u))",
+            "[**x**](u) and [`c`](u)",
+            "![a ![i](u) *q* `r` [s](t)",
+        ]
+        for text in texts:
+            self.assertEqual(text_to_textnodes(text), text_to_textnodes_chained(text))
+
 if __name__ == "__main__":
     unittest.main()
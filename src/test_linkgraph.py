@@ -0,0 +1,73 @@
+import unittest
+
+from linkgraph import LinkGraph, scan_references, site_target
+
+
+class TestSiteTarget(unittest.TestCase):
+    def test_absolute_and_relative(self):
+        # Test that links resolve to paths in the built site
+        self.assertEqual(site_target("/majesty"), "majesty")
+        self.assertEqual(site_target("/"), "index.html")
+        self.assertEqual(site_target("/blog/"), "blog/index.html")
+        self.assertEqual(site_target("../images/a.png", "/blog/post/"), "blog/images/a.png")
+        self.assertEqual(site_target("b.html", "/blog/a.html"), "blog/b.html")
+        self.assertEqual(site_target("images/a.png", "/about.html"), "images/a.png")
+        self.assertEqual(site_target("/a.png?v=1#top"), "a.png")
+
+    def test_external(self):
+        # Test that external links and bare fragments are ignored
+        self.assertIsNone(site_target("https://example.com/a"))
+        self.assertIsNone(site_target("//cdn.example.com/a.js"))
+        self.assertIsNone(site_target("mailto:me@example.com"))
+        self.assertIsNone(site_target("#section"))
+
+
+class TestScanReferences(unittest.TestCase):
+    def test_collects_links_and_images(self):
+        # Test that blocks pass through while their links and images are collected
+        blocks = [("[Home](/) and ![pic](/images/a.png)", "paragraph"), ("- [b](b/)", "unordered_list")]
+        links = set()
+        images = set()
+        self.assertEqual(list(scan_references(blocks, links, images, "/post/")), blocks)
+        self.assertEqual(links, {"index.html", "post/b/index.html"})
+        self.assertEqual(images, {"images/a.png"})
+
+
+class TestLinkGraph(unittest.TestCase):
+    def setUp(self):
+        self.graph = LinkGraph.from_dict(
+            {
+                "index.md": {"links": ["majesty"], "images": ["images/logo.png"]},
+                "majesty/index.md": {"links": ["index.html", "missing"], "images": ["images/a.png"]},
+            }
+        )
+
+    def test_reverse_edges(self):
+        # Test that pages referencing an asset are found through the reverse edges
+        self.assertEqual(self.graph.pages_referencing(["images/a.png"]), {"majesty/index.md"})
+        self.assertEqual(
+            self.graph.pages_referencing(["images/a.png", "images/logo.png"]),
+            {"index.md", "majesty/index.md"},
+        )
+        self.assertEqual(self.graph.pages_referencing(["other.png"]), set())
+
+    def test_set_page_replaces_edges(self):
+        # Test that re-recording a page drops its old edges
+        self.graph.set_page("majesty/index.md", {"links": [], "images": []})
+        self.assertEqual(self.graph.pages_referencing(["images/a.png"]), set())
+        self.graph.remove_page("index.md")
+        self.assertEqual(self.graph.referrers, {})
+
+    def test_broken_links(self):
+        # Test that links to neither a page nor a static file are reported
+        site_paths = {"index.html", "majesty/index.html", "images/a.png", "images/logo.png"}
+        self.assertEqual(self.graph.broken_links(site_paths), [("majesty/index.md", "missing")])
+
+    def test_unused_files(self):
+        # Test that static files nothing refers to are reported
+        static_paths = {"images/a.png", "images/logo.png", "index.css", "old.png"}
+        self.assertEqual(self.graph.unused_files(static_paths, {"index.css"}), ["old.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
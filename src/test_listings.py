@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from listings import listing_groups, render_listings, write_listings
+
+
+def page(url, title, date=None, tags=()):
+    meta = {"url": url, "title": title, "updated": "2024-01-01T00:00:00Z"}
+    if date:
+        meta["date"] = date
+    if tags:
+        meta["tags"] = list(tags)
+    return meta
+
+
+pages = {
+    "index.md": page("/", "Home"),
+    "blog/old.md": page("/blog/old.html", "Old", "2023-01-01T00:00:00Z", ["python"]),
+    "blog/new/index.md": page("/blog/new/", "New", "2024-01-01T00:00:00Z", ["python", "C++"]),
+    "blog/undated.md": page("/blog/undated.html", "Undated"),
+    "docs/index.md": page("/docs/", "Docs"),
+    "docs/intro.md": page("/docs/intro.html", "Intro"),
+}
+
+
+class TestListings(unittest.TestCase):
+    def test_listing_groups(self):
+        # Test that pages are grouped by directory and tag, newest first and undated last
+        directories, tags = listing_groups(pages)
+        self.assertEqual([meta["title"] for meta in directories["blog"]], ["New", "Old", "Undated"])
+        self.assertEqual([meta["title"] for meta in directories[""]], ["Docs"])
+        self.assertEqual([meta["title"] for meta in tags["python"]], ["New", "Old"])
+
+    def test_render_listings(self):
+        # Test that only directories without an index.md get a listing, plus the tag pages
+        with tempfile.TemporaryDirectory() as tmp:
+            template = os.path.join(tmp, "template.html")
+            with open(template, "w") as f:
+                f.write("<title>{{ Title }}</title>{{ Content }}")
+            listings = render_listings(pages, template)
+        self.assertEqual(
+            sorted(listings),
+            ["blog/index.html", "tags/c/index.html", "tags/index.html", "tags/python/index.html"],
+        )
+        self.assertIn(
+            '<a href="/blog/new/">New</a> <time datetime="2024-01-01T00:00:00Z">2024-01-01</time>',
+            listings["blog/index.html"],
+        )
+        self.assertIn('<a href="/tags/c/">C++</a> (1)', listings["tags/index.html"])
+
+    def test_write_listings_incremental(self):
+        # Test that unchanged listings are not rewritten and stale ones are removed
+        with tempfile.TemporaryDirectory() as tmp:
+            template = os.path.join(tmp, "template.html")
+            with open(template, "w") as f:
+                f.write("{{ Content }}")
+            public = os.path.join(tmp, "public")
+            record, written = write_listings(pages, template, public, {})
+            self.assertEqual(written, 4)
+            record, written = write_listings(pages, template, public, record)
+            self.assertEqual(written, 0)
+            untagged = {rel_path: dict(meta, tags=[]) for rel_path, meta in pages.items()}
+            record, written = write_listings(untagged, template, public, record)
+            self.assertEqual(list(record), ["blog/index.html"])
+            self.assertFalse(os.path.exists(os.path.join(public, "tags")))
+            self.assertTrue(os.path.exists(os.path.join(public, "blog", "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
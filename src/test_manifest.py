@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+from manifest import diff_hashes, hash_tree, load_manifest, save_manifest
+
+
+class TestManifest(unittest.TestCase):
+    def test_diff_hashes(self):
+        # Test that changed/added keys and removed keys are reported separately
+        old = {"a.md": "1", "b.md": "2", "c.md": "3"}
+        new = {"a.md": "1", "b.md": "20", "d.md": "4"}
+        changed, removed = diff_hashes(old, new)
+        self.assertEqual(changed, ["b.md", "d.md"])
+        self.assertEqual(removed, ["c.md"])
+
+    def test_save_and_load_roundtrip(self):
+        # Test that a saved manifest loads back unchanged
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "public", ".manifest.json")
+            manifest = {"template": "abc", "pages": {"index.md": "def"}}
+            save_manifest(path, manifest)
+            self.assertEqual(load_manifest(path), manifest)
+
+    def test_load_missing_or_corrupt(self):
+        # Test that a missing or corrupt manifest loads as empty
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, ".manifest.json")
+            self.assertEqual(load_manifest(path), {})
+            with open(path, "w") as f:
+                f.write("{not json")
+            self.assertEqual(load_manifest(path), {})
+
+    def test_hash_tree_relative_paths(self):
+        # Test that hash_tree keys are relative, "/"-separated paths
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "sub"))
+            with open(os.path.join(tmp, "sub", "page.md"), "w") as f:
+                f.write("# Hi")
+            self.assertEqual(list(hash_tree(tmp)), ["sub/page.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,15 @@
+import io
 import unittest
+from functools import partial
 
 from markdown_blocks import (
+  BlockRegistry,
+  MarkdownBlockReader,
+  lines_to_block_type,
+  lines_to_block_type_chained,
+  markdown_blocks_to_html,
   markdown_to_blocks,
+  markdown_to_html_node,
   block_to_block_type,
   block_type_paragraph,
   block_type_heading,
@@ -9,7 +17,11 @@ from markdown_blocks import (
   block_type_quote,
   block_type_olist,
   block_type_ulist,
+  block_type_table,
+  block_type_rule,
   )
+from block_cache import BlockCache
+from htmlnode import LeafNode
 
 class TestMarkdownToHTML(unittest.TestCase):
     
@@ -111,5 +123,157 @@ Not a quote"""
 Not an item"""
         self.assertEqual(block_to_block_type(not_a_list), block_type_paragraph)
 
+    def test_rule(self):
+        # Test that rules are told apart from lists
+        self.assertEqual(block_to_block_type("---"), block_type_rule)
+        self.assertEqual(block_to_block_type("* * *"), block_type_rule)
+        self.assertEqual(block_to_block_type("- item"), block_type_ulist)
+        self.assertEqual(block_to_block_type("--- x"), block_type_paragraph)
+
+    def test_table(self):
+        # Test that a table needs a delimiter row as wide as its header
+        self.assertEqual(block_to_block_type("a | b\n--|:-:\n1 | 2"), block_type_table)
+        self.assertEqual(block_to_block_type("| a | b |\n| --- |"), block_type_paragraph)
+
+    def test_table_needs_pipe(self):
+        # Test that blocks without a "|" in the first two rows are not tables
+        self.assertEqual(block_to_block_type("Title\n---"), block_type_paragraph)
+        self.assertEqual(block_to_block_type("a - b\n-"), block_type_paragraph)
+        self.assertEqual(block_to_block_type("| a |\n| - |"), block_type_table)
+        self.assertEqual(
+            markdown_to_html_node("Title\n---").to_html(), "<div><p>Title ---</p></div>"
+        )
+
+    def test_fence_with_language(self):
+        # Test that fences may carry a language and use tildes
+        self.assertEqual(block_to_block_type("```python\nx\n```"), block_type_code)
+        self.assertEqual(block_to_block_type("~~~\nx\n~~~"), block_type_code)
+        self.assertEqual(block_to_block_type("```a`b\nx\n```"), block_type_paragraph)
+
+    def test_matches_chained_implementation(self):
+        # Test that the registry classifies the original block types like the if-chain
+        blocks = [
+            "# h", "###### h", "####### h", "#h", "```\ncode\n```", "```", "> a\n> b", "> a\nb",
+            "* a\n* b", "* a\n- b", "- a", "1. a\n2. b", "1. a\n3. b", "2. a", "plain\ntext",
+        ]
+        for block in blocks:
+            lines = block.split("\n")
+            with self.subTest(block=block):
+                self.assertEqual(lines_to_block_type(lines), lines_to_block_type_chained(lines))
+
+class TestBlockRendering(unittest.TestCase):
+
+    def test_table_html(self):
+        # Test that tables render with alignment, inline markdown and padded rows
+        html = markdown_to_html_node("| a | *b* |\n|:--|--:|\n| 1 \\| 2 |").to_html()
+        self.assertEqual(
+            html,
+            '<div><table><thead><tr><th align="left">a</th><th align="right"><i>b</i></th></tr>'
+            '</thead><tbody><tr><td align="left">1 | 2</td><td align="right"></td></tr>'
+            "</tbody></table></div>",
+        )
+
+    def test_code_html(self):
+        # Test that code is copied as written, with its language as a class
+        html = markdown_to_html_node("```python\na * b * c\n```").to_html()
+        self.assertEqual(
+            html, '<div><pre><code class="language-python">a * b * c\n</code></pre></div>'
+        )
+
+    def test_rule_html(self):
+        # Test that a rule renders as <hr>
+        self.assertEqual(markdown_to_html_node("***").to_html(), "<div><hr></hr></div>")
+
+    def test_register_block_type(self):
+        # Test that a registered type is dispatched on its first character, before paragraphs
+        registry = BlockRegistry()
+        registry.register(block_type_paragraph, lambda block: LeafNode("p", block))
+        registry.register(
+            "note", lambda block: LeafNode("aside", block[2:]), lambda lines: lines[0][1:2] == " ", "!"
+        )
+        self.assertEqual(registry.classify(["! careful"]), "note")
+        self.assertEqual(registry.classify(["!important"]), block_type_paragraph)
+        self.assertEqual(registry.to_html_node("! careful", "note").to_html(), "<aside>careful</aside>")
+        with self.assertRaises(ValueError):
+            registry.to_html_node("x", "missing")
+
+    def test_register_without_source(self):
+        # Test that handlers without a source file, like builtins and partials, can be registered
+        registry = BlockRegistry()
+        registry.register("note", partial(LeafNode, "aside"), str.isspace, "!")
+        self.assertEqual(registry.to_html_node("! careful", "note").to_html(), "<aside>! careful</aside>")
+
+    def test_renderer_source_changes_cache_key(self):
+        # Test that adding a block renderer's source changes the block cache version
+        cache = BlockCache()
+        cache.open("unused")
+        version = cache.version
+        cache.add_renderer_source(__file__)
+        self.assertNotEqual(cache.version, version)
+
+class TestMarkdownBlockReader(unittest.TestCase):
+    md = """
+Intro paragraph
+on two lines
+
+
+
+# The Title
+
+* a list
+* of items
+
+```
+code
+```
+"""
+
+    def test_same_blocks_as_markdown_to_blocks(self):
+        # Test that the streaming reader yields the same blocks and types as the string version
+        reader = MarkdownBlockReader(io.StringIO(self.md))
+        expected = [(block, block_to_block_type(block)) for block in markdown_to_blocks(self.md)]
+        self.assertEqual(list(reader), expected)
+
+    def test_read_title_keeps_blocks(self):
+        # Test that reading ahead for the title does not lose the blocks before it
+        reader = MarkdownBlockReader(io.StringIO(self.md))
+        self.assertEqual(reader.read_title(), "The Title")
+        blocks = [block for block, _ in reader]
+        self.assertEqual(blocks[0], "Intro paragraph\non two lines")
+        self.assertEqual(len(blocks), 4)
+
+    def test_read_title_missing(self):
+        # Test that a document without a title raises a ValueError
+        reader = MarkdownBlockReader(io.StringIO("## Sub\n\ntext"))
+        with self.assertRaises(ValueError):
+            reader.read_title()
+
+    def test_read_front_matter(self):
+        # Test that front matter is consumed and the body is read as usual
+        reader = MarkdownBlockReader(io.StringIO("---\ntitle: Hi\n---\n# Body\n\ntext"))
+        self.assertEqual(reader.read_front_matter(), {"title": "Hi"})
+        self.assertEqual([block for block, _ in reader], ["# Body", "text"])
+
+    def test_read_front_matter_absent(self):
+        # Test that a document without front matter keeps its first line
+        reader = MarkdownBlockReader(io.StringIO(self.md))
+        self.assertEqual(reader.read_front_matter(), {})
+        self.assertEqual(reader.read_title(), "The Title")
+        self.assertEqual(next(iter(reader))[0], "Intro paragraph\non two lines")
+
+    def test_leading_rule_is_not_front_matter(self):
+        # Test that a document opening with a rule, closed or not, is read as markdown
+        for text in ("---\n\n# Title  \n\ntext", "---\n# Title  \n\ntext\n\n---\n"):
+            reader = MarkdownBlockReader(io.StringIO(text))
+            self.assertEqual(reader.read_front_matter(), {})
+            self.assertEqual(reader.read_title(), "Title")
+            self.assertEqual(list(reader)[0][0].split("\n")[0], "---")
+
+    def test_streamed_html_matches(self):
+        # Test that streaming the blocks renders the same HTML as markdown_to_html_node
+        chunks = []
+        markdown_blocks_to_html(MarkdownBlockReader(io.StringIO(self.md)), chunks.append)
+        self.assertEqual("".join(chunks), markdown_to_html_node(self.md).to_html())
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
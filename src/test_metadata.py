@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+from metadata import (
+    MetadataIndex,
+    heading_title,
+    normalize_date,
+    parse_front_matter,
+    read_front_matter,
+    read_header,
+)
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_parse_front_matter(self):
+        # Test that scalars, quoted strings and both list forms are parsed
+        meta = parse_front_matter(
+            [
+                "title: \"A: B\"\n",
+                "# a comment\n",
+                "draft: true\n",
+                "tags: [python, 'web dev']\n",
+                "aliases:\n",
+                "  - /old/\n",
+                "  - /older/\n",
+                "Date: 2024-01-05\n",
+            ]
+        )
+        self.assertEqual(
+            meta,
+            {
+                "title": "A: B",
+                "draft": True,
+                "tags": ["python", "web dev"],
+                "aliases": ["/old/", "/older/"],
+                "date": "2024-01-05",
+            },
+        )
+
+    def test_invalid_line(self):
+        # Test that a line without a key raises a ValueError
+        with self.assertRaises(ValueError):
+            parse_front_matter(["just text\n"])
+
+    def test_unclosed_or_invalid_is_body(self):
+        # Test that a leading "---" without valid, closed front matter gives its lines back
+        lines = ["---\n", "Just text\n", "---\n", "more\n"]
+        self.assertEqual(read_front_matter(iter(lines)), ({}, lines[:3]))
+        self.assertEqual(read_front_matter(iter(lines[:2])), ({}, lines[:2]))
+        self.assertEqual(
+            read_front_matter(iter(["---\n", "a: 1\n", "---\n", "body\n"])), ({"a": "1"}, [])
+        )
+
+    def test_heading_title(self):
+        # Test that titles are taken from "# " lines with surrounding whitespace stripped
+        self.assertEqual(heading_title("# The Title  \n"), "The Title")
+        self.assertIsNone(heading_title("## Sub"))
+
+    def test_normalize_date(self):
+        # Test that dates and date-times are normalized to RFC 3339 in UTC
+        self.assertEqual(normalize_date("2024-01-05"), "2024-01-05T00:00:00Z")
+        self.assertEqual(normalize_date("2024-01-05T10:00:00+02:00"), "2024-01-05T08:00:00Z")
+        with self.assertRaises(ValueError):
+            normalize_date("yesterday")
+
+
+class TestMetadataIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        with open(os.path.join(self.dir, name), "w") as f:
+            f.write(text)
+
+    def test_read_header_stops_at_title(self):
+        # Test that the header is read without going past the title line
+        self.write("a.md", "---\ndate: 2024-01-05\n---\n\n# Title\n\n" + "x" * 100)
+        self.assertEqual(
+            read_header(os.path.join(self.dir, "a.md")), {"date": "2024-01-05", "title": "Title"}
+        )
+
+    def test_refresh_reads_changed_headers_only(self):
+        # Test that only new and changed pages are read again, and removed pages dropped
+        self.write("a.md", "---\ntags: python, web\ndescription: About A\n---\n# A")
+        self.write("b.md", "# B")
+        index = MetadataIndex()
+        self.assertEqual(index.refresh(self.dir, {"a.md": "/a.html", "b.md": "/b.html"}), 2)
+        self.assertEqual(index.pages["a.md"]["tags"], ["python", "web"])
+        self.assertEqual(index.pages["a.md"]["description"], "About A")
+        self.write("b.md", "# B, longer")
+        self.assertEqual(index.refresh(self.dir, {"a.md": "/a.html", "b.md": "/b.html"}), 1)
+        self.assertEqual(index.pages["b.md"]["title"], "B, longer")
+        index.refresh(self.dir, {"a.md": "/a.html"})
+        self.assertEqual(list(index.pages), ["a.md"])
+
+    def test_invalid_date_names_file(self):
+        # Test that an invalid front matter date is reported with the page's path
+        self.write("a.md", "---\ndate: someday\n---\n# A")
+        with self.assertRaisesRegex(ValueError, "a.md"):
+            MetadataIndex().refresh(self.dir, {"a.md": "/a.html"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from minify import HtmlMinifier, minifier, minify_css, minify_html
+
+
+class TestMinifyHtml(unittest.TestCase):
+    def test_collapses_whitespace(self):
+        # Test that whitespace runs collapse and go entirely next to block tags
+        html = "<div>\n  <p>  Hello   <b>big</b>\n  world  </p>\n</div>"
+        self.assertEqual(minify_html(html), "<div><p>Hello <b>big</b> world</p></div>")
+
+    def test_keeps_attributes(self):
+        # Test that whitespace inside tags is left alone
+        html = '<p>a  <img alt="one  two" src="x.png"></img>  b</p>'
+        self.assertEqual(minify_html(html), '<p>a <img alt="one  two" src="x.png"></img> b</p>')
+
+    def test_preserves_pre_and_code(self):
+        # Test that whitespace inside <pre> and <code> is kept as written
+        html = "<pre><code>  a\n    b  </code></pre>\n<p>x  <code>1  2</code>  y</p>"
+        self.assertEqual(
+            minify_html(html), "<pre><code>  a\n    b  </code></pre><p>x <code>1  2</code> y</p>"
+        )
+
+    def test_raw_text(self):
+        # Test that <script> and <style> contents pass through untouched
+        html = "<script>\n if (a  < b) {}\n</SCRIPT>\n<style> p  { } </style>"
+        self.assertEqual(minify_html(html), "<script>\n if (a  < b) {}\n</SCRIPT><style> p  { } </style>")
+
+    def test_comments(self):
+        # Test that comments are dropped but conditional comments are kept
+        html = "<p>a <!-- note --> b</p>\n<!--[if IE]><p>old</p><![endif]-->"
+        self.assertEqual(minify_html(html), "<p>a b</p><!--[if IE]><p>old</p><![endif]-->")
+
+    def test_chunked_matches_whole(self):
+        # Test that streaming in chunks of any size gives the same output
+        html = (
+            "<!DOCTYPE html>\n<html>\n <head><title> T </title></head>\n<body>\n"
+            "<!-- c -->\n<p> a  <a href='/x'>link</a>\n b </p>\n<pre> keep\n  this </pre>\n"
+            "<script>var s = '</scr' + 'ipt>';</script>\n</body>\n</html>\n"
+        )
+        whole = minify_html(html)
+        for size in (1, 2, 5, 13):
+            chunks = []
+            html_minifier = HtmlMinifier(chunks.append)
+            for i in range(0, len(html), size):
+                html_minifier.write(html[i : i + size])
+            html_minifier.close()
+            self.assertEqual("".join(chunks), whole)
+
+    def test_counts_saved_bytes(self):
+        # Test that the bytes removed are added to the running total
+        saved = minifier.html_saved
+        minify_html("<p>  a  </p>\n")
+        self.assertEqual(minifier.html_saved - saved, 5)
+
+
+class TestMinifyCss(unittest.TestCase):
+    def test_whitespace_and_comments(self):
+        # Test that comments, spaces around punctuation and the last ";" go
+        css = "/* theme */\nbody {\n  color: red;\n  margin: 0 auto;\n}\n/*! license */\n"
+        self.assertEqual(minify_css(css), "body{color:red;margin:0 auto}/*! license */")
+
+    def test_keeps_strings_and_urls(self):
+        # Test that strings and url() are copied exactly
+        css = 'a::after { content: "  ;  } "; background: url( a.png ) }'
+        self.assertEqual(minify_css(css), 'a::after{content:"  ;  } ";background:url( a.png )}')
+
+    def test_keeps_significant_spaces(self):
+        # Test that spaces before ":" and "(" in selectors and media queries stay
+        css = "a :hover { x: 1 }\n@media screen and (min-width: 1px) { p { y: 2 } }"
+        self.assertEqual(
+            minify_css(css), "a :hover{x:1}@media screen and (min-width:1px){p{y:2}}"
+        )
@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import unittest
+
+from pipeline import positive_int, run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+    def test_stages_in_order(self):
+        # Test that every item passes through every stage
+        async def double(x):
+            return x * 2
+
+        async def increment(x):
+            return x + 1
+
+        results = run_pipeline(range(100), [(double, 4), (increment, 3)], queue_size=2)
+        self.assertEqual(sorted(results), [x * 2 + 1 for x in range(100)])
+
+    def test_backpressure(self):
+        # Test that a slow stage limits how far ahead the earlier stages run
+        fed = []
+        in_flight = []
+        peak = [0]
+
+        def items():
+            for i in range(50):
+                fed.append(i)
+                peak[0] = max(peak[0], len(fed) - len(in_flight))
+                yield i
+
+        async def slow(x):
+            await asyncio.sleep(0.001)
+            in_flight.append(x)
+            return x
+
+        async def passthrough(x):
+            return x
+
+        run_pipeline(items(), [(passthrough, 2), (slow, 1)], queue_size=3)
+        # Two queues of 3, one item in each of the three stage tasks and
+        # one waiting to be fed
+        self.assertLessEqual(peak[0], 10)
+
+    def test_error_cancels_pipeline(self):
+        # Test that an exception in a stage is raised instead of hanging
+        async def fail_on_five(x):
+            if x == 5:
+                raise ValueError("five")
+            return x
+
+        async def passthrough(x):
+            return x
+
+        with self.assertRaisesRegex(ValueError, "five"):
+            run_pipeline(range(1000), [(fail_on_five, 2), (passthrough, 2)], queue_size=4)
+
+    def test_rejects_zero_concurrency(self):
+        # Test that a stage without workers or a queue without room raises a ValueError
+        async def identity(x):
+            return x
+
+        with self.assertRaises(ValueError):
+            run_pipeline(range(3), [(identity, 0)], queue_size=2)
+        with self.assertRaises(ValueError):
+            run_pipeline(range(3), [(identity, 1)], queue_size=0)
+
+
+class TestPositiveInt(unittest.TestCase):
+    def test_positive_int(self):
+        # Test that only integers of at least 1 are accepted
+        self.assertEqual(positive_int("4"), 4)
+        for value in ("0", "-2", "x"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                positive_int(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import time
+import unittest
+
+import profiling
+from gencontent import generate_page
+from inline_cache import inline_cache
+
+
+class TestProfiler(unittest.TestCase):
+    def tearDown(self):
+        profiling.stop()
+
+    def test_disabled_by_default(self):
+        # Test that stage() is a no-op when no profiler is active
+        self.assertIsNone(profiling.active)
+        with profiling.stage("anything"):
+            pass
+
+    def test_nested_stages_are_exclusive(self):
+        # Test that time spent in a nested stage is not charged to the outer stage
+        profiler = profiling.start()
+        with profiling.stage("outer"):
+            with profiling.stage("inner"):
+                time.sleep(0.05)
+        report = profiler.report()
+        self.assertGreaterEqual(report["build_stages"]["inner"]["wall"], 0.05)
+        self.assertLess(report["build_stages"]["outer"]["wall"], 0.05)
+
+    def test_page_records(self):
+        # Test that stages inside a page are recorded on that page
+        profiler = profiling.start()
+        with profiling.page("a.md"):
+            with profiling.stage("inline"):
+                pass
+        report = profiler.report()
+        self.assertEqual([page["path"] for page in report["pages"]], ["a.md"])
+        self.assertIn("inline", report["pages"][0]["stages"])
+        self.assertIn("inline", report["page_stages"])
+        self.assertEqual(profiler.events[-1]["name"], "a.md")
+
+    def test_stage_writer_batches(self):
+        # Test that the stage writer passes every chunk through on flush
+        profiler = profiling.start()
+        written = []
+        writer = profiler.write_stage("write", written.append)
+        writer("a")
+        writer("b")
+        self.assertEqual(written, [])
+        writer.flush()
+        self.assertEqual(written, ["ab"])
+
+    def test_generate_page_profiled(self):
+        # Test that a profiled page renders the same HTML and records its stages
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "index.md")
+            template = os.path.join(tmp, "template.html")
+            with open(source, "w") as f:
+                f.write("# Title\n\nSome **bold** text\n\n* a\n* b\n")
+            with open(template, "w") as f:
+                f.write("<title>{{ Title }}</title>{{ Content }}")
+            generate_page(source, template, os.path.join(tmp, "plain.html"))
+            inline_cache.clear()
+            profiler = profiling.start()
+            generate_page(source, template, os.path.join(tmp, "profiled.html"))
+            with open(os.path.join(tmp, "plain.html")) as plain:
+                with open(os.path.join(tmp, "profiled.html")) as profiled:
+                    self.assertEqual(plain.read(), profiled.read())
+            stages = profiler.report()["pages"][0]["stages"]
+            for name in ("read", "markdown_to_blocks", "inline", "to_html", "write"):
+                self.assertIn(name, stages)
+
+
+if __name__ == "__main__":
+    unittest.main()
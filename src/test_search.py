@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+from markdown_blocks import block_to_block_type, markdown_blocks_to_html, markdown_to_blocks
+from search import (
+    SearchIndex,
+    SearchReader,
+    block_terms,
+    collect_sections,
+    decode_varint,
+    encode_varint,
+)
+
+markdown = """# Guide
+
+Intro about **wizards** and [towers](/towers/).
+
+## Setup
+
+Install the wizard tower.
+
+## Setup
+
+Second setup section about rings."""
+
+
+def blocks_of(text):
+    return [(block, block_to_block_type(block)) for block in markdown_to_blocks(text)]
+
+
+class TestCollectSections(unittest.TestCase):
+    def test_block_terms(self):
+        # Test that words are lowercased and link URLs are left out
+        counts = Counter()
+        block_terms("The **Tower** and the [tower](/secret/) of `x1`", counts)
+        self.assertEqual(counts, {"the": 2, "tower": 2, "and": 1, "of": 1, "x1": 1})
+
+    def test_sections_split_at_headings(self):
+        # Test that every heading starts a section with a unique anchor
+        sections = []
+        blocks = blocks_of(markdown)
+        self.assertEqual(list(collect_sections(blocks, sections, "Guide")), blocks)
+        self.assertEqual(
+            [(anchor, title) for anchor, title, _ in sections],
+            [("guide", "Guide"), ("setup", "Setup"), ("setup-2", "Setup")],
+        )
+        self.assertEqual(sections[0][2]["wizards"], 1)
+        self.assertNotIn("rings", sections[1][2])
+
+    def test_anchors_match_heading_ids(self):
+        # Test that section anchors are the ids written on the headings
+        chunks = []
+        markdown_blocks_to_html(blocks_of(markdown), chunks.append, heading_ids=True)
+        html = "".join(chunks)
+        self.assertIn('<h1 id="guide">Guide</h1>', html)
+        self.assertIn('<h2 id="setup">Setup</h2>', html)
+        self.assertIn('<h2 id="setup-2">Setup</h2>', html)
+
+
+class TestSearchIndex(unittest.TestCase):
+    def test_varint_round_trip(self):
+        # Test that varints of every size decode to the encoded values
+        out = bytearray()
+        values = [0, 1, 127, 128, 300, 2**21, 2**35]
+        for value in values:
+            encode_varint(value, out)
+        position = 0
+        for value in values:
+            decoded, position = decode_varint(out, position)
+            self.assertEqual(decoded, value)
+        self.assertEqual(position, len(out))
+
+    def test_write_and_search(self):
+        # Test that a written index finds sections containing every query term
+        index = SearchIndex()
+        sections = []
+        list(collect_sections(blocks_of(markdown), sections, "Guide"))
+        index.set_page("guide/index.md", "/guide/", sections)
+        index.set_page("other.md", "/other.html", [["", "Other", {"wizard": 3}]])
+        with tempfile.TemporaryDirectory() as tmp:
+            docs, _, _ = index.write(tmp)
+            reader = SearchReader(os.path.join(tmp, "search"))
+        self.assertEqual(docs, 4)
+        results = reader.search("wizard")
+        self.assertEqual([url for url, _, _ in results], ["/other.html", "/guide/#setup"])
+        self.assertEqual([url for url, _, _ in reader.search("Wizard TOWER")], ["/guide/#setup"])
+        self.assertEqual(reader.search("wizard dragon"), [])
+        self.assertEqual(reader.search(""), [])
+
+    def test_save_and_load(self):
+        # Test that page sections survive between builds
+        index = SearchIndex()
+        index.set_page("a.md", "/a.html", [["", "A", Counter(word=2)]])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, ".search.json")
+            index.save(path)
+            loaded = SearchIndex()
+            loaded.load(path)
+        self.assertEqual(loaded.pages, {"a.md": ["/a.html", [["", "A", {"word": 2}]]]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from server import (
+    FileCache,
+    ProductionHandler,
+    accepted_encodings,
+    default_cache_control,
+    parse_cache_control,
+)
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_etag_follows_content(self):
+        # Test that a rewritten file gets a new ETag and body
+        cache = FileCache()
+        path = self.write("a.html", b"one")
+        etag, body = cache.get(path, os.stat(path))
+        self.assertEqual(body, b"one")
+        self.assertEqual(cache.get(path, os.stat(path)), (etag, b"one"))
+        os.utime(path, ns=(0, 10**18))
+        with open(path, "wb") as f:
+            f.write(b"two")
+        os.utime(path, ns=(0, 2 * 10**18))
+        new_etag, body = cache.get(path, os.stat(path))
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(body, b"two")
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        # Test that bodies are evicted oldest first once the byte cap is exceeded
+        cache = FileCache(max_bytes=30, entry_bytes=10)
+        paths = [self.write(name, b"12345") for name in ("a", "b", "c")]
+        cache.get(paths[0], os.stat(paths[0]))
+        cache.get(paths[1], os.stat(paths[1]))
+        cache.get(paths[0], os.stat(paths[0]))
+        cache.get(paths[2], os.stat(paths[2]))
+        self.assertEqual(list(cache.entries), [paths[0], paths[2]])
+        self.assertEqual(cache.size, 30)
+
+    def test_large_files_not_kept(self):
+        # Test that files over max_file_bytes get an ETag but no cached body
+        cache = FileCache(max_file_bytes=4)
+        path = self.write("big", b"123456")
+        etag, body = cache.get(path, os.stat(path))
+        self.assertIsNone(body)
+        self.assertTrue(etag.startswith('"'))
+        self.assertEqual(cache.size, cache.entry_bytes)
+
+    def test_large_file_entries_evicted(self):
+        # Test that ETag-only entries of large files count against the byte cap
+        cache = FileCache(max_bytes=20, max_file_bytes=4, entry_bytes=10)
+        paths = [self.write(name, b"123456") for name in ("a", "b", "c", "d")]
+        for path in paths:
+            cache.get(path, os.stat(path))
+        self.assertEqual(list(cache.entries), paths[2:])
+        self.assertEqual(cache.size, 20)
+
+
+class TestParseCacheControl(unittest.TestCase):
+    def test_parse(self):
+        # Test that EXT=VALUE pairs are parsed with lowercased extensions
+        self.assertEqual(
+            parse_cache_control([".CSS=public, max-age=31536000", ".html=no-store"]),
+            {".css": "public, max-age=31536000", ".html": "no-store"},
+        )
+
+    def test_invalid(self):
+        # Test that values without a dotted extension or header raise a ValueError
+        for value in ("css=public", ".css=", ".css"):
+            with self.assertRaises(ValueError):
+                parse_cache_control([value])
+
+
+class TestAcceptedEncodings(unittest.TestCase):
+    def test_q_values(self):
+        # Test that names are lowercased and q=0 or malformed q entries are left out
+        self.assertEqual(
+            accepted_encodings("gzip, BR;q=0.5, deflate;q=0, zstd;q=0.0, x;q=abc"),
+            {"gzip", "br"},
+        )
+
+    def test_missing(self):
+        # Test that a missing header accepts no encoding
+        self.assertEqual(accepted_encodings(None), set())
+
+
+class ServerTestCase(unittest.TestCase):
+    # Serves a temporary directory with ProductionHandler on a free port
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        handler_class = type(
+            "Handler",
+            (ProductionHandler,),
+            {"file_cache": FileCache(), "cache_control": default_cache_control},
+        )
+        self.httpd = ThreadingHTTPServer(
+            ("127.0.0.1", 0), partial(handler_class, directory=self.root)
+        )
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+        self.thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.tmp.cleanup()
+
+    def write(self, rel_path, data, mtime_ns=10**18):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def request(self, method, path, headers=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.httpd.server_port, timeout=5)
+        try:
+            connection.request(method, path, headers=headers or {})
+            response = connection.getresponse()
+            return response, response.read()
+        finally:
+            connection.close()
+
+
+class TestProductionHandler(ServerTestCase):
+    def test_get(self):
+        # Test that a file is served with its length, ETag, Last-Modified and Cache-Control
+        self.write("index.html", b"<p>hi</p>")
+        response, body = self.request("GET", "/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>hi</p>")
+        self.assertEqual(response.getheader("Content-Length"), "9")
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+        self.assertIsNotNone(response.getheader("Last-Modified"))
+        self.assertTrue(response.getheader("ETag").startswith('"'))
+
+    def test_if_none_match(self):
+        # Test that a matching ETag gets a 304 without a body and a different one a 200
+        self.write("a.css", b"p{}")
+        response, _ = self.request("GET", "/a.css")
+        etag = response.getheader("ETag")
+        response, body = self.request("GET", "/a.css", {"If-None-Match": f'"x", {etag}'})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(response.getheader("ETag"), etag)
+        response, body = self.request("GET", "/a.css", {"If-None-Match": '"other"'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"p{}")
+
+    def test_if_modified_since(self):
+        # Test that If-Modified-Since at or after the mtime gets a 304
+        self.write("a.css", b"p{}")
+        response, _ = self.request("GET", "/a.css")
+        last_modified = response.getheader("Last-Modified")
+        response, _ = self.request("GET", "/a.css", {"If-Modified-Since": last_modified})
+        self.assertEqual(response.status, 304)
+        response, _ = self.request(
+            "GET", "/a.css", {"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}
+        )
+        self.assertEqual(response.status, 200)
+
+    def test_head(self):
+        # Test that HEAD sends the GET headers without the body
+        self.write("a.js", b"let a = 1;")
+        response, body = self.request("HEAD", "/a.js")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"")
+        self.assertEqual(response.getheader("Content-Length"), "10")
+        self.assertEqual(response.getheader("Cache-Control"), "public, max-age=3600")
+
+    def test_directory_redirect(self):
+        # Test that a directory without a trailing slash is redirected, keeping no query
+        self.write("blog/index.html", b"blog")
+        response, _ = self.request("GET", "/blog?x=1")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/blog/")
+        response, body = self.request("GET", "/blog/")
+        self.assertEqual(body, b"blog")
+
+    def test_not_found(self):
+        # Test that missing files and directories without an index are 404s
+        os.makedirs(os.path.join(self.root, "empty"))
+        self.assertEqual(self.request("GET", "/missing.html")[0].status, 404)
+        self.assertEqual(self.request("GET", "/empty/")[0].status, 404)
+
+
+class TestEncodingNegotiation(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("app.js", b"plain")
+        self.write("app.js.gz", b"gzip bytes")
+        self.write("app.js.br", b"br bytes")
+
+    def test_prefers_br(self):
+        # Test that br is chosen over gzip when both are accepted
+        response, body = self.request("GET", "/app.js", {"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.getheader("Content-Encoding"), "br")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(body, b"br bytes")
+
+    def test_q_zero_excludes(self):
+        # Test that an encoding refused with q=0 is skipped for the next one
+        response, body = self.request("GET", "/app.js", {"Accept-Encoding": "br;q=0, gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(body, b"gzip bytes")
+
+    def test_identity(self):
+        # Test that clients accepting neither get the plain file, still with Vary
+        response, body = self.request("GET", "/app.js", {"Accept-Encoding": "deflate"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(body, b"plain")
+
+    def test_no_variants(self):
+        # Test that a file without precompressed siblings is served plain without Vary
+        self.write("other.js", b"other")
+        response, body = self.request("GET", "/other.js", {"Accept-Encoding": "gzip, br"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertIsNone(response.getheader("Vary"))
+        self.assertEqual(body, b"other")
+
+    def test_stale_variant_ignored(self):
+        # Test that a sibling whose mtime differs from the source's is never served
+        self.write("app.js.br", b"old br", mtime_ns=10**17)
+        response, body = self.request("GET", "/app.js", {"Accept-Encoding": "br, gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(body, b"gzip bytes")
+
+    def test_variant_etags_differ(self):
+        # Test that each encoding has its own ETag
+        br, _ = self.request("GET", "/app.js", {"Accept-Encoding": "br"})
+        plain, _ = self.request("GET", "/app.js")
+        self.assertNotEqual(br.getheader("ETag"), plain.getheader("ETag"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+import xml.dom.minidom
+
+from metadata import format_timestamp
+from sitemap import remove_sitemap_files, write_feed, write_sitemap
+
+
+def page(url, title, day):
+    return {"url": url, "title": title, "updated": f"2024-01-{day:02d}T00:00:00Z"}
+
+
+pages = [
+    page("/b/", "B & Co", 3),
+    page("/", "Home", 1),
+    page("/a b/", "A", 2),
+]
+
+
+class TestSitemap(unittest.TestCase):
+    def test_single_sitemap(self):
+        # Test that a small site gets one sitemap with absolute, escaped URLs in order
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(write_sitemap(pages, "https://example.com/", tmp), ["sitemap.xml"])
+            doc = xml.dom.minidom.parse(os.path.join(tmp, "sitemap.xml"))
+        locs = [node.firstChild.data for node in doc.getElementsByTagName("loc")]
+        self.assertEqual(
+            locs, ["https://example.com/", "https://example.com/a%20b/", "https://example.com/b/"]
+        )
+
+    def test_sharded_sitemap(self):
+        # Test that more than max_urls pages are split into shards under a sitemap index
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(
+                write_sitemap(pages, "https://example.com", tmp, max_urls=2),
+                ["sitemap-1.xml", "sitemap-2.xml", "sitemap.xml"],
+            )
+            index = xml.dom.minidom.parse(os.path.join(tmp, "sitemap.xml"))
+            shard = xml.dom.minidom.parse(os.path.join(tmp, "sitemap-2.xml"))
+        locs = [node.firstChild.data for node in index.getElementsByTagName("loc")]
+        self.assertEqual(
+            locs, ["https://example.com/sitemap-1.xml", "https://example.com/sitemap-2.xml"]
+        )
+        self.assertEqual(len(shard.getElementsByTagName("url")), 1)
+        lastmods = [node.firstChild.data for node in index.getElementsByTagName("lastmod")]
+        self.assertEqual(lastmods, ["2024-01-02T00:00:00Z", "2024-01-03T00:00:00Z"])
+
+
+    def test_remove_stale_shards(self):
+        # Test that files of an earlier build that weren't written again are removed
+        pages = [page(f"/{i}/", str(i), 1) for i in range(5)]
+        with tempfile.TemporaryDirectory() as tmp:
+            old_files = write_sitemap(pages, "https://example.com", tmp, max_urls=2)
+            files = write_sitemap(pages[:3], "https://example.com", tmp, max_urls=2)
+            remove_sitemap_files(old_files, files, tmp)
+            self.assertEqual(sorted(os.listdir(tmp)), sorted(files))
+
+
+class TestFeed(unittest.TestCase):
+    def test_most_recent_entries(self):
+        # Test that the feed lists the most recently updated pages first
+        with tempfile.TemporaryDirectory() as tmp:
+            write_feed(pages, "https://example.com", tmp, "Site", limit=2)
+            doc = xml.dom.minidom.parse(os.path.join(tmp, "feed.xml"))
+        entries = doc.getElementsByTagName("entry")
+        titles = [entry.getElementsByTagName("title")[0].firstChild.data for entry in entries]
+        self.assertEqual(titles, ["B & Co", "A"])
+        updated = doc.documentElement.getElementsByTagName("updated")[0].firstChild.data
+        self.assertEqual(updated, "2024-01-03T00:00:00Z")
+
+    def test_format_timestamp(self):
+        # Test that mtimes are formatted as RFC 3339 UTC timestamps
+        self.assertEqual(format_timestamp(0), "1970-01-01T00:00:00Z")
+        self.assertEqual(format_timestamp(86400 * 10**9 + 5), "1970-01-02T00:00:00Z")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from template import Template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_compile_segments_and_slots(self):
+        # Test that the template is split into static segments around each slot
+        template = Template("<title>{{ Title }}</title><main>{{Content}}</main>")
+        self.assertEqual(template.segments, ["<title>", "</title><main>", "</main>"])
+        self.assertEqual(template.slots, ["Title", "Content"])
+
+    def test_render(self):
+        # Test that rendering fills every slot, including repeated and extra slots
+        template = Template(
+            '<title>{{ Title }}</title><meta content="{{ Description }}">'
+            "<h1>{{ Title }}</h1>{{ Content }}<a href=\"{{ Path }}\"></a>"
+        )
+        html = template.render(
+            {"Title": "Hi", "Content": "<p>x</p>", "Description": "d", "Path": "/a/"}
+        )
+        self.assertEqual(
+            html,
+            '<title>Hi</title><meta content="d"><h1>Hi</h1><p>x</p><a href="/a/"></a>',
+        )
+
+    def test_render_missing_slot(self):
+        # Test that a slot without a value renders as an empty string
+        template = Template("<title>{{ Title }}</title>")
+        self.assertEqual(template.render({}), "<title></title>")
+
+    def test_slot_values_are_not_rescanned(self):
+        # Test that placeholders inside a value are left alone
+        template = Template("{{ Content }}|{{ Title }}")
+        html = template.render({"Content": "{{ Title }}", "Title": "T"})
+        self.assertEqual(html, "{{ Title }}|T")
+
+    def test_render_to_with_callable_slot(self):
+        # Test that callable slot values stream their output through write
+        template = Template("<article>{{ Content }}</article>")
+        chunks = []
+        template.render_to(chunks.append, {"Content": lambda write: write("<p>hi</p>")})
+        self.assertEqual("".join(chunks), "<article><p>hi</p></article>")
+
+    def test_load_template_recompiles_on_change(self):
+        # Test that load_template caches the compiled template until the file changes
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "template.html")
+            with open(path, "w") as f:
+                f.write("<p>{{ Title }}</p>")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+            with open(path, "w") as f:
+                f.write("<h1>{{ Title }}</h1>!")
+            self.assertEqual(load_template(path).render({"Title": "T"}), "<h1>T</h1>!")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from textnode import TextNode
+from textnode import TextNode, text_type_bold
 
 
 class TestTextNode(unittest.TestCase):
@@ -40,6 +40,12 @@ class TestTextNode(unittest.TestCase):
         expected_repr = "TextNode(This is a text node, bold, https://www.example.com)"
         self.assertEqual(repr(node), expected_repr)
 
+    def test_compact_representation(self):
+        # Test that TextNode has no per-instance __dict__ and interns its text type
+        node = TextNode("text", "".join(["bo", "ld"]))
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIs(node.text_type, text_type_bold)
+
 if __name__ == "__main__":
     unittest.main()
 
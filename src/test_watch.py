@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from watch import InotifyWatcher, PollingWatcher
+
+
+class WatcherTests:
+    def create_watcher(self, paths):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.write(self.template, "{{ Content }}")
+        self.watcher = self.create_watcher([self.content, self.template])
+
+    def tearDown(self):
+        self.watcher.close()
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def test_reports_new_file_in_subdirectory(self):
+        # Test that a file created deep in a watched tree is reported
+        page = os.path.join(self.content, "blog", "index.md")
+        self.write(page, "# Blog")
+        self.assertIn(page, self.watcher.wait(timeout=2))
+
+    def test_reports_watched_file_only(self):
+        # Test that a watched file is reported but its unwatched siblings are not
+        self.write(os.path.join(self.tmp.name, "other.txt"), "ignored")
+        self.write(self.template, "<p>{{ Content }}</p>")
+        self.assertEqual(self.watcher.wait(timeout=2), {self.template})
+
+    def test_timeout_without_changes(self):
+        # Test that wait returns an empty set when nothing changes
+        self.assertEqual(self.watcher.wait(timeout=0.05), set())
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+class TestInotifyWatcher(WatcherTests, unittest.TestCase):
+    def create_watcher(self, paths):
+        return InotifyWatcher(paths)
+
+
+class TestPollingWatcher(WatcherTests, unittest.TestCase):
+    def create_watcher(self, paths):
+        return PollingWatcher(paths, poll_interval=0.01)
+
+    def setUp(self):
+        super().setUp()
+        # Make sure the edits land in a different mtime tick than the snapshot
+        os.utime(self.template, ns=(0, 0))
+        self.watcher.snapshot = self.watcher.take_snapshot()
+
+
+if __name__ == "__main__":
+    unittest.main()
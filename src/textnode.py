@@ -1,18 +1,22 @@
+import sys
+
 from htmlnode import LeafNode
 
-text_type_text = "text"
-text_type_bold = "bold"
-text_type_italic = "italic"
-text_type_code = "code"
-text_type_link = "link"
-text_type_image = "image"
+text_type_text = sys.intern("text")
+text_type_bold = sys.intern("bold")
+text_type_italic = sys.intern("italic")
+text_type_code = sys.intern("code")
+text_type_link = sys.intern("link")
+text_type_image = sys.intern("image")
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
 
     def __init__(self, text, text_type, url=None):
         self.text = text
-        self.text_type = text_type 
-        self.url = url 
+        # Interned so every node of a type shares one string
+        self.text_type = sys.intern(text_type)
+        self.url = url
 
     def __eq__(self, other):
         if isinstance(other, TextNode):
@@ -22,7 +26,9 @@ class TextNode:
     def __repr__(self):
         return(f"TextNode({self.text}, {self.text_type}, {self.url})")
 
-def text_node_to_html_node(text_node):
+def text_node_to_html_node(text_node, image_size=None):
+    # Images are lazy-loaded and decoded off the main thread; with their
+    # (width, height) given, the browser reserves their space up front
     if text_node.text_type == text_type_text:
         return LeafNode(None, text_node.text)
     if text_node.text_type == text_type_bold:
@@ -34,5 +40,11 @@ def text_node_to_html_node(text_node):
     if text_node.text_type == text_type_link:
         return LeafNode("a", text_node.text, {"href": text_node.url})
     if text_node.text_type == text_type_image:
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+        props = {"src": text_node.url, "alt": text_node.text}
+        if image_size is not None:
+            props["width"] = str(image_size[0])
+            props["height"] = str(image_size[1])
+        props["loading"] = "lazy"
+        props["decoding"] = "async"
+        return LeafNode("img", "", props)
     raise ValueError(f"Invalid text type: {text_node.text_type}")